@@ -9,6 +9,21 @@ from pathlib import Path
 from datetime import datetime, timedelta
 from core import (
     get_all_providers,
+    fan_out_stream,
+    ollama_health,
+    ollama_models,
+    ollama_balancer,
+    with_cache,
+    response_cache,
+    coalesce,
+    resilient,
+    ProviderRouter,
+    rate_limits,
+    telemetry,
+    tokenizer,
+    preflight,
+    usage_ledger,
+    price_book,
     ConversationManager,
     TokenTracker,
     UsageLogger,
@@ -26,6 +41,7 @@ from core import (
     create_customer_portal_session,
     is_stripe_configured
 )
+from core.ollama import OLLAMA_BASE_URLS, OLLAMA_WARM_MODELS, model_tag, parse_base_urls
 
 # Page config
 st.set_page_config(
@@ -40,6 +56,12 @@ st.set_page_config(
     }
 )
 
+# Publish provider telemetry for the webhook service's /metrics endpoint
+telemetry.enable_snapshots()
+
+# Every billed call across all sessions, kept across restarts for cost reporting
+usage_ledger.enable_persistence()
+
 # SEO Meta Tags & Social Preview
 APP_URL = os.getenv("APP_URL", "https://multi-llm-chat.streamlit.app")
 seo_meta = f"""
@@ -140,7 +162,7 @@ if 'show_landing' not in st.session_state:
     st.session_state.show_landing = True
 
 if 'token_tracker' not in st.session_state:
-    st.session_state.token_tracker = TokenTracker()
+    st.session_state.token_tracker = TokenTracker(ledger=usage_ledger)
 
 if 'usage_logger' not in st.session_state:
     st.session_state.usage_logger = UsageLogger()
@@ -177,6 +199,9 @@ if 'subscription_manager' not in st.session_state:
 if 'user_email' not in st.session_state:
     st.session_state.user_email = None
 
+# Attribute usage to the signed-in user (anonymous until an email is captured)
+st.session_state.token_tracker.user = st.session_state.user_email
+
 if 'user_tier' not in st.session_state:
     st.session_state.user_tier = 'free'
 
@@ -196,6 +221,9 @@ if 'receptionist_mode' not in st.session_state:
 if 'business_profile' not in st.session_state:
     st.session_state.business_profile = None
 
+if 'receptionist_system_prompt' not in st.session_state:
+    st.session_state.receptionist_system_prompt = None  # Compiled from business_profile on first call
+
 if 'receptionist_call_history' not in st.session_state:
     st.session_state.receptionist_call_history = []
 
@@ -287,8 +315,13 @@ class ReceptionistCallLogger:
         }
 
 
-def generate_receptionist_prompt(business_profile: dict, caller_input: str) -> str:
-    """Generate system prompt for AI receptionist based on business profile"""
+def compile_receptionist_system_prompt(business_profile: dict) -> str:
+    """Generate system prompt for AI receptionist based on business profile
+
+    Contains only the static business context, so it is identical on every
+    call and providers can serve it from their prompt cache. The caller's
+    words go in a separate user message (see receptionist_caller_message).
+    """
 
     business_name = business_profile.get("business_name", "the business")
     industry = business_profile.get("industry", "restaurant")
@@ -322,13 +355,25 @@ IMPORTANT PHONE ETIQUETTE RULES:
 2. Use natural, conversational language
 3. Offer to help further before ending
 4. If you don't know something, offer to take a message or transfer
-5. Always maintain professional but friendly tone
+5. Always maintain professional but friendly tone"""
 
-Now respond to this caller: "{caller_input}"
+    return system_prompt
 
-Remember: Keep it brief and natural, as if you're speaking on the phone."""
 
-    return system_prompt
+def get_receptionist_system_prompt() -> str:
+    """Compiled system prompt for the saved profile, built once per profile save"""
+    if st.session_state.receptionist_system_prompt is None:
+        st.session_state.receptionist_system_prompt = compile_receptionist_system_prompt(
+            st.session_state.business_profile
+        )
+    return st.session_state.receptionist_system_prompt
+
+
+def receptionist_caller_message(caller_input: str) -> str:
+    """Per-call user message sent after the cached system prompt"""
+    return f"""Now respond to this caller: "{caller_input}"
+
+Remember: Keep it brief and natural, as if you're speaking on the phone."""
 
 
 def show_business_profile_setup():
@@ -392,6 +437,7 @@ def show_business_profile_setup():
                     "faqs": faqs,
                     "actions": actions if actions else "take message, provide information"
                 }
+                st.session_state.receptionist_system_prompt = None  # Recompile for the new profile
                 st.success("✅ Business profile saved! You can now test the receptionist.")
                 st.rerun()
 
@@ -440,35 +486,91 @@ def show_receptionist_simulator():
         key="caller_input"
     )
 
-    # Model selection for receptionist (use first available provider)
-    providers = get_all_providers(st.session_state.config)
+    providers = resilient(get_all_providers(st.session_state.config))
 
     if not providers:
         st.warning("⚠️ Please configure at least one API key in the sidebar to use the receptionist.")
         return
 
-    # Use first available provider
-    selected_provider_name = list(providers.keys())[0]
-    selected_provider = providers[selected_provider_name]
+    # Route each call by recent speed, price or a fixed preference order
+    routing_labels = {
+        "fastest": "⚡ Fastest (p95 time to first word)",
+        "cheapest": "💰 Cheapest within latency target",
+        "fallback": "🔁 Fallback chain"
+    }
+    policy = st.selectbox(
+        "Routing",
+        options=list(routing_labels),
+        format_func=routing_labels.get,
+        key="receptionist_routing",
+        help="Pick the provider for each call from its recent response times, error rate and price."
+    )
+    router_options: dict = {"policy": policy}
+    if policy == "cheapest":
+        router_options["slo"] = st.slider("Latency target (p95 seconds)", 0.5, 10.0, 2.0, 0.5, key="receptionist_slo")
+    elif policy == "fallback":
+        router_options["order"] = st.multiselect(
+            "Try in this order", options=list(providers), default=list(providers), key="receptionist_order"
+        )
+    router = ProviderRouter(**router_options)
+    prompt_tokens = tokenizer.count(get_receptionist_system_prompt())  # For price comparison only
 
-    st.caption(f"Using: {selected_provider_name} - {selected_provider.model}")
+    ranking = router.rank(providers, input_tokens=prompt_tokens)
+    st.caption(f"Next call goes to: {ranking[0].describe()}")
 
     if st.button("📞 Simulate Call", type="primary", use_container_width=True):
         if not caller_input:
             st.error("Please enter what the caller would say")
             return
 
-        # Generate receptionist prompt
-        full_prompt = generate_receptionist_prompt(st.session_state.business_profile, caller_input)
+        # Static business context as a (provider-cached) system message, caller words as the user turn
+        system_prompt = get_receptionist_system_prompt()
+        caller_message = receptionist_caller_message(caller_input)
+        receptionist_history = [{"role": "system", "content": system_prompt}]
+
+        # Budget cap: reject before any provider is called (priced at the provider the router picks)
+        if st.session_state.user_email:
+            estimate = preflight.estimate_call(ranking[0].name, ranking[0].provider, caller_message, receptionist_history)
+            budget = st.session_state.subscription_manager.check_budget(st.session_state.user_email, estimate.cost)
+            if not budget['allowed']:
+                st.error(
+                    f"❌ Daily budget reached: this call would cost ~${estimate.cost:.4f}, "
+                    f"${budget['remaining']:.4f} of ${budget['budget']:.2f} left today"
+                )
+                st.info("💡 Upgrade for a higher daily budget!")
+                return
+
+        cost_before = st.session_state.token_tracker.get_total_cost()
 
         with st.spinner(f"AI Receptionist responding..."):
-            # Get response from LLM
-            response = selected_provider.chat(full_prompt)
+            # Stream response from LLM so the caller hears it start right away
+            placeholder = st.empty()
+            stream = None
+            for selected_provider_name, _, stream in router.stream(
+                providers, caller_message, history=receptionist_history,
+                input_tokens=prompt_tokens
+            ):
+                placeholder.markdown(f"**Receptionist:** {stream.text}▌")
+            placeholder.empty()
+            if stream is None:
+                st.error("Error getting response: no provider returned any text")
+                return
+            result = stream.result()
+            response = result.text
 
-            if response.startswith("❌"):
+            if not result.ok:
                 st.error(f"Error getting response: {response}")
                 return
 
+            st.session_state.token_tracker.track_result(result, system_prompt + caller_message)
+            if st.session_state.user_email:
+                call_cost = st.session_state.token_tracker.get_total_cost() - cost_before
+                st.session_state.subscription_manager.track_spend(st.session_state.user_email, call_cost)
+            if result.ttft is not None:
+                st.caption(f"Answered by {selected_provider_name} - first words after {result.ttft:.2f}s")
+            if result.cached_input_tokens:
+                st.caption(f"⚡ {result.cached_input_tokens} of {result.input_tokens} prompt tokens served from the provider's prompt cache")
+
             # Log the call
             if st.session_state.user_email:
                 st.session_state.receptionist_logger.log_call(
@@ -476,7 +578,7 @@ def show_receptionist_simulator():
                     business_name=business_name,
                     caller_input=caller_input,
                     receptionist_response=response,
-                    model_used=f"{selected_provider_name}/{selected_provider.model}"
+                    model_used=f"{selected_provider_name}/{result.model}"
                 )
 
             # Add to session history
@@ -1014,7 +1116,79 @@ def main():
         if use_ollama:
             ollama_model = st.text_input("Ollama Model", value="llama3.2")
             st.session_state.config['ollama_model'] = ollama_model
-            st.caption("💡 Start Ollama: `ollama serve`")
+
+            # Cached status from the background health monitor (no network call here)
+            ollama_nodes = parse_base_urls(OLLAMA_BASE_URLS)
+            node_health = {url: ollama_health.status(url)['healthy'] for url in ollama_nodes}
+            healthy_nodes = [url for url, healthy in node_health.items() if healthy]
+            if healthy_nodes:
+                if len(ollama_nodes) > 1:
+                    st.caption(f"🟢 Ollama running ({len(healthy_nodes)}/{len(ollama_nodes)} nodes)")
+                else:
+                    st.caption("🟢 Ollama running")
+
+                # Load models ahead of the first question so it doesn't pay the cold start
+                for warm_model in dict.fromkeys(OLLAMA_WARM_MODELS + [ollama_model]):
+                    for url in ollama_balancer.candidates(healthy_nodes, warm_model):
+                        ollama_models.warm_up_in_background(url, [warm_model])
+
+                model_nodes = ollama_balancer.candidates(healthy_nodes, ollama_model)
+                warmups = [ollama_models.warmup_status(url).get(model_tag(ollama_model)) or {} for url in model_nodes]
+                if not model_nodes:
+                    st.caption(f"⚠️ No node has {ollama_model}: `ollama pull {ollama_model}`")
+                elif any(warmup.get('state') == 'warming' for warmup in warmups):
+                    st.caption("⏳ Loading model into memory...")
+                elif all(warmup.get('state') == 'failed' for warmup in warmups):
+                    st.caption(f"⚠️ Model warm-up failed: {warmups[0]['error']}")
+
+                if st.session_state.receptionist_mode:
+                    pinned = ollama_models.is_pinned(ollama_model)
+                    pin = st.checkbox(
+                        "📌 Keep model loaded for receptionist",
+                        value=pinned,
+                        help="Pins the model in Ollama's memory so callers never wait for a cold load."
+                    )
+                    if pin != pinned:
+                        if pin:
+                            ollama_models.pin(ollama_model)
+                        else:
+                            ollama_models.unpin(ollama_model)
+                        # Re-send the model so the new keep_alive applies now
+                        for url in model_nodes:
+                            ollama_models.warm_up_in_background(url, [ollama_model], force=True)
+
+                if st.button("🔍 Show loaded models", key="ollama_ps"):
+                    outstanding = ollama_balancer.outstanding()
+                    for url in healthy_nodes:
+                        if len(ollama_nodes) > 1:
+                            st.caption(f"**{url}** · {outstanding.get(url, 0)} in flight")
+                        resident = ollama_models.resident(url)
+                        for model_info in resident:
+                            vram = (model_info['size_vram'] or 0) / 1e9
+                            icon = "📌" if model_info['pinned'] else "🧠"
+                            st.caption(f"{icon} {model_info['name']} · {vram:.1f} GB VRAM")
+                        if not resident:
+                            st.caption("No models loaded")
+            elif all(healthy is None for healthy in node_health.values()):
+                st.caption("⚪ Checking Ollama...")
+            else:
+                st.caption("🔴 Ollama not reachable")
+            if not healthy_nodes:
+                st.caption("💡 Start Ollama: `ollama serve`")
+
+        # Response cache
+        st.session_state.config['use_cache'] = st.checkbox(
+            "⚡ Reuse cached answers",
+            value=True,
+            help="Identical questions to the same model are answered instantly at no cost. Uncheck to always ask the providers again."
+        )
+
+        # Multi-turn context
+        st.session_state.config['multi_turn'] = st.checkbox(
+            "🧵 Remember conversation",
+            value=False,
+            help="Follow-up questions include earlier questions and each model's own answers, trimmed to a per-model token budget."
+        )
 
         st.divider()
 
@@ -1035,6 +1209,12 @@ def main():
                 st.progress(usage['used'] / usage['limit'] if usage['limit'] > 0 else 0)
                 st.caption(f"{usage['remaining']}/{usage['limit']} conversations remaining today")
 
+        # Daily provider spend against the budget cap
+        if st.session_state.user_email:
+            budget = st.session_state.subscription_manager.check_budget(st.session_state.user_email)
+            if budget['budget'] > 0:
+                st.caption(f"💵 ${budget['spent']:.4f} of ${budget['budget']:.2f} daily budget used")
+
         # View Plans button
         if st.button("📋 View All Plans", use_container_width=True):
             st.session_state.show_pricing_modal = True
@@ -1065,7 +1245,10 @@ def main():
                 summary = st.session_state.token_tracker.get_summary()
                 for provider, models in summary["by_provider"].items():
                     for model, stats in models.items():
-                        st.caption(f"**{provider}/{model}**: ${stats['cost']:.4f} ({stats['requests']} requests)")
+                        cached_note = f", {stats['cached_requests']} cached" if stats.get('cached_requests') else ""
+                        if stats.get('cached_input_tokens'):
+                            cached_note += f", {stats['cached_input_tokens']} prompt tokens from provider cache"
+                        st.caption(f"**{provider}/{model}**: ${stats['cost']:.4f} ({stats['requests']} requests{cached_note})")
 
             # Upgrade CTA for free users to unlock detailed analytics
             if st.session_state.user_tier == 'free':
@@ -1199,6 +1382,76 @@ def main():
 
                     st.metric("Churns (30 days)", len(recent_churns))
 
+                    # Response cache effectiveness (process-wide)
+                    cache_stats = response_cache.stats()
+                    st.caption(
+                        f"**Response Cache:** {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                        f"({cache_stats['hit_rate'] * 100:.0f}% hit rate)"
+                    )
+
+                    # Provider latency/throughput (process-wide)
+                    provider_telemetry = telemetry.summary()
+                    if provider_telemetry:
+                        st.caption("**Provider Latency:**")
+                        st.table(provider_telemetry)
+
+                    # Provider spend across all users (persisted usage ledger)
+                    month_ago = (datetime.now() - timedelta(days=30)).timestamp()
+                    spend = usage_ledger.aggregate(by=("provider", "model"), since=month_ago)
+                    if spend:
+                        st.caption(f"**Provider Spend (30 days):** ${sum(row['cost'] for row in spend):.4f}")
+                        st.table([
+                            {
+                                "provider": row["provider"],
+                                "model": row["model"],
+                                "requests": row["requests"],
+                                "input_tokens": row["input_tokens"],
+                                "output_tokens": row["output_tokens"],
+                                "cost": round(row["cost"], 4)
+                            }
+                            for row in sorted(spend, key=lambda row: row["cost"], reverse=True)
+                        ])
+                        daily = usage_ledger.aggregate(by=("bucket",), since=month_ago)
+                        st.bar_chart(
+                            [{"day": datetime.fromtimestamp(row["bucket"]).strftime("%m-%d"), "cost": row["cost"]} for row in daily],
+                            x="day",
+                            y="cost"
+                        )
+                        top_spenders = sorted(
+                            (row for row in usage_ledger.aggregate(by=("user",), since=month_ago) if row["user"]),
+                            key=lambda row: row["cost"],
+                            reverse=True
+                        )[:5]
+                        for row in top_spenders:
+                            st.caption(f"• {row['user'][:25]}... : ${row['cost']:.4f} ({row['requests']} calls)")
+
+                        # Re-price recorded usage against any price sheet (vectorized, whole ledger)
+                        sheet_version = st.selectbox(
+                            "Price sheet",
+                            ["As charged (sheet in effect per call)"] + price_book.versions()[::-1],
+                            key="admin_price_sheet"
+                        )
+                        version = None if sheet_version.startswith("As charged") else sheet_version
+                        restated_costs = price_book.recompute(usage_ledger, version=version)
+                        restated = usage_ledger.aggregate(by=(), since=month_ago, costs=restated_costs)
+                        if restated:
+                            st.caption(
+                                f"30-day spend at {sheet_version}: ${restated[0]['cost']:.4f} "
+                                f"(recorded ${sum(row['cost'] for row in spend):.4f})"
+                            )
+                        if st.button("Restate ledger at this price sheet", key="admin_restate"):
+                            count = usage_ledger.restate(restated_costs)
+                            st.success(f"✅ Restated {count} calls")
+
+                    # Shared provider rate limits (process-wide)
+                    for limiter_name, limiter_stats in rate_limits.stats().items():
+                        st.caption(
+                            f"**Rate Limit {limiter_name}:** "
+                            f"{limiter_stats.get('requests_available', '∞')}/{limiter_stats.get('requests_per_minute', '∞')} requests, "
+                            f"{limiter_stats.get('tokens_available', '∞')}/{limiter_stats.get('tokens_per_minute', '∞')} tokens available, "
+                            f"{limiter_stats['waited']} queued, {limiter_stats['rejected']} rejected"
+                        )
+
                     # Phase 6: Receptionist stats
                     st.divider()
                     st.caption("**AI Receptionist Usage (Last 30 Days):**")
@@ -1277,8 +1530,8 @@ def main():
         return
 
     # Regular Multi-LLM Chat mode
-    # Initialize providers
-    providers = get_all_providers(st.session_state.config)
+    # Initialize providers (retries transient errors, fails fast on providers that keep failing)
+    providers = resilient(get_all_providers(st.session_state.config))
 
     if not providers:
         st.warning("⚠️ No LLM providers configured. Add API keys in the sidebar to get started.")
@@ -1294,6 +1547,15 @@ def main():
     # Show active providers
     st.success(f"✅ Active Providers: {', '.join(providers.keys())}")
 
+    failing = [name for name, provider in providers.items() if provider.breaker.state != "closed"]
+    if failing:
+        st.warning(f"⚡ Temporarily skipping failing providers: {', '.join(failing)}")
+
+    # Identical in-flight questions from other sessions share one upstream call
+    providers = coalesce(providers)
+    if st.session_state.config.get('use_cache', True):
+        providers = with_cache(providers, response_cache)
+
     # Chat input
     prompt = st.text_area(
         "Your question:",
@@ -1306,6 +1568,17 @@ def main():
     if st.session_state.example_prompt:
         st.session_state.example_prompt = None
 
+    # Multi-turn: each provider sees its own earlier answers, trimmed to its budget
+    histories = None
+    if st.session_state.config.get('multi_turn'):
+        manager = st.session_state.conversation_manager
+        histories = {name: manager.build_messages(name, provider.model) for name, provider in providers.items()}
+
+    # Pre-flight estimate from local token counts, recent reply lengths and latency
+    estimate = preflight.estimate(providers, prompt, histories) if prompt else None
+    if estimate:
+        st.caption(f"🧮 Estimated: {estimate.describe()}")
+
     if st.button("🚀 Ask All LLMs", type="primary", use_container_width=True):
         if not prompt:
             st.error("Please enter a question")
@@ -1331,47 +1604,102 @@ def main():
                     st.rerun()
                 return
 
+            # Budget cap: reject before any provider is called
+            budget = st.session_state.subscription_manager.check_budget(st.session_state.user_email, estimate.cost)
+            if not budget['allowed']:
+                st.error(
+                    f"❌ Daily budget reached: this question would cost ~${estimate.cost:.4f}, "
+                    f"${budget['remaining']:.4f} of ${budget['budget']:.2f} left today"
+                )
+                st.info("💡 Ask fewer models, or upgrade for a higher daily budget!")
+                return
+
             # Track usage for free users
             st.session_state.subscription_manager.track_usage(st.session_state.user_email, "conversation")
 
         # Get responses from all providers
         responses = {}
+        results = {}
         providers_used = []
         tokens_by_provider = {}
-        total_interaction_cost = 0.0
+        spent = []
 
         with st.spinner("Getting responses from all LLMs..."):
             cols = st.columns(len(providers))
+            placeholders = {}
 
-            for idx, (name, provider) in enumerate(providers.items()):
+            for idx, name in enumerate(providers):
                 with cols[idx]:
-                    with st.spinner(f"{name}..."):
-                        response = provider.chat(prompt)
-                        responses[name] = response
-
-                        # Track tokens and cost
-                        if not response.startswith("❌"):  # Only track successful responses
-                            providers_used.append(name)
-                            st.session_state.token_tracker.track(
-                                name.lower(),
-                                provider.model,
-                                prompt,
-                                response
-                            )
-
-                            # Get pricing info for display
-                            pricing = get_pricing_info(provider.model, name.lower())
-                            tokens_by_provider[name] = pricing
+                    st.markdown(f"### {name}")
+                    placeholders[name] = st.empty()
+                    placeholders[name].caption(f"⏳ {name}...")
+
+            def track_call(result):
+                """Record one call's tokens and charge it to the daily budget right away
+
+                Per call rather than per question, so a rerun mid-answer
+                cannot skip the charge for calls that already finished.
+                """
+                tracker = st.session_state.token_tracker
+                spent_before = tracker.get_total_cost()
+                # Uses the provider-reported token counts; tokenizes only as a fallback
+                tracker.track_result(result, prompt)
+                spent.append(tracker.get_total_cost() - spent_before)
+                if st.session_state.user_email:
+                    st.session_state.subscription_manager.track_spend(st.session_state.user_email, spent[-1])
 
-        # Calculate total cost for this interaction
-        total_interaction_cost = st.session_state.token_tracker.get_total_cost()
+            # All providers are queried in parallel; render text as it streams in
+            answers = fan_out_stream(
+                providers, prompt, histories=histories,
+                on_abandoned=lambda name, stream: track_call(stream.result())
+            )
+            try:
+                for name, delta, stream in answers:
+                    if delta is not None:
+                        responses[name] = responses.get(name, "") + delta
+                        placeholders[name].markdown(responses[name] + "▌")
+                        continue
+
+                    provider = providers[name]
+                    result = stream.result()
+                    results[name] = result
+                    responses[name] = result.text
+                    placeholders[name].markdown(result.text)
+                    with cols[list(providers).index(name)]:
+                        if result.cached:
+                            st.caption("⚡ Cached answer")
+                        elif result.ok and result.latency is not None:
+                            ttft = f" · first token {result.ttft:.1f}s" if result.ttft is not None else ""
+                            st.caption(f"⏱️ {result.latency:.1f}s{ttft}")
+
+                    # Track tokens and cost
+                    if result.ok:
+                        providers_used.append(name)
+                        track_call(result)
+
+                        # Get pricing info for display
+                        pricing = get_pricing_info(provider.model, name.lower())
+                        tokens_by_provider[name] = pricing
+                    elif result.error_type in ("Cancelled", "TimeoutError"):
+                        # Cut short, but the prompt and the text so far were still paid for
+                        track_call(result)
+            finally:
+                # A rerun mid-answer aborts the loop: cancel and bill the calls still running
+                answers.close()
+
+        # Keep provider column order stable in history regardless of finish order
+        responses = {name: responses[name] for name in providers if name in responses}
+
+        # Total cost for this interaction (already charged to the budget call by call)
+        total_interaction_cost = sum(spent)
 
         # Log usage
         st.session_state.usage_logger.log_interaction(
             prompt=prompt,
             providers_used=providers_used,
             tokens_used=tokens_by_provider,
-            cost=total_interaction_cost
+            cost=total_interaction_cost,
+            results=results
         )
 
         # Save to conversation history
@@ -1382,7 +1710,7 @@ def main():
         if session_stats["total_interactions"] >= 3 and not st.session_state.email_captured:
             st.session_state.show_email_modal = True
 
-        st.success(f"✅ All responses received! Cost: ${total_interaction_cost:.4f}")
+        st.success(f"✅ All responses received! Cost: ${total_interaction_cost:.4f} (estimated ${estimate.cost:.4f})")
 
     # Display conversation history
     st.divider()
@@ -0,0 +1,236 @@
+"""Offline Batch Runner - Run Prompt Datasets Across All Providers
+
+Reads prompts from JSONL or CSV, sends each one to every configured provider
+with a global concurrency limit, and appends one JSONL row per
+(prompt, provider) as soon as it finishes. Re-running with the same output
+file skips pairs that already succeeded, so a crashed run resumes where it
+stopped.
+
+Input:
+    JSONL: one object per line with "prompt" and optional "id"
+    CSV:   header row with a "prompt" column and optional "id" column
+
+Usage:
+    python batch.py prompts.jsonl -o results.jsonl
+    python batch.py prompts.csv -o results.jsonl --concurrency 16 --conversation nightly_run
+
+API keys come from OPENAI_API_KEY, ANTHROPIC_API_KEY and GEMINI_API_KEY;
+Ollama is used when it is running.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.llm_providers import LLMProvider, get_all_providers
+from core.resilience import resilient
+from core.conversation import ConversationManager
+from core.pricing import TokenTracker, calculate_cost, estimate_tokens
+
+
+def load_prompts(path: str) -> List[Dict[str, str]]:
+    """Load prompts from a .jsonl or .csv file
+
+    Returns:
+        List of {"id", "prompt"}; rows without an id get a hash of the prompt
+    """
+    rows: List[Dict[str, Any]] = []
+    if path.endswith(".csv"):
+        with open(path, newline='') as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, 'r') as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    prompts = []
+    for row in rows:
+        prompt = (row.get("prompt") or "").strip()
+        if not prompt:
+            continue
+        prompt_id = str(row.get("id") or hashlib.sha256(prompt.encode()).hexdigest()[:16])
+        prompts.append({"id": prompt_id, "prompt": prompt})
+    return prompts
+
+
+def load_completed(output_path: Path) -> Set[Tuple[str, str]]:
+    """(prompt id, provider) pairs that already succeeded in a previous run"""
+    completed = set()
+    if not output_path.exists():
+        return completed
+
+    with open(output_path, 'r') as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue  # Partial last line from a crash
+            if not row.get("error"):
+                completed.add((row["id"], row["provider"]))
+    return completed
+
+
+def run_one(prompt: Dict[str, str], name: str, provider: LLMProvider) -> Dict[str, Any]:
+    """Query one provider and build its output row"""
+    result = provider.complete(prompt["prompt"])
+
+    input_tokens = result.input_tokens
+    output_tokens = result.output_tokens
+    if result.ok:
+        if input_tokens is None:
+            input_tokens = estimate_tokens(prompt["prompt"], provider.model)
+        if output_tokens is None:
+            output_tokens = estimate_tokens(result.text, provider.model)
+
+    row = result.to_dict()
+    row.update({
+        "id": prompt["id"],
+        "prompt": prompt["prompt"],
+        "provider": name,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cost": calculate_cost(
+            input_tokens or 0, output_tokens or 0, provider.model, name,
+            cached_input_tokens=result.cached_input_tokens or 0,
+            cache_write_tokens=result.cache_write_tokens or 0
+        ) if result.ok else 0.0,
+        "timestamp": datetime.now().isoformat()
+    })
+    return row
+
+
+def save_conversation(output_path: Path, prompts: List[Dict[str, str]], name: str) -> str:
+    """Store every prompt with its latest response per provider as a conversation"""
+    latest: Dict[str, Dict[str, str]] = {}
+    with open(output_path, 'r') as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            latest.setdefault(row["id"], {})[row["provider"]] = row["text"]
+
+    manager = ConversationManager()
+    for prompt in prompts:
+        if prompt["id"] in latest:
+            manager.add_message(prompt["prompt"], latest[prompt["id"]])
+    return manager.save_conversation(name)
+
+
+def run_batch(
+    input_path: str,
+    output_path: str,
+    config: Dict[str, Any],
+    concurrency: int = 8,
+    conversation: Optional[str] = None
+) -> Dict[str, Any]:
+    """Run every prompt against every configured provider
+
+    Returns:
+        Summary with counts, skipped pairs, failures and total cost
+    """
+    providers = resilient(get_all_providers(config))
+    if not providers:
+        raise ValueError("No LLM providers configured. Set API keys or start Ollama.")
+
+    prompts = load_prompts(input_path)
+    output = Path(output_path)
+    completed = load_completed(output)
+
+    tasks = [
+        (prompt, name, provider)
+        for prompt in prompts
+        for name, provider in providers.items()
+        if (prompt["id"], name) not in completed
+    ]
+    print(f"📋 {len(prompts)} prompts x {len(providers)} providers ({', '.join(providers)})")
+    print(f"⏭️ Skipping {len(prompts) * len(providers) - len(tasks)} completed pairs, running {len(tasks)}")
+
+    tracker = TokenTracker()
+    failures = 0
+    started = time.monotonic()
+
+    with open(output, 'a') as out, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        # Terminate a partial last line left by a crash so new rows parse
+        if out.tell() > 0:
+            with open(output, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    out.write("\n")
+
+        futures = [executor.submit(run_one, *task) for task in tasks]
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                row = future.result()
+                out.write(json.dumps(row) + "\n")
+                out.flush()  # Keep the file resumable if we crash mid-run
+
+                if row["error"]:
+                    failures += 1
+                else:
+                    tracker.track(
+                        row["provider"].lower(), row["model"], row["prompt"], row["text"],
+                        input_tokens=row["input_tokens"], output_tokens=row["output_tokens"],
+                        cached_input_tokens=row["cached_input_tokens"], cache_write_tokens=row["cache_write_tokens"]
+                    )
+
+                if done % 50 == 0 or done == len(futures):
+                    print(f"  {done}/{len(futures)} done, {failures} failed, ${tracker.get_total_cost():.4f}")
+        except KeyboardInterrupt:
+            print("🛑 Interrupted - finished rows are saved, re-run to resume")
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    summary = {
+        "prompts": len(prompts),
+        "providers": list(providers),
+        "ran": len(tasks),
+        "skipped": len(prompts) * len(providers) - len(tasks),
+        "failed": failures,
+        "cost": tracker.get_total_cost(),
+        "elapsed_seconds": round(time.monotonic() - started, 1)
+    }
+
+    if conversation:
+        summary["conversation"] = save_conversation(output, prompts, conversation)
+
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a prompt dataset against all configured LLM providers")
+    parser.add_argument("input", help="Prompts file (.jsonl or .csv)")
+    parser.add_argument("-o", "--output", required=True, help="Results file (JSONL, appended, resumable)")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="Max provider calls in flight")
+    parser.add_argument("--conversation", help="Also save results as a conversation with this name")
+    parser.add_argument("--openai-model", default="gpt-4o-mini")
+    parser.add_argument("--claude-model", default="claude-3-5-sonnet-20241022")
+    parser.add_argument("--gemini-model", default="gemini-2.0-flash-exp")
+    parser.add_argument("--ollama-model", default="llama3.2")
+    args = parser.parse_args()
+
+    config = {
+        "openai_key": os.getenv("OPENAI_API_KEY"),
+        "openai_model": args.openai_model,
+        "claude_key": os.getenv("ANTHROPIC_API_KEY"),
+        "claude_model": args.claude_model,
+        "gemini_key": os.getenv("GEMINI_API_KEY"),
+        "gemini_model": args.gemini_model,
+        "ollama_model": args.ollama_model
+    }
+
+    summary = run_batch(args.input, args.output, config, args.concurrency, args.conversation)
+    print(f"✅ Batch complete: {json.dumps(summary)}")
+
+
+if __name__ == "__main__":
+    main()
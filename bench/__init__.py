@@ -0,0 +1 @@
+"""Benchmarks - Local Mock Providers and Fan-Out Load Harness"""
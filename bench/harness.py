@@ -0,0 +1,206 @@
+"""Fan-Out Benchmark Harness - Throughput and Latency Against Local Mocks
+
+Starts the mock servers from bench/mock_servers.py, points every provider at
+them and drives fan_out_stream() at several concurrency levels. For each
+level it records questions/sec, end-to-end fan-out latency and per-provider
+latency, time to first token and error rate, then writes everything as JSON
+tagged with the git commit so runs can be compared over time.
+
+Usage:
+    python -m bench.harness --levels 1,4,16 --questions 40 -o bench/results/run.json
+    python -m bench.harness --compare bench/results/baseline.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.llm_providers import LLMProvider, ProviderResult, get_all_providers, fan_out_stream
+from core.resilience import resilient
+from bench.mock_servers import MockProfile, start_all
+
+MOCK_KEY = "mock-key"
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile, None for an empty sample"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct * len(ordered) / 100) - 1))
+    return round(ordered[index], 4)
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    return {
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": round(max(values), 4) if values else None
+    }
+
+
+def mock_providers(urls: Dict[str, str], with_resilience: bool = False) -> Dict[str, LLMProvider]:
+    """Providers wired to the mock servers with dummy keys"""
+    config = {
+        "openai_key": MOCK_KEY,
+        "openai_base_url": urls["openai"],
+        "claude_key": MOCK_KEY,
+        "claude_base_url": urls["claude"],
+        "gemini_key": MOCK_KEY,
+        "gemini_base_url": urls["gemini"],
+        "ollama_base_url": urls["ollama"]
+    }
+    providers = get_all_providers(config)
+    return resilient(providers) if with_resilience else providers
+
+
+def run_level(providers: Dict[str, LLMProvider], concurrency: int, questions: int) -> Dict[str, Any]:
+    """Ask `questions` prompts with `concurrency` fan-outs in flight at once"""
+
+    def ask(index: int):
+        # Unique prompts keep any caching or coalescing layer out of the numbers
+        started = time.monotonic()
+        results: List[ProviderResult] = []
+        for name, delta, stream in fan_out_stream(providers, f"Benchmark question {index}"):
+            if delta is None:
+                results.append(stream.result())
+        return time.monotonic() - started, results
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(ask, range(questions)))
+    elapsed = time.monotonic() - started
+
+    by_provider: Dict[str, Dict[str, Any]] = {}
+    for _, results in outcomes:
+        for result in results:
+            entry = by_provider.setdefault(result.provider, {"latency": [], "ttft": [], "calls": 0, "errors": 0})
+            entry["calls"] += 1
+            if not result.ok:
+                entry["errors"] += 1
+                continue
+            entry["latency"].append(result.latency)
+            if result.ttft is not None:
+                entry["ttft"].append(result.ttft)
+
+    return {
+        "concurrency": concurrency,
+        "questions": questions,
+        "elapsed_seconds": round(elapsed, 3),
+        "questions_per_second": round(questions / elapsed, 3),
+        "fan_out_latency": summarize([wall for wall, _ in outcomes]),
+        "providers": {
+            name: {
+                "calls": entry["calls"],
+                "error_rate": round(entry["errors"] / entry["calls"], 4),
+                "latency": summarize(entry["latency"]),
+                "ttft": summarize(entry["ttft"])
+            }
+            for name, entry in sorted(by_provider.items())
+        }
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(
+    levels: List[int],
+    questions: int,
+    profile: MockProfile,
+    with_resilience: bool = False
+) -> Dict[str, Any]:
+    """Start mocks, run every concurrency level and return the report"""
+    servers = start_all(profile)
+    try:
+        providers = mock_providers({kind: url for kind, (_, url) in servers.items()}, with_resilience)
+        runs = []
+        for concurrency in levels:
+            print(f"🏁 concurrency={concurrency} questions={questions} providers={', '.join(providers)}")
+            runs.append(run_level(providers, concurrency, questions))
+            print(f"   {runs[-1]['questions_per_second']} q/s, fan-out p95 {runs[-1]['fan_out_latency']['p95']}s")
+    finally:
+        for server, _ in servers.values():
+            server.shutdown()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "resilience": with_resilience,
+        "profile": profile.to_dict(),
+        "levels": runs
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Human-readable deltas against a previous report, matched by concurrency"""
+    previous = {run["concurrency"]: run for run in baseline.get("levels", [])}
+    lines = [f"📊 vs {baseline.get('commit') or 'baseline'} ({baseline.get('timestamp', '?')})"]
+    for run in report["levels"]:
+        old = previous.get(run["concurrency"])
+        if not old:
+            continue
+        qps_change = (run["questions_per_second"] / old["questions_per_second"] - 1) * 100
+        new_p95 = run["fan_out_latency"]["p95"] or 0.0
+        old_p95 = old["fan_out_latency"]["p95"] or 0.0
+        lines.append(
+            f"  concurrency={run['concurrency']}: {run['questions_per_second']} q/s ({qps_change:+.1f}%), "
+            f"fan-out p95 {new_p95:.3f}s ({new_p95 - old_p95:+.3f}s)"
+        )
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fan-out against local mock providers")
+    parser.add_argument("--levels", default="1,4,16", help="Comma-separated concurrent fan-outs")
+    parser.add_argument("--questions", type=int, default=40, help="Questions per level")
+    parser.add_argument("--ttft-ms", type=float, default=200.0)
+    parser.add_argument("--chunk-ms", type=float, default=20.0)
+    parser.add_argument("--chunks", type=int, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--resilience", action="store_true", help="Wrap providers with retries/circuit breakers")
+    parser.add_argument("-o", "--output", help="Write the JSON report here")
+    parser.add_argument("--compare", help="Previous JSON report to compare against")
+    args = parser.parse_args()
+
+    profile = MockProfile(
+        ttft_ms=args.ttft_ms, chunk_ms=args.chunk_ms, chunks=args.chunks,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, seed=args.seed
+    )
+    levels = [int(level) for level in args.levels.split(",") if level.strip()]
+    report = run_benchmark(levels, args.questions, profile, args.resilience)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report saved to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            print("\n".join(compare(report, json.load(f))))
+
+
+if __name__ == "__main__":
+    main()
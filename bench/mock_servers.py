@@ -0,0 +1,449 @@
+"""Local Mock Provider Servers - Load Test Without Burning API Credit
+
+Stand-in HTTP servers for the endpoints used by core/llm_providers.py:
+
+    OpenAI     POST /v1/chat/completions                    (JSON or SSE stream)
+    Anthropic  POST /v1/messages                            (JSON or SSE stream)
+    Gemini     POST /v1beta/models/{model}:generateContent  (JSON)
+               POST /v1beta/models/{model}:streamGenerateContent (streamed JSON array)
+    Ollama     GET  /api/tags, GET /api/ps, POST /api/generate, POST /api/chat
+               (JSON or NDJSON stream)
+
+Each server follows a MockProfile: log-normal time to first token, fixed
+inter-chunk delay, chunk count and injected 500/429 error rates.
+
+Usage:
+    python -m bench.mock_servers            # start all four, print base URLs
+"""
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Set, Tuple, Type
+
+MOCK_WORD = "lorem "
+
+
+class MockProfile:
+    """Latency, streaming and error behaviour of a mock endpoint
+
+    Args:
+        ttft_ms: Median time to first token in milliseconds
+        ttft_sigma: Log-normal sigma of time to first token (0 = fixed)
+        chunk_ms: Delay between streamed chunks in milliseconds
+        chunks: Number of chunks (one token each) per response
+        error_rate: Fraction of requests answered with HTTP 500
+        rate_limit_rate: Fraction of requests answered with HTTP 429 + Retry-After
+        seed: Seed for reproducible latency/error sequences
+    """
+
+    def __init__(
+        self,
+        ttft_ms: float = 200.0,
+        ttft_sigma: float = 0.3,
+        chunk_ms: float = 20.0,
+        chunks: int = 20,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        self.ttft_ms = ttft_ms
+        self.ttft_sigma = ttft_sigma
+        self.chunk_ms = chunk_ms
+        self.chunks = chunks
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample_ttft(self) -> float:
+        """Seconds to wait before the first token"""
+        with self._lock:
+            factor = math.exp(self._random.gauss(0, self.ttft_sigma)) if self.ttft_sigma else 1.0
+        return self.ttft_ms * factor / 1000
+
+    def sample_error(self) -> Optional[int]:
+        """HTTP status to fail with, or None to answer normally"""
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.error_rate:
+            return 500
+        if roll < self.error_rate + self.rate_limit_rate:
+            return 429
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ttft_ms": self.ttft_ms,
+            "ttft_sigma": self.ttft_sigma,
+            "chunk_ms": self.chunk_ms,
+            "chunks": self.chunks,
+            "error_rate": self.error_rate,
+            "rate_limit_rate": self.rate_limit_rate
+        }
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    """Shared plumbing: JSON bodies, chunked streaming, latency and errors"""
+
+    protocol_version = "HTTP/1.1"
+    profile: MockProfile = MockProfile()
+
+    def log_message(self, format: str, *args: Any):
+        pass  # Keep benchmark output clean
+
+    def read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def start_stream(self, content_type: str):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def write_chunk(self, data: str):
+        encoded = data.encode()
+        self.wfile.write(f"{len(encoded):x}\r\n".encode() + encoded + b"\r\n")
+        self.wfile.flush()
+
+    def end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def fail_if_unlucky(self) -> bool:
+        """Send an injected error response; True if one was sent"""
+        status = self.profile.sample_error()
+        if status is None:
+            return False
+        self.read_json()
+        headers = {"Retry-After": "1"} if status == 429 else None
+        self.send_json(status, self.error_body(status), headers)
+        return True
+
+    def error_body(self, status: int) -> Dict[str, Any]:
+        return {"error": {"message": f"mock error {status}", "type": "mock_error", "code": status}}
+
+    def pieces(self) -> List[str]:
+        return [MOCK_WORD] * self.profile.chunks
+
+    def timed_pieces(self):
+        """Yield response pieces with the profile's first-token and chunk delays"""
+        time.sleep(self.profile.sample_ttft())
+        for index, piece in enumerate(self.pieces()):
+            if index:
+                time.sleep(self.profile.chunk_ms / 1000)
+            yield piece
+
+    def wait_full_response(self) -> str:
+        """Sleep as long as a full non-streamed completion would take"""
+        return "".join(self.timed_pieces())
+
+    @staticmethod
+    def count_input_tokens(text: str) -> int:
+        return max(1, len(text) // 4)
+
+
+class OpenAIMockHandler(_MockHandler):
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            return self.send_json(404, self.error_body(404))
+        if self.fail_if_unlucky():
+            return
+
+        body = self.read_json()
+        model = body.get("model", "gpt-4o-mini")
+        prompt = "".join(m.get("content", "") for m in body.get("messages", []) if isinstance(m.get("content"), str))
+        usage = {
+            "prompt_tokens": self.count_input_tokens(prompt),
+            "completion_tokens": self.profile.chunks,
+            "total_tokens": self.count_input_tokens(prompt) + self.profile.chunks
+        }
+        base = {"id": "chatcmpl-mock", "created": int(time.time()), "model": model}
+
+        if not body.get("stream"):
+            text = self.wait_full_response()
+            return self.send_json(200, dict(base, object="chat.completion", usage=usage, choices=[{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop"
+            }]))
+
+        self.start_stream("text/event-stream")
+        chunk = dict(base, object="chat.completion.chunk")
+        for piece in self.timed_pieces():
+            self.write_chunk("data: " + json.dumps(dict(chunk, choices=[
+                {"index": 0, "delta": {"content": piece}, "finish_reason": None}
+            ])) + "\n\n")
+        self.write_chunk("data: " + json.dumps(dict(chunk, choices=[
+            {"index": 0, "delta": {}, "finish_reason": "stop"}
+        ])) + "\n\n")
+        if body.get("stream_options", {}).get("include_usage"):
+            self.write_chunk("data: " + json.dumps(dict(chunk, choices=[], usage=usage)) + "\n\n")
+        self.write_chunk("data: [DONE]\n\n")
+        self.end_stream()
+
+
+class AnthropicMockHandler(_MockHandler):
+    prompt_cache: Set[str] = set()  # System prompts marked cache_control, per server
+
+    def usage(self, body: Dict[str, Any]) -> Dict[str, int]:
+        """Input token counts, splitting out a cache_control system prompt like the API"""
+        system = body.get("system", "")
+        usage = {"input_tokens": self.count_input_tokens(json.dumps(body.get("messages", [])))}
+        if isinstance(system, list) and any(block.get("cache_control") for block in system):
+            text = "".join(block.get("text", "") for block in system)
+            cache_field = "cache_read_input_tokens" if text in self.prompt_cache else "cache_creation_input_tokens"
+            self.prompt_cache.add(text)
+            usage[cache_field] = self.count_input_tokens(text)
+        else:
+            usage["input_tokens"] += self.count_input_tokens(json.dumps(system))
+        return usage
+
+    def error_body(self, status: int) -> Dict[str, Any]:
+        kind = "rate_limit_error" if status == 429 else "api_error"
+        return {"type": "error", "error": {"type": kind, "message": f"mock error {status}"}}
+
+    def do_POST(self):
+        if not self.path.endswith("/v1/messages"):
+            return self.send_json(404, self.error_body(404))
+        if self.fail_if_unlucky():
+            return
+
+        body = self.read_json()
+        model = body.get("model", "claude-3-5-sonnet-20241022")
+        input_usage = self.usage(body)
+        message = {
+            "id": "msg_mock", "type": "message", "role": "assistant", "model": model,
+            "stop_sequence": None
+        }
+
+        if not body.get("stream"):
+            text = self.wait_full_response()
+            return self.send_json(200, dict(
+                message,
+                content=[{"type": "text", "text": text}],
+                stop_reason="end_turn",
+                usage=dict(input_usage, output_tokens=self.profile.chunks)
+            ))
+
+        def event(name: str, data: Dict[str, Any]):
+            self.write_chunk(f"event: {name}\ndata: {json.dumps(data)}\n\n")
+
+        self.start_stream("text/event-stream")
+        event("message_start", {"type": "message_start", "message": dict(
+            message, content=[], stop_reason=None,
+            usage=dict(input_usage, output_tokens=1)
+        )})
+        event("content_block_start", {
+            "type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}
+        })
+        for piece in self.timed_pieces():
+            event("content_block_delta", {
+                "type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": piece}
+            })
+        event("content_block_stop", {"type": "content_block_stop", "index": 0})
+        event("message_delta", {
+            "type": "message_delta",
+            "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+            "usage": {"output_tokens": self.profile.chunks}
+        })
+        event("message_stop", {"type": "message_stop"})
+        self.end_stream()
+
+
+class GeminiMockHandler(_MockHandler):
+    PATH = re.compile(r"^/v1beta/models/(?P<model>[^:]+):(?P<method>generateContent|streamGenerateContent)")
+
+    def error_body(self, status: int) -> Dict[str, Any]:
+        state = "RESOURCE_EXHAUSTED" if status == 429 else "INTERNAL"
+        return {"error": {"code": status, "message": f"mock error {status}", "status": state}}
+
+    def do_POST(self):
+        match = self.PATH.match(self.path)
+        if not match:
+            return self.send_json(404, self.error_body(404))
+        if self.fail_if_unlucky():
+            return
+
+        body = self.read_json()
+        input_tokens = self.count_input_tokens(json.dumps(body.get("contents", [])))
+
+        def response(text: str, done: bool, output_tokens: int) -> Dict[str, Any]:
+            candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+            if done:
+                candidate["finishReason"] = "STOP"
+            return {
+                "candidates": [candidate],
+                "usageMetadata": {
+                    "promptTokenCount": input_tokens,
+                    "candidatesTokenCount": output_tokens,
+                    "totalTokenCount": input_tokens + output_tokens
+                }
+            }
+
+        if match.group("method") == "generateContent":
+            text = self.wait_full_response()
+            return self.send_json(200, response(text, True, self.profile.chunks))
+
+        # The REST client reads a JSON array streamed one element at a time
+        self.start_stream("application/json")
+        last = self.profile.chunks - 1
+        for index, piece in enumerate(self.timed_pieces()):
+            prefix = "[" if index == 0 else ",\r\n"
+            self.write_chunk(prefix + json.dumps(response(piece, index == last, index + 1)))
+        self.write_chunk("]")
+        self.end_stream()
+
+
+class OllamaMockHandler(_MockHandler):
+    models = ["llama3.2:latest"]
+    loaded: Dict[str, str] = {}  # model -> expires_at, shared by all handlers of a server
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            return self.send_json(200, {"models": [{"name": name, "model": name} for name in self.models]})
+        if self.path == "/api/ps":
+            return self.send_json(200, {"models": [
+                {"name": name, "model": name, "size_vram": 2_000_000_000, "expires_at": expires_at}
+                for name, expires_at in self.loaded.items()
+            ]})
+        self.send_json(404, {"error": "not found"})
+
+    def load(self, model: str, keep_alive: Any):
+        name = model if ":" in model else f"{model}:latest"
+        pinned = keep_alive is not None and str(keep_alive).startswith("-")
+        expires = "2318-01-01T00:00:00Z" if pinned else time.strftime(
+            "%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + 300)
+        )
+        self.loaded[name] = expires
+
+    def error_body(self, status: int) -> Dict[str, Any]:
+        return {"error": f"mock error {status}"}
+
+    def do_POST(self):
+        if self.path not in ("/api/generate", "/api/chat"):
+            return self.send_json(404, {"error": "not found"})
+        if self.fail_if_unlucky():
+            return
+
+        body = self.read_json()
+        model = body.get("model", "llama3.2")
+        self.load(model, body.get("keep_alive"))
+        chat = self.path == "/api/chat"
+        prompt = " ".join(m.get("content", "") for m in body.get("messages", [])) if chat else body.get("prompt")
+        if not prompt and (chat or "prompt" not in body):
+            # Empty request: load the model and return (what warm-up sends)
+            time.sleep(self.profile.sample_ttft())
+            return self.send_json(200, {"model": model, "response": "", "done": True, "done_reason": "load"})
+
+        final = {
+            "model": model, "done": True, "done_reason": "stop",
+            "prompt_eval_count": self.count_input_tokens(prompt or ""),
+            "eval_count": self.profile.chunks
+        }
+
+        def content(text: str) -> Dict[str, Any]:
+            return {"message": {"role": "assistant", "content": text}} if chat else {"response": text}
+
+        if body.get("stream") is False:
+            text = self.wait_full_response()
+            return self.send_json(200, dict(final, **content(text)))
+
+        self.start_stream("application/x-ndjson")
+        for piece in self.timed_pieces():
+            self.write_chunk(json.dumps({"model": model, "done": False, **content(piece)}) + "\n")
+        self.write_chunk(json.dumps(dict(final, **content(""))) + "\n")
+        self.end_stream()
+
+
+class _MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request: Any, client_address: Any):
+        # Clients hanging up mid-stream (timeouts, cancelled benchmarks) are expected
+        if not isinstance(sys.exc_info()[1], (ConnectionError, TimeoutError)):
+            super().handle_error(request, client_address)
+
+
+MOCK_HANDLERS: Dict[str, Type[_MockHandler]] = {
+    "openai": OpenAIMockHandler,
+    "claude": AnthropicMockHandler,
+    "gemini": GeminiMockHandler,
+    "ollama": OllamaMockHandler
+}
+
+
+def base_url_for(kind: str, host: str, port: int) -> str:
+    """Base URL to hand to the provider (OpenAI's SDK expects the /v1 prefix)"""
+    url = f"http://{host}:{port}"
+    return url + "/v1" if kind == "openai" else url
+
+
+def start_mock_server(
+    kind: str,
+    profile: Optional[MockProfile] = None,
+    host: str = "127.0.0.1",
+    port: int = 0
+) -> Tuple[ThreadingHTTPServer, str]:
+    """Start one mock server on a daemon thread
+
+    Returns:
+        (server, base_url); call server.shutdown() to stop it
+    """
+    handler = type(f"{kind.title()}Handler", (MOCK_HANDLERS[kind],), {
+        "profile": profile or MockProfile(), "loaded": {}, "prompt_cache": set()
+    })
+    server = _MockServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name=f"mock-{kind}", daemon=True).start()
+    return server, base_url_for(kind, host, server.server_address[1])
+
+
+def start_all(profile: Optional[MockProfile] = None, host: str = "127.0.0.1") -> Dict[str, Tuple[ThreadingHTTPServer, str]]:
+    """Start one mock server per provider kind"""
+    return {kind: start_mock_server(kind, profile, host) for kind in MOCK_HANDLERS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run local mock LLM provider servers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port-base", type=int, default=9100, help="OpenAI gets this port, the others the next ones")
+    parser.add_argument("--ttft-ms", type=float, default=200.0)
+    parser.add_argument("--chunk-ms", type=float, default=20.0)
+    parser.add_argument("--chunks", type=int, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    profile = MockProfile(
+        ttft_ms=args.ttft_ms, chunk_ms=args.chunk_ms, chunks=args.chunks,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate
+    )
+    for offset, kind in enumerate(MOCK_HANDLERS):
+        _, url = start_mock_server(kind, profile, args.host, args.port_base + offset)
+        print(f"🧪 {kind:7s} mock at {url}")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Cold-Start Benchmark - Import Time and Memory per Entry Point
+
+Each target is imported in a fresh interpreter, several times, recording
+the import's wall time, the process's resident memory afterwards and which
+heavy dependencies got loaded. Targets cover the Streamlit app (its
+top-level imports, without running the script), the webhook service, the
+batch runner and the bare core package. Reports are JSON tagged with the
+git commit, like bench.harness, so regressions show up in --compare.
+
+Usage:
+    python -m bench.startup --runs 5 -o bench/results/startup.json
+    python -m bench.startup --compare bench/results/startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, Any, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.harness import git_commit
+
+# Code each target runs; "app" executes only app.py's top-level imports
+TARGETS = {
+    "python": "pass",
+    "core": "import core",
+    "app": "exec(APP_IMPORTS)",
+    "webhook": "import webhook",
+    "batch": "import batch"
+}
+
+# Dependencies whose presence after import is reported
+HEAVY_MODULES = (
+    "streamlit", "fastapi", "stripe", "numpy", "tiktoken", "openai", "anthropic",
+    "google.generativeai", "requests", "httpx", "asyncio"
+)
+
+CHILD = """
+import ast, json, sys, time
+sys.path.insert(0, {root!r})
+with open({app!r}) as f:
+    tree = ast.parse(f.read())
+APP_IMPORTS = compile(
+    ast.Module([node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))], []), {app!r}, "exec"
+)
+started = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - started
+rss_kb = 0
+with open("/proc/self/status") as f:
+    for line in f:
+        if line.startswith("VmRSS:"):
+            rss_kb = int(line.split()[1])
+if not rss_kb:
+    import resource
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{
+    "import_seconds": elapsed,
+    "rss_mb": rss_kb / 1024,
+    "modules": len(sys.modules),
+    "loaded": [name for name in {heavy!r} if name in sys.modules]
+}}))
+"""
+
+
+def measure(target: str, runs: int) -> Dict[str, Any]:
+    """Import a target `runs` times in fresh interpreters; medians plus what got loaded"""
+    script = CHILD.format(
+        root=ROOT, app=os.path.join(ROOT, "app.py"), code=TARGETS[target], heavy=HEAVY_MODULES
+    )
+    samples: List[Dict[str, Any]] = []
+    process_seconds: List[float] = []
+    # Run outside the repo so import-time side effects (e.g. analytics/ dirs) land in a scratch dir
+    with tempfile.TemporaryDirectory() as scratch:
+        for _ in range(runs):
+            started = time.perf_counter()
+            completed = subprocess.run(
+                [sys.executable, "-c", script], capture_output=True, text=True, cwd=scratch
+            )
+            process_seconds.append(time.perf_counter() - started)
+            if completed.returncode != 0:
+                error = (completed.stderr.strip().splitlines() or ["unknown error"])[-1]
+                return {"target": target, "error": error}
+            samples.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    return {
+        "target": target,
+        "import_ms": round(statistics.median(s["import_seconds"] for s in samples) * 1000, 1),
+        "process_ms": round(statistics.median(process_seconds) * 1000, 1),
+        "rss_mb": round(statistics.median(s["rss_mb"] for s in samples), 1),
+        "modules": samples[-1]["modules"],
+        "loaded": samples[-1]["loaded"]
+    }
+
+
+def run_benchmark(targets: List[str], runs: int) -> Dict[str, Any]:
+    results = []
+    for target in targets:
+        result = measure(target, runs)
+        results.append(result)
+        if "error" in result:
+            print(f"❌ {target}: {result['error']}")
+        else:
+            loaded = ", ".join(result["loaded"]) or "none"
+            print(
+                f"🚀 {target}: import {result['import_ms']}ms, process {result['process_ms']}ms, "
+                f"RSS {result['rss_mb']}MB, {result['modules']} modules (heavy: {loaded})"
+            )
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "runs": runs,
+        "targets": results
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Human-readable deltas against a previous report, matched by target"""
+    previous = {entry["target"]: entry for entry in baseline.get("targets", []) if "error" not in entry}
+    lines = [f"📊 vs {baseline.get('commit') or 'baseline'} ({baseline.get('timestamp', '?')})"]
+    for entry in report["targets"]:
+        old = previous.get(entry["target"])
+        if not old or "error" in entry:
+            continue
+        lines.append(
+            f"  {entry['target']}: import {entry['import_ms']}ms ({entry['import_ms'] - old['import_ms']:+.1f}ms), "
+            f"RSS {entry['rss_mb']}MB ({entry['rss_mb'] - old['rss_mb']:+.1f}MB)"
+        )
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start import time and memory per entry point")
+    parser.add_argument("--targets", default=",".join(TARGETS), help=f"Comma-separated subset of {', '.join(TARGETS)}")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per target (median reported)")
+    parser.add_argument("-o", "--output", help="Write the JSON report here")
+    parser.add_argument("--compare", help="Previous JSON report to compare against")
+    args = parser.parse_args()
+
+    targets = [target.strip() for target in args.targets.split(",") if target.strip()]
+    unknown = [target for target in targets if target not in TARGETS]
+    if unknown:
+        parser.error(f"Unknown targets: {', '.join(unknown)}")
+
+    report = run_benchmark(targets, args.runs)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report saved to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            print("\n".join(compare(report, json.load(f))))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,56 +1,173 @@
-"""Multi-LLM Group Chat - Core Module"""
-from .llm_providers import LLMProvider, OpenAIProvider, ClaudeProvider, GeminiProvider, OllamaProvider, get_all_providers
-from .conversation import ConversationManager
-from .pricing import TokenTracker, calculate_cost, estimate_tokens, get_pricing_info
-from .analytics import UsageLogger, get_total_users, get_total_sessions
-from .referrals import ReferralManager, generate_referral_code, generate_shareable_link
-from .affiliates import AffiliateManager, AFFILIATE_LINKS, get_landing_page_affiliate_section
-from .subscriptions import SubscriptionManager, SubscriptionTier, SUBSCRIPTION_TIERS, get_pricing_table, format_tier_features
-from .billing import (
-    create_checkout_session,
-    parse_webhook_event,
-    handle_checkout_completed,
-    handle_subscription_updated,
-    handle_subscription_deleted,
-    create_customer_portal_session,
-    get_stripe_subscription_status,
-    is_stripe_configured,
-    verify_stripe_config
-)
-
-__all__ = [
-    'LLMProvider',
-    'OpenAIProvider',
-    'ClaudeProvider',
-    'GeminiProvider',
-    'OllamaProvider',
-    'get_all_providers',
-    'ConversationManager',
-    'TokenTracker',
-    'calculate_cost',
-    'estimate_tokens',
-    'get_pricing_info',
-    'UsageLogger',
-    'get_total_users',
-    'get_total_sessions',
-    'ReferralManager',
-    'generate_referral_code',
-    'generate_shareable_link',
-    'AffiliateManager',
-    'AFFILIATE_LINKS',
-    'get_landing_page_affiliate_section',
-    'SubscriptionManager',
-    'SubscriptionTier',
-    'SUBSCRIPTION_TIERS',
-    'get_pricing_table',
-    'format_tier_features',
-    'create_checkout_session',
-    'parse_webhook_event',
-    'handle_checkout_completed',
-    'handle_subscription_updated',
-    'handle_subscription_deleted',
-    'create_customer_portal_session',
-    'get_stripe_subscription_status',
-    'is_stripe_configured',
-    'verify_stripe_config'
-]
+"""Multi-LLM Group Chat - Core Module
+
+Exports are loaded on first use (PEP 562 module __getattr__): importing
+core, or one name from it, only imports the submodules actually needed,
+so the webhook service doesn't pay for the provider stack and nothing pays
+for stripe until billing is used.
+"""
+import importlib
+from typing import Any, List, TYPE_CHECKING
+
+# The instances `telemetry` and `tokenizer` share their submodule's name.
+# Import them eagerly (both are light) so the package attribute is the
+# instance; a lazy first `import core.telemetry` elsewhere would bind the
+# module instead
+from .telemetry import telemetry
+from .tokenizer import tokenizer
+
+if TYPE_CHECKING:
+    from .llm_providers import (
+        LLMProvider,
+        ChatStream,
+        ProviderResult,
+        ProviderError,
+        OpenAIProvider,
+        ClaudeProvider,
+        GeminiProvider,
+        OllamaProvider,
+        get_all_providers,
+        fan_out,
+        fan_out_stream
+    )
+    from .cancellation import CancelToken, CancelledError
+    from .clients import ClientRegistry, client_registry
+    from .ollama import (
+        OllamaHealthMonitor,
+        OllamaHTTPPool,
+        OllamaModelManager,
+        OllamaLoadBalancer,
+        ollama_health,
+        ollama_http,
+        ollama_models,
+        ollama_balancer
+    )
+    from .cache import ResponseCache, CachedProvider, response_cache, with_cache
+    from .singleflight import SingleFlight, CoalescedProvider, single_flight, coalesce
+    from .ratelimit import RateLimiter, RateLimitRegistry, RateLimitExceeded, rate_limits
+    from .telemetry import Telemetry, Histogram, telemetry, render_text
+    from .resilience import ResilientProvider, CircuitBreaker, CircuitOpenError, resilient, circuit_states
+    from .routing import ProviderRouter, ROUTING_POLICIES
+    from .estimator import PreflightEstimator, RequestEstimate, preflight
+    from .tokenizer import TokenizerService, tokenizer
+    from .conversation import ConversationManager
+    from .ledger import UsageLedger, usage_ledger
+    from .price_sheets import PriceSheet, PriceBook, price_book
+    from .pricing import TokenTracker, calculate_cost, estimate_tokens, get_pricing_info
+    from .analytics import UsageLogger, get_total_users, get_total_sessions
+    from .referrals import ReferralManager, generate_referral_code, generate_shareable_link
+    from .affiliates import AffiliateManager, AFFILIATE_LINKS, get_landing_page_affiliate_section
+    from .subscriptions import SubscriptionManager, SubscriptionTier, SUBSCRIPTION_TIERS, get_pricing_table, format_tier_features
+    from .billing import (
+        create_checkout_session,
+        parse_webhook_event,
+        handle_checkout_completed,
+        handle_subscription_updated,
+        handle_subscription_deleted,
+        create_customer_portal_session,
+        get_stripe_subscription_status,
+        is_stripe_configured,
+        verify_stripe_config
+    )
+
+# Export name -> submodule that defines it
+_EXPORTS = {
+    'LLMProvider': 'llm_providers',
+    'ChatStream': 'llm_providers',
+    'ProviderResult': 'llm_providers',
+    'ProviderError': 'llm_providers',
+    'OpenAIProvider': 'llm_providers',
+    'ClaudeProvider': 'llm_providers',
+    'GeminiProvider': 'llm_providers',
+    'OllamaProvider': 'llm_providers',
+    'get_all_providers': 'llm_providers',
+    'CancelToken': 'cancellation',
+    'CancelledError': 'cancellation',
+    'ClientRegistry': 'clients',
+    'client_registry': 'clients',
+    'OllamaHealthMonitor': 'ollama',
+    'ollama_health': 'ollama',
+    'OllamaHTTPPool': 'ollama',
+    'ollama_http': 'ollama',
+    'OllamaModelManager': 'ollama',
+    'ollama_models': 'ollama',
+    'OllamaLoadBalancer': 'ollama',
+    'ollama_balancer': 'ollama',
+    'fan_out': 'llm_providers',
+    'fan_out_stream': 'llm_providers',
+    'ResponseCache': 'cache',
+    'CachedProvider': 'cache',
+    'response_cache': 'cache',
+    'with_cache': 'cache',
+    'SingleFlight': 'singleflight',
+    'CoalescedProvider': 'singleflight',
+    'single_flight': 'singleflight',
+    'coalesce': 'singleflight',
+    'RateLimiter': 'ratelimit',
+    'RateLimitRegistry': 'ratelimit',
+    'RateLimitExceeded': 'ratelimit',
+    'rate_limits': 'ratelimit',
+    'Telemetry': 'telemetry',
+    'Histogram': 'telemetry',
+    'telemetry': 'telemetry',
+    'render_text': 'telemetry',
+    'ResilientProvider': 'resilience',
+    'CircuitBreaker': 'resilience',
+    'CircuitOpenError': 'resilience',
+    'resilient': 'resilience',
+    'circuit_states': 'resilience',
+    'ProviderRouter': 'routing',
+    'ROUTING_POLICIES': 'routing',
+    'PreflightEstimator': 'estimator',
+    'RequestEstimate': 'estimator',
+    'preflight': 'estimator',
+    'TokenizerService': 'tokenizer',
+    'tokenizer': 'tokenizer',
+    'ConversationManager': 'conversation',
+    'UsageLedger': 'ledger',
+    'usage_ledger': 'ledger',
+    'PriceSheet': 'price_sheets',
+    'PriceBook': 'price_sheets',
+    'price_book': 'price_sheets',
+    'TokenTracker': 'pricing',
+    'calculate_cost': 'pricing',
+    'estimate_tokens': 'pricing',
+    'get_pricing_info': 'pricing',
+    'UsageLogger': 'analytics',
+    'get_total_users': 'analytics',
+    'get_total_sessions': 'analytics',
+    'ReferralManager': 'referrals',
+    'generate_referral_code': 'referrals',
+    'generate_shareable_link': 'referrals',
+    'AffiliateManager': 'affiliates',
+    'AFFILIATE_LINKS': 'affiliates',
+    'get_landing_page_affiliate_section': 'affiliates',
+    'SubscriptionManager': 'subscriptions',
+    'SubscriptionTier': 'subscriptions',
+    'SUBSCRIPTION_TIERS': 'subscriptions',
+    'get_pricing_table': 'subscriptions',
+    'format_tier_features': 'subscriptions',
+    'create_checkout_session': 'billing',
+    'parse_webhook_event': 'billing',
+    'handle_checkout_completed': 'billing',
+    'handle_subscription_updated': 'billing',
+    'handle_subscription_deleted': 'billing',
+    'create_customer_portal_session': 'billing',
+    'get_stripe_subscription_status': 'billing',
+    'is_stripe_configured': 'billing',
+    'verify_stripe_config': 'billing'
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value  # Later lookups skip __getattr__
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -3,7 +3,10 @@ import json
 import os
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .llm_providers import ProviderResult
 
 
 class UsageLogger:
@@ -26,9 +29,14 @@ class UsageLogger:
         prompt: str,
         providers_used: list,
         tokens_used: Dict[str, int],
-        cost: float
+        cost: float,
+        results: Optional[Dict[str, "ProviderResult"]] = None
     ):
-        """Log a single interaction"""
+        """Log a single interaction
+
+        results: per-provider ProviderResult; their metrics (not the response
+        text) are stored under provider_metrics
+        """
         interaction = {
             "timestamp": datetime.now().isoformat(),
             "prompt_preview": prompt[:100],  # Privacy: only store preview
@@ -37,6 +45,21 @@ class UsageLogger:
             "tokens_used": tokens_used,
             "cost": cost
         }
+        if results:
+            interaction["provider_metrics"] = {
+                name: {
+                    "model": result.model,
+                    "latency": result.latency,
+                    "ttft": result.ttft,
+                    "input_tokens": result.input_tokens,
+                    "output_tokens": result.output_tokens,
+                    "cached_input_tokens": result.cached_input_tokens,
+                    "finish_reason": result.finish_reason,
+                    "error_type": result.error_type,
+                    "cached": result.cached
+                }
+                for name, result in results.items()
+            }
         self.session_data["interactions"].append(interaction)
         self._save_session()
 
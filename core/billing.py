@@ -1,12 +1,14 @@
 """Stripe Billing Integration - Real Payment Rails"""
 import os
-import stripe
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, TYPE_CHECKING
 from datetime import datetime
 
+if TYPE_CHECKING:
+    import stripe
 
-# Initialize Stripe with secret key from environment
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+
+# Stripe secret key from environment (set on the SDK when it is first used)
+STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
 
 # Stripe price IDs from environment
 STRIPE_PRICES = {
@@ -23,6 +25,15 @@ STRIPE_SUCCESS_URL = os.getenv("STRIPE_SUCCESS_URL", os.getenv("APP_URL", "http:
 STRIPE_CANCEL_URL = os.getenv("STRIPE_CANCEL_URL", os.getenv("APP_URL", "http://localhost:8501") + "?billing=cancel")
 
 
+def _stripe():
+    """The stripe SDK, imported on first use (slow to import; most requests never need it)"""
+    import stripe
+
+    if stripe.api_key is None:
+        stripe.api_key = STRIPE_SECRET_KEY
+    return stripe
+
+
 def create_checkout_session(email: str, tier: str, subscription_manager) -> Optional[str]:
     """Create Stripe checkout session for subscription upgrade
 
@@ -34,6 +45,7 @@ def create_checkout_session(email: str, tier: str, subscription_manager) -> Opti
     Returns:
         Checkout session URL or None if error
     """
+    stripe = _stripe()
     if not stripe.api_key:
         raise ValueError("STRIPE_SECRET_KEY not configured")
 
@@ -80,7 +92,7 @@ def create_checkout_session(email: str, tier: str, subscription_manager) -> Opti
         return None
 
 
-def parse_webhook_event(payload: bytes, sig_header: str) -> Optional[stripe.Event]:
+def parse_webhook_event(payload: bytes, sig_header: str) -> Optional["stripe.Event"]:
     """Parse and verify Stripe webhook event
 
     Args:
@@ -93,6 +105,8 @@ def parse_webhook_event(payload: bytes, sig_header: str) -> Optional[stripe.Even
     if not STRIPE_WEBHOOK_SECRET:
         raise ValueError("STRIPE_WEBHOOK_SECRET not configured")
 
+    stripe = _stripe()
+
     try:
         event = stripe.Webhook.construct_event(
             payload,
@@ -109,7 +123,7 @@ def parse_webhook_event(payload: bytes, sig_header: str) -> Optional[stripe.Even
         return None
 
 
-def handle_checkout_completed(event: stripe.Event, subscription_manager) -> bool:
+def handle_checkout_completed(event: "stripe.Event", subscription_manager) -> bool:
     """Handle successful checkout completion
 
     When customer completes payment:
@@ -165,7 +179,7 @@ def handle_checkout_completed(event: stripe.Event, subscription_manager) -> bool
         return False
 
 
-def handle_subscription_updated(event: stripe.Event, subscription_manager) -> bool:
+def handle_subscription_updated(event: "stripe.Event", subscription_manager) -> bool:
     """Handle subscription update events
 
     Triggered when:
@@ -223,7 +237,7 @@ def handle_subscription_updated(event: stripe.Event, subscription_manager) -> bo
         return False
 
 
-def handle_subscription_deleted(event: stripe.Event, subscription_manager) -> bool:
+def handle_subscription_deleted(event: "stripe.Event", subscription_manager) -> bool:
     """Handle subscription deletion/cancellation
 
     When customer cancels:
@@ -280,6 +294,7 @@ def create_customer_portal_session(email: str, subscription_manager) -> Optional
     Returns:
         Customer portal URL or None if error
     """
+    stripe = _stripe()
     if not stripe.api_key:
         raise ValueError("STRIPE_SECRET_KEY not configured")
 
@@ -336,6 +351,7 @@ def get_stripe_subscription_status(email: str, subscription_manager) -> Dict[str
             "tier": subscription.get('tier', 'free')
         }
 
+    stripe = _stripe()
     try:
         # Fetch live status from Stripe
         stripe_sub = stripe.Subscription.retrieve(stripe_sub_id)
@@ -365,7 +381,7 @@ def verify_stripe_config() -> Dict[str, bool]:
         Dictionary showing which config values are set
     """
     return {
-        "stripe_secret_key": bool(stripe.api_key),
+        "stripe_secret_key": bool(STRIPE_SECRET_KEY),
         "webhook_secret": bool(STRIPE_WEBHOOK_SECRET),
         "price_premium": bool(STRIPE_PRICES.get("premium")),
         "price_team": bool(STRIPE_PRICES.get("team")),
@@ -0,0 +1,249 @@
+"""Response Cache - Skip Upstream Calls for Repeated Prompts
+
+Identical (provider, model, prompt, params) requests are answered from an
+in-memory LRU, backed by an optional on-disk tier that survives restarts.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Dict, Any, Iterator, Tuple
+
+from .cancellation import CancelToken
+from .clients import hash_api_key
+from .llm_providers import LLMProvider, ChatStream, Messages
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + optional disk) cache of successful responses"""
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl: float = 3600.0,
+        disk_dir: Optional[str] = None,
+        max_disk_entries: int = 5000
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+    @staticmethod
+    def make_key(
+        provider: str,
+        model: str,
+        prompt: str,
+        params: Optional[Dict[str, Any]] = None,
+        history: Optional[Messages] = None,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None
+    ) -> str:
+        """Stable digest of everything that affects the response
+
+        The API key (hashed) and endpoint are part of the key, so a response
+        is only reused by callers who could have made the same call
+        themselves, and each key pays for its own requests.
+        """
+        request = {
+            "provider": provider.lower(), "model": model, "prompt": prompt, "params": params or {},
+            "api_key": hash_api_key(api_key), "base_url": base_url or ""
+        }
+        if history:
+            request["history"] = history
+        payload = json.dumps(request, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Cached response, or None on miss or expiry"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[1] < self.ttl:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry:
+                del self._memory[key]
+
+        response = self._disk_get(key, now)
+
+        with self._lock:
+            if response is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._memory_set(key, response, now)
+            return response
+
+    def set(self, key: str, response: str):
+        """Store a successful response in both tiers"""
+        now = time.time()
+        with self._lock:
+            self._memory_set(key, response, now)
+        self._disk_set(key, response, now)
+
+    def clear(self):
+        """Drop all entries and reset counters"""
+        with self._lock:
+            self._memory.clear()
+            self.hits = self.misses = self.disk_hits = 0
+        if self.disk_dir:
+            for path in self.disk_dir.glob("*.json"):
+                path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and tier sizes"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory)
+            }
+
+    def _memory_set(self, key: str, response: str, now: float):
+        """Insert into the LRU (caller holds the lock)"""
+        self._memory[key] = (response, now)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, key: str, now: float) -> Optional[str]:
+        if not self.disk_dir:
+            return None
+        path = self.disk_dir / f"{key}.json"
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if now - entry.get("created_at", 0) >= self.ttl:
+            path.unlink(missing_ok=True)
+            return None
+        return entry.get("response")
+
+    def _disk_set(self, key: str, response: str, now: float):
+        if not self.disk_dir:
+            return
+        try:
+            tmp_path = self.disk_dir / f"{key}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({"created_at": now, "response": response}, f)
+            os.replace(tmp_path, self.disk_dir / f"{key}.json")
+            self._disk_evict()
+        except OSError as e:
+            logger.warning(f"Failed to write response cache entry: {e}")
+
+    def _disk_evict(self):
+        """Remove the oldest files once the disk tier exceeds its size"""
+        paths = list(self.disk_dir.glob("*.json"))
+        overflow = len(paths) - self.max_disk_entries
+        if overflow <= 0:
+            return
+        paths.sort(key=lambda p: p.stat().st_mtime)
+        for path in paths[:overflow]:
+            path.unlink(missing_ok=True)
+
+
+class CachedProvider(LLMProvider):
+    """Wrap a provider so identical requests are served from a ResponseCache"""
+
+    def __init__(self, provider: LLMProvider, cache: ResponseCache, params: Optional[Dict[str, Any]] = None):
+        super().__init__(provider.api_key, provider.model)
+        self.provider = provider
+        self.cache = cache
+        self.params = params
+        self.name = provider.name
+        self.base_url = provider.base_url
+
+    def is_configured(self) -> bool:
+        return self.provider.is_configured()
+
+    def cache_key(self, prompt: str, history: Optional[Messages] = None) -> str:
+        return self.cache.make_key(
+            self.name, self.model, prompt, self.params, history, self.api_key, self.base_url
+        )
+
+    def chat(
+        self,
+        prompt: str,
+        stream: bool = False,
+        bypass_cache: bool = False,
+        history: Optional[Messages] = None
+    ) -> str:
+        key = self.cache_key(prompt, history)
+        if not bypass_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        response = self.provider.chat(prompt, history=history)
+        if not response.startswith("❌"):
+            self.cache.set(key, response)
+        return response
+
+    def stream_chat(
+        self,
+        prompt: str,
+        bypass_cache: bool = False,
+        history: Optional[Messages] = None,
+        cancel: Optional[CancelToken] = None
+    ) -> ChatStream:
+        """Replay a cached response as one delta, or stream and cache on success"""
+        cancel = cancel or CancelToken()
+        key = self.cache_key(prompt, history)
+        if not bypass_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                stream = ChatStream(self.name, lambda usage: iter([cached]), self.model, cancel)
+                stream.cached = True
+                return stream
+
+        # Shares the token, so cancelling the returned stream aborts the upstream call
+        inner = self.provider.stream_chat(prompt, history=history, cancel=cancel)
+
+        def deltas(usage: Dict[str, Any]) -> Iterator[str]:
+            for delta in inner:
+                if inner.error:
+                    # Keep the upstream failure's type rather than a generic ProviderError
+                    stream.error_type = inner.error_type
+                yield delta
+            usage.update(inner.usage)
+            if not inner.error:
+                self.cache.set(key, inner.text)
+
+        stream = ChatStream(self.name, deltas, self.model, cancel)
+        stream.cached = inner.cached
+        return stream
+
+
+def with_cache(
+    providers: Dict[str, LLMProvider],
+    cache: Optional[ResponseCache] = None
+) -> Dict[str, LLMProvider]:
+    """Wrap every provider in a CachedProvider sharing one cache"""
+    cache = cache or response_cache
+    return {name: CachedProvider(provider, cache) for name, provider in providers.items()}
+
+
+# Process-wide cache shared by all sessions; set RESPONSE_CACHE_DIR to persist it
+response_cache = ResponseCache(disk_dir=os.getenv("RESPONSE_CACHE_DIR") or None)
@@ -0,0 +1,99 @@
+"""Cancellation - Stop Paying for Answers Nobody Will Read
+
+A CancelToken is shared by one provider call and every wrapper around it.
+Cancelling it (user reran the script, navigated away, a deadline passed)
+closes the call's in-flight HTTP response from whichever thread notices, so
+the worker blocked reading it wakes up immediately, the provider stops
+generating, and the call ends with CancelledError instead of running on in
+the background.
+"""
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Optional, Callable, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+
+class CancelledError(Exception):
+    """Raised inside a provider call whose CancelToken was cancelled"""
+
+
+class CancelToken:
+    """Thread-safe cancellation flag with callbacks that abort in-flight I/O"""
+
+    def __init__(self):
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled"):
+        """Set the flag and run every registered callback once"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.debug(f"Ignoring error from cancel callback: {e}")
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Run callback when cancelled (now, if already cancelled)
+
+        Returns:
+            Function that unregisters the callback
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback()
+        return lambda: None
+
+    def _remove(self, callback: Callable[[], None]):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def child(self) -> "CancelToken":
+        """Token cancelled with this one that can also be cancelled on its own"""
+        token = CancelToken()
+        unregister = self.on_cancel(lambda: token.cancel(self.reason or "cancelled"))
+        token.on_cancel(unregister)
+        return token
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise CancelledError(self.reason)
+
+    def sleep(self, seconds: float):
+        """time.sleep() that ends early with CancelledError"""
+        if self._event.wait(seconds):
+            raise CancelledError(self.reason)
+
+
+@contextmanager
+def abort_on_cancel(cancel: Optional[CancelToken], close: Callable[[], None]) -> Iterator[None]:
+    """Close an in-flight response when cancel fires; the read error it causes becomes CancelledError"""
+    if cancel is None:
+        yield
+        return
+    unregister = cancel.on_cancel(close)
+    try:
+        yield
+    except Exception as e:
+        if cancel.cancelled:
+            raise CancelledError(cancel.reason) from e
+        raise
+    finally:
+        unregister()
+    cancel.raise_if_cancelled()
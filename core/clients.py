@@ -0,0 +1,115 @@
+"""Shared Provider Client Registry - Keep Connections Warm
+
+SDK clients own HTTP connection pools and TLS sessions, so rebuilding them on
+every Streamlit rerun throws that work away. The registry hands out one client
+per (provider, API key, model) for the whole process.
+"""
+import hashlib
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ClientKey = Tuple[str, str, str]
+
+
+def hash_api_key(api_key: Optional[str]) -> str:
+    """Short stable digest so raw keys never sit in registry keys or logs"""
+    if not api_key:
+        return ""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+class ClientRegistry:
+    """Thread-safe LRU of SDK clients with size bound and idle eviction"""
+
+    def __init__(self, max_size: int = 64, idle_ttl: float = 1800.0):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self._clients: "OrderedDict[ClientKey, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_create(
+        self,
+        provider: str,
+        api_key: Optional[str],
+        model: str,
+        factory: Callable[[], Any]
+    ) -> Any:
+        """Return the cached client for this key, building it on first use
+
+        Args:
+            provider: Provider name (e.g. "openai")
+            api_key: Raw API key; only its hash is stored
+            model: Model name for model-bound clients, "" for clients that serve any model
+            factory: Builds a new client; exceptions propagate to the caller
+
+        Returns:
+            Shared client instance
+        """
+        key = (provider, hash_api_key(api_key), model)
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict_idle(now)
+
+            if key in self._clients:
+                client, _ = self._clients.pop(key)
+                self._clients[key] = (client, now)
+                return client
+
+            client = factory()
+            self._clients[key] = (client, now)
+
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+
+            return client
+
+    def evict(self, provider: str, api_key: Optional[str], model: str = ""):
+        """Drop a client, e.g. after its key was revoked"""
+        key = (provider, hash_api_key(api_key), model)
+        with self._lock:
+            entry = self._clients.pop(key, None)
+        if entry:
+            self._close(key, entry[0])
+
+    def clear(self):
+        """Close and drop every client"""
+        with self._lock:
+            entries = list(self._clients.items())
+            self._clients.clear()
+        for key, (client, _) in entries:
+            self._close(key, client)
+
+    def stats(self) -> Dict[str, int]:
+        """Registry size for diagnostics"""
+        with self._lock:
+            return {"clients": len(self._clients), "max_size": self.max_size}
+
+    def _evict_idle(self, now: float):
+        """Drop clients unused for longer than idle_ttl (caller holds the lock)"""
+        # Entries are in least-recently-used order, so stop at the first fresh one.
+        # Evicted clients are not closed here: a request may still hold one, and
+        # the SDKs close their connection pools when the client is collected.
+        while self._clients:
+            key, (_, last_used) = next(iter(self._clients.items()))
+            if now - last_used < self.idle_ttl:
+                break
+            del self._clients[key]
+
+    @staticmethod
+    def _close(key: ClientKey, client: Any):
+        close = getattr(client, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception as e:
+                logger.warning(f"Failed to close {key[0]} client: {e}")
+
+
+# Process-wide registry shared by all sessions
+client_registry = ClientRegistry()
@@ -2,9 +2,25 @@
 import json
 import os
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 
+from .tokenizer import tokenizer
+
+# History sent per provider in multi-turn mode, in tokens. Local models get a
+# small window since Ollama's default context is only a few thousand tokens.
+HISTORY_TOKEN_BUDGETS = {
+    "OpenAI": 8000,
+    "Claude": 8000,
+    "Gemini": 8000,
+    "Ollama": 1500,
+}
+DEFAULT_HISTORY_BUDGET = 4000
+
+# Share of the budget for the one-line recap of turns that no longer fit
+SUMMARY_BUDGET_SHARE = 0.1
+SUMMARY_PROMPT_CHARS = 120
+
 
 class ConversationManager:
     """Manage conversation history with persistence"""
@@ -13,6 +29,8 @@ class ConversationManager:
         self.storage_dir = Path(storage_dir)
         self.storage_dir.mkdir(exist_ok=True)
         self.current_conversation: List[Dict[str, Any]] = []
+        # (turn index, provider, model) -> tokens of that turn's prompt + reply
+        self._turn_tokens: Dict[Tuple[int, str, str], int] = {}
 
     def add_message(self, prompt: str, responses: Dict[str, str]):
         """Add a new message exchange to conversation"""
@@ -30,6 +48,72 @@ class ConversationManager:
     def clear_history(self):
         """Clear current conversation"""
         self.current_conversation = []
+        self._turn_tokens.clear()
+
+    def build_messages(self, provider: str, model: str, budget: Optional[int] = None) -> List[Dict[str, str]]:
+        """Earlier turns as chat messages for one provider, newest first within budget
+
+        Only turns where this provider answered successfully are included,
+        with its own reply as the assistant message. Turns that don't fit are
+        recapped in a short system message listing the earlier questions.
+        Token counts per turn are cached, so each new question only counts
+        the turns added since the last call.
+
+        Args:
+            provider: Provider display name (key in each turn's responses)
+            model: Model used for token counting
+            budget: Max history tokens (default: HISTORY_TOKEN_BUDGETS)
+
+        Returns:
+            [{"role": ..., "content": ...}] oldest first, without the new prompt
+        """
+        if budget is None:
+            budget = HISTORY_TOKEN_BUDGETS.get(provider, DEFAULT_HISTORY_BUDGET)
+        summary_budget = int(budget * SUMMARY_BUDGET_SHARE)
+
+        kept: List[int] = []
+        dropped: List[int] = []
+        used = 0
+        for index in range(len(self.current_conversation) - 1, -1, -1):
+            reply = self.current_conversation[index]["responses"].get(provider)
+            if not reply or reply.startswith("❌"):
+                continue
+            tokens = self._count_turn(index, provider, model)
+            if not dropped and used + tokens <= budget - summary_budget:
+                kept.append(index)
+                used += tokens
+            else:
+                dropped.append(index)
+
+        messages: List[Dict[str, str]] = []
+        if dropped:
+            messages.append({"role": "system", "content": self._recap(dropped, summary_budget)})
+        for index in reversed(kept):
+            entry = self.current_conversation[index]
+            messages.append({"role": "user", "content": entry["prompt"]})
+            messages.append({"role": "assistant", "content": entry["responses"][provider]})
+        return messages
+
+    def _count_turn(self, index: int, provider: str, model: str) -> int:
+        key = (index, provider, model)
+        if key not in self._turn_tokens:
+            entry = self.current_conversation[index]
+            self._turn_tokens[key] = sum(tokenizer.count_batch([entry["prompt"], entry["responses"][provider]], model))
+        return self._turn_tokens[key]
+
+    def _recap(self, indexes: List[int], budget: int) -> str:
+        """Earlier questions (indexes newest first), most recent ones kept within ~budget tokens"""
+        lines = []
+        remaining = budget * 4  # ~4 characters per token
+        for index in indexes:
+            prompt = " ".join(self.current_conversation[index]["prompt"].split())
+            if len(prompt) > SUMMARY_PROMPT_CHARS:
+                prompt = prompt[:SUMMARY_PROMPT_CHARS - 1] + "…"
+            remaining -= len(prompt) + 3
+            if remaining < 0:
+                break
+            lines.append(f"- {prompt}")
+        return "Earlier in this conversation the user asked:\n" + "\n".join(reversed(lines))
 
     def save_conversation(self, name: Optional[str] = None) -> str:
         """Save conversation to file"""
@@ -51,6 +135,7 @@ class ConversationManager:
         try:
             with open(filepath, 'r') as f:
                 self.current_conversation = json.load(f)
+            self._turn_tokens.clear()
             return True
         except Exception as e:
             print(f"Failed to load conversation: {e}")
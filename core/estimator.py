@@ -0,0 +1,156 @@
+"""Pre-flight Estimates - Cost and Latency Before Any Upstream Call
+
+Users otherwise only learn what a question cost after every provider has
+answered. PreflightEstimator predicts it locally in milliseconds: input
+tokens from the tokenizer service, expected output tokens from each model's
+recent reply lengths (telemetry), cost from PRICING and latency from recent
+p50s. The app shows the estimate before the question is sent and checks it
+against the user's daily budget, so a question that would be rejected never
+reaches a provider.
+"""
+import logging
+from typing import Optional, Dict, Any, List
+
+from .llm_providers import LLMProvider, Messages
+from .pricing import calculate_cost
+from .routing import MIN_SAMPLES
+from .telemetry import telemetry
+from .tokenizer import tokenizer
+
+logger = logging.getLogger(__name__)
+
+# Reply length assumed for models without recent calls
+DEFAULT_OUTPUT_TOKENS = 500
+
+# Seconds of telemetry used for reply lengths and latency
+ESTIMATE_WINDOW = 24 * 3600.0
+
+# Framing tokens each chat message adds (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+class CallEstimate:
+    """Predicted tokens, cost and latency for one provider"""
+
+    __slots__ = ("provider", "model", "input_tokens", "output_tokens", "cost", "latency", "measured")
+
+    def __init__(
+        self,
+        provider: str,
+        model: str,
+        input_tokens: int,
+        output_tokens: int,
+        cost: float,
+        latency: Optional[float],
+        measured: bool
+    ):
+        self.provider = provider
+        self.model = model
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.cost = cost
+        self.latency = latency
+        self.measured = measured
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def describe(self) -> str:
+        """Short status line for UIs"""
+        latency = f"~{self.latency:.1f}s" if self.latency is not None else "latency unknown"
+        return (
+            f"{self.provider}: {self.input_tokens:,} in + ~{self.output_tokens:,} out tokens, "
+            f"${self.cost:.4f}, {latency}"
+        )
+
+    def __repr__(self) -> str:
+        return f"CallEstimate({self.describe()})"
+
+
+class RequestEstimate:
+    """Estimates for every provider asked in parallel"""
+
+    __slots__ = ("calls",)
+
+    def __init__(self, calls: List[CallEstimate]):
+        self.calls = calls
+
+    @property
+    def cost(self) -> float:
+        return sum(call.cost for call in self.calls)
+
+    @property
+    def latency(self) -> Optional[float]:
+        """Slowest known provider: the request finishes when it does"""
+        latencies = [call.latency for call in self.calls if call.latency is not None]
+        return max(latencies) if latencies else None
+
+    @property
+    def input_tokens(self) -> int:
+        return sum(call.input_tokens for call in self.calls)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"cost": self.cost, "latency": self.latency, "calls": [call.to_dict() for call in self.calls]}
+
+    def describe(self) -> str:
+        latency = f", ~{self.latency:.1f}s" if self.latency is not None else ""
+        return f"~${self.cost:.4f} for {len(self.calls)} model{'s' if len(self.calls) != 1 else ''}{latency}"
+
+
+class PreflightEstimator:
+    """Predict a request's cost and latency from local data only
+
+    Args:
+        window: Seconds of telemetry to learn reply lengths and latency from
+        default_output_tokens: Reply length assumed for unmeasured models
+    """
+
+    def __init__(self, window: float = ESTIMATE_WINDOW, default_output_tokens: int = DEFAULT_OUTPUT_TOKENS):
+        self.window = window
+        self.default_output_tokens = default_output_tokens
+
+    def input_tokens(self, prompt: str, model: Optional[str], history: Optional[Messages] = None) -> int:
+        """Tokens sent upstream for prompt plus history"""
+        texts = [message["content"] for message in history or []] + [prompt]
+        return sum(tokenizer.count_batch(texts, model)) + MESSAGE_OVERHEAD_TOKENS * len(texts)
+
+    def estimate_call(
+        self,
+        name: str,
+        provider: LLMProvider,
+        prompt: str,
+        history: Optional[Messages] = None
+    ) -> CallEstimate:
+        """Estimate for one provider (name is its PRICING provider, any case)"""
+        model = provider.model or ""
+        recent = telemetry.recent(provider.name, provider.model, self.window)
+        measured = recent["calls"] >= MIN_SAMPLES and recent["output_tokens_avg"] is not None
+
+        input_tokens = self.input_tokens(prompt, model, history)
+        output_tokens = round(recent["output_tokens_avg"]) if measured else self.default_output_tokens
+        return CallEstimate(
+            provider=name,
+            model=model,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            cost=calculate_cost(input_tokens, output_tokens, model, name),
+            latency=recent["latency_p50"] if measured else None,
+            measured=measured
+        )
+
+    def estimate(
+        self,
+        providers: Dict[str, LLMProvider],
+        prompt: str,
+        histories: Optional[Dict[str, Messages]] = None
+    ) -> RequestEstimate:
+        """Estimate for asking every provider (histories per provider name, like fan_out_stream)"""
+        histories = histories or {}
+        return RequestEstimate([
+            self.estimate_call(name, provider, prompt, histories.get(name))
+            for name, provider in providers.items()
+        ])
+
+
+# Process-wide estimator shared by all sessions
+preflight = PreflightEstimator()
@@ -0,0 +1,428 @@
+"""Usage Ledger - Columnar, Append-Only Record of Every Billed Call
+
+One row per provider call (timestamp, provider, model, user, token counts,
+cost), stored as NumPy columns with provider/model/user names interned to
+small integer ids. Aggregations by provider, model, user and time bucket
+are vectorized (np.unique + np.bincount), so admin reporting across all
+users is one scan instead of Python loops over nested dicts. With
+persistence enabled, rows are appended to a fixed-width binary file as they
+are recorded and reloaded at startup, so usage survives restarts.
+
+Several processes (app replicas) may share one ledger directory. Writers
+take an exclusive lock on it and first read in the names and rows other
+processes added, so name ids agree everywhere and row i in memory is
+record i on disk.
+"""
+import json
+import os
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Dict, Any, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, so one process per ledger directory
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Where the app persists the process-wide ledger
+USAGE_LEDGER_DIR = os.getenv("USAGE_LEDGER_DIR", "analytics/usage_ledger")
+
+# On-disk row layout (little-endian, packed: 41 bytes per call)
+RECORD = np.dtype([
+    ("timestamp", "<f8"),
+    ("provider", "<u2"),
+    ("model", "<u2"),
+    ("user", "<u4"),
+    ("input_tokens", "<u4"),
+    ("output_tokens", "<u4"),
+    ("cached_input_tokens", "<u4"),
+    ("cache_write_tokens", "<u4"),
+    ("cost", "<f8"),
+    ("flags", "u1")
+])
+
+# Bits of the "flags" column (bit 0 is the former boolean "cached" column)
+FLAG_CACHED = 1  # Served from our response cache: nothing billed
+FLAG_BATCH = 2  # Sent through the provider's batch API, billed at batch rates
+
+# Columns holding interned names, and the summed measures
+KEY_COLUMNS = ("provider", "model", "user")
+SUM_COLUMNS = ("input_tokens", "output_tokens", "cached_input_tokens", "cache_write_tokens", "cost")
+
+INITIAL_CAPACITY = 1024
+
+
+class UsageLedger:
+    """Append-only usage rows in NumPy columns with vectorized group-by
+
+    Thread-safe; one instance is shared by every session in the process.
+    User id 0 is the anonymous user ("").
+    """
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        self._columns: Dict[str, np.ndarray] = {
+            name: np.zeros(capacity, dtype=RECORD.fields[name][0]) for name in RECORD.names
+        }
+        self._size = 0
+        self._names: Dict[str, List[str]] = {"provider": [], "model": [], "user": [""]}
+        self._ids: Dict[str, Dict[str, int]] = {"provider": {}, "model": {}, "user": {"": 0}}
+        self._lock = threading.Lock()
+        self.path: Optional[Path] = None
+        self._names_offset = 0  # Bytes of names.jsonl already interned
+        self._file_rows = 0  # Records of records.bin already read in or written
+        self._records_id: Optional[Tuple[int, int]] = None  # (device, inode) of records.bin
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(
+        self,
+        provider: str,
+        model: str,
+        input_tokens: int,
+        output_tokens: int,
+        cost: float,
+        user: Optional[str] = None,
+        cached_input_tokens: int = 0,
+        cache_write_tokens: int = 0,
+        cached: bool = False,
+        batch: bool = False,
+        timestamp: Optional[float] = None
+    ):
+        """Record one call"""
+        row = {
+            "timestamp": timestamp if timestamp is not None else time.time(),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cached_input_tokens": cached_input_tokens,
+            "cache_write_tokens": cache_write_tokens,
+            "cost": cost,
+            "flags": (FLAG_CACHED if cached else 0) | (FLAG_BATCH if batch else 0)
+        }
+        with self._lock, self._file_lock():
+            if self.path is not None:
+                self._sync()  # Take ids and row numbers other processes assigned first
+
+            new_names = []
+            for column, name in (("provider", provider), ("model", model or ""), ("user", user or "")):
+                if name not in self._ids[column]:
+                    self._ids[column][name] = len(self._names[column])
+                    self._names[column].append(name)
+                    new_names.append({"column": column, "name": name})
+                row[column] = self._ids[column][name]
+
+            self._ensure_capacity(self._size + 1)
+            for column, value in row.items():
+                self._columns[column][self._size] = value
+            self._size += 1
+
+            if self.path is not None:
+                self._persist(row, new_names)
+
+    def aggregate(
+        self,
+        by: Sequence[str] = ("provider", "model"),
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        user: Optional[str] = None,
+        bucket: Optional[float] = None,
+        costs: Optional[np.ndarray] = None
+    ) -> List[Dict[str, Any]]:
+        """Totals per group, in key order
+
+        Args:
+            by: Any of "provider", "model", "user" and "bucket"; () for one grand total
+            since / until: Unix time range [since, until)
+            user: Only this user's rows
+            bucket: Time bucket width in seconds for "bucket" (default: one day)
+            costs: Per-row costs to sum instead of the recorded ones (e.g.
+                PriceBook.recompute()); rows added after it was computed are left out
+
+        Returns:
+            [{<by columns>, "requests", "cached_requests", <SUM_COLUMNS>}];
+            "bucket" is the bucket's start time
+        """
+        columns, names = self.snapshot()
+        if costs is not None:
+            columns = {name: column[:len(costs)] for name, column in columns.items()}
+            columns["cost"] = costs
+        mask = np.ones(len(columns["timestamp"]), dtype=bool)
+        if since is not None:
+            mask &= columns["timestamp"] >= since
+        if until is not None:
+            mask &= columns["timestamp"] < until
+        if user is not None:
+            user_id = self._ids["user"].get(user)
+            if user_id is None:
+                return []
+            mask &= columns["user"] == user_id
+        if not mask.any():
+            return []
+
+        bucket = bucket or 86400.0
+        keys = []
+        for column in by:
+            if column == "bucket":
+                keys.append(np.floor(columns["timestamp"][mask] / bucket).astype(np.int64))
+            elif column in KEY_COLUMNS:
+                keys.append(columns[column][mask].astype(np.int64))
+            else:
+                raise ValueError(f"Cannot group usage by {column!r}")
+
+        if keys:
+            groups, inverse = _group(keys)
+        else:
+            groups = np.zeros((1, 0), dtype=np.int64)
+            inverse = np.zeros(int(mask.sum()), dtype=np.int64)
+
+        count = len(groups)
+        requests = np.bincount(inverse, minlength=count)
+        cached_requests = np.bincount(inverse, weights=columns["flags"][mask] & FLAG_CACHED, minlength=count)
+        sums = {column: np.bincount(inverse, weights=columns[column][mask], minlength=count) for column in SUM_COLUMNS}
+
+        rows = []
+        for index in range(count):
+            row: Dict[str, Any] = {}
+            for position, column in enumerate(by):
+                key = int(groups[index, position])
+                row[column] = key * bucket if column == "bucket" else names[column][key]
+            row["requests"] = int(requests[index])
+            row["cached_requests"] = int(cached_requests[index])
+            for column in SUM_COLUMNS:
+                row[column] = float(sums[column][index]) if column == "cost" else int(sums[column][index])
+            rows.append(row)
+        return rows
+
+    def totals(self, **filters: Any) -> Dict[str, Any]:
+        """Grand total over matching rows (aggregate() filters)"""
+        rows = self.aggregate(by=(), **filters)
+        if rows:
+            return rows[0]
+        empty: Dict[str, Any] = {"requests": 0, "cached_requests": 0}
+        empty.update({column: 0.0 if column == "cost" else 0 for column in SUM_COLUMNS})
+        return empty
+
+    def total_cost(self, **filters: Any) -> float:
+        columns, _ = self.snapshot()
+        if not filters:
+            return float(columns["cost"].sum())
+        return self.totals(**filters)["cost"]
+
+    def restate(self, costs: np.ndarray) -> int:
+        """Replace the recorded cost of the first len(costs) rows, on disk too
+
+        costs must be aligned with this ledger's rows (e.g. from
+        PriceBook.recompute()). The file is rewritten under the directory
+        lock after reading in rows other processes appended, so none are
+        lost; those processes reload the rewritten file on their next sync.
+
+        Returns:
+            Number of rows restated
+        """
+        with self._lock, self._file_lock():
+            if self.path is not None:
+                self._sync()
+            count = min(len(costs), self._size)
+            self._columns["cost"][:count] = costs[:count]
+            if self.path is not None:
+                records = np.zeros(self._size, dtype=RECORD)
+                for name in RECORD.names:
+                    records[name] = self._columns[name][:self._size]
+                records_path = self.path / "records.bin"
+                tmp_path = self.path / "records.tmp"
+                records.tofile(tmp_path)
+                os.replace(tmp_path, records_path)
+                stat = records_path.stat()
+                self._records_id = (stat.st_dev, stat.st_ino)
+                self._file_rows = self._size
+        logger.info(f"Restated the cost of {count} usage rows")
+        return count
+
+    def enable_persistence(self, directory: str = USAGE_LEDGER_DIR):
+        """Load rows saved by earlier runs, then append every new row to disk
+
+        Safe to call on every script rerun: only the first call loads.
+        """
+        directory_path = Path(directory)
+        with self._lock:
+            if self.path == directory_path:
+                return
+            directory_path.mkdir(parents=True, exist_ok=True)
+            self.path = directory_path
+            with self._file_lock():
+                self._load()
+
+    def snapshot(self) -> Tuple[Dict[str, np.ndarray], Dict[str, List[str]]]:
+        """Views of the filled part of every column plus the name tables
+
+        With persistence, rows other processes recorded are read in first.
+        Rows are only ever appended past _size, so views taken here stay
+        valid while other threads record new calls.
+        """
+        with self._lock:
+            if self.path is not None:
+                with self._file_lock():
+                    self._sync()
+            size = self._size
+            columns = {name: column[:size] for name, column in self._columns.items()}
+            names = {column: list(values) for column, values in self._names.items()}
+        return columns, names
+
+    def _ensure_capacity(self, size: int):
+        capacity = len(self._columns["timestamp"])
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        for name, column in self._columns.items():
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[name] = grown
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Exclusive lock on the ledger directory across processes (no-op in memory)"""
+        if self.path is None or fcntl is None:
+            yield
+            return
+        with open(self.path / "ledger.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _persist(self, row: Dict[str, Any], new_names: List[Dict[str, str]]):
+        """Append one row (and any names it introduced) to disk (caller holds both locks)"""
+        try:
+            # Names first, so a record never references an id the names file lacks
+            if new_names:
+                with open(self.path / "names.jsonl", 'ab') as f:
+                    f.write("".join(json.dumps(entry) + "\n" for entry in new_names).encode())
+                    self._names_offset = f.tell()
+            record = np.zeros(1, dtype=RECORD)
+            for column, value in row.items():
+                record[column] = value
+            records_path = self.path / "records.bin"
+            with open(records_path, 'ab') as f:
+                f.write(record.tobytes())
+            self._file_rows += 1
+            if self._records_id is None:
+                stat = records_path.stat()
+                self._records_id = (stat.st_dev, stat.st_ino)
+        except OSError as e:
+            logger.warning(f"Failed to persist usage row: {e}")
+
+    def _sync(self):
+        """Read in names and rows other processes appended since we last looked (caller holds both locks)"""
+        records_path = self.path / "records.bin"
+        try:
+            stat = records_path.stat()
+        except FileNotFoundError:
+            self._read_names()
+            return
+        if (stat.st_dev, stat.st_ino) != self._records_id:
+            self._load()  # Created, or rewritten by restate(), in another process
+            return
+
+        self._read_names()
+        count = _whole_records(records_path, stat.st_size) - self._file_rows
+        if count <= 0:
+            return
+        records = np.fromfile(records_path, dtype=RECORD, count=count, offset=self._file_rows * RECORD.itemsize)
+        self._ensure_capacity(self._size + count)
+        for name in RECORD.names:
+            self._columns[name][self._size:self._size + count] = records[name]
+        self._size += count
+        self._file_rows += count
+
+    def _read_names(self):
+        """Intern the names appended to names.jsonl since the last read, in file order"""
+        names_path = self.path / "names.jsonl"
+        if not names_path.exists():
+            return
+        with open(names_path, 'r+b') as f:
+            f.seek(self._names_offset)
+            data = f.read()
+            complete = data.rfind(b"\n") + 1
+            if complete < len(data):
+                # Partial last line from a crash (writers hold the lock): drop it so ids stay aligned
+                f.truncate(self._names_offset + complete)
+        for line in data[:complete].splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Garbled by a crash in an older version
+            column, name = entry["column"], entry["name"]
+            self._ids[column][name] = len(self._names[column])
+            self._names[column].append(name)
+        self._names_offset += complete
+
+    def _load(self):
+        """Replace in-memory rows with the persisted ones (caller holds both locks)"""
+        self._names = {"provider": [], "model": [], "user": [""]}
+        self._ids = {"provider": {}, "model": {}, "user": {"": 0}}
+        self._names_offset = 0
+        self._read_names()
+
+        records_path = self.path / "records.bin"
+        count = 0
+        self._records_id = None
+        if records_path.exists():
+            stat = records_path.stat()
+            self._records_id = (stat.st_dev, stat.st_ino)
+            count = _whole_records(records_path, stat.st_size)
+        records = np.fromfile(records_path, dtype=RECORD, count=count) if count else np.zeros(0, dtype=RECORD)
+
+        self._size = 0
+        self._ensure_capacity(max(count, INITIAL_CAPACITY))
+        for name in RECORD.names:
+            self._columns[name][:count] = records[name]
+        self._size = self._file_rows = count
+        if count:
+            logger.info(f"Loaded {count} usage rows from {self.path}")
+
+
+def _whole_records(records_path: Path, size: int) -> int:
+    """Complete records in the file, dropping a partial last one left by a crash so new rows stay aligned"""
+    count = size // RECORD.itemsize
+    if size != count * RECORD.itemsize:
+        with open(records_path, 'r+b') as f:
+            f.truncate(count * RECORD.itemsize)
+    return count
+
+
+def _group(keys: List[np.ndarray]):
+    """Distinct key tuples (one row each, sorted) and each input row's group index
+
+    The key columns are packed into one int64 (mixed radix over each
+    column's range) so a 1-D np.unique does the grouping; 2-D unique is
+    several times slower. Falls back to it when the ranges don't fit.
+    """
+    lows = [int(key.min()) for key in keys]
+    spans = [int(key.max()) - low + 1 for key, low in zip(keys, lows)]
+    if float(np.prod([float(span) for span in spans])) >= 2 ** 62:
+        groups, inverse = np.unique(np.stack(keys, axis=1), axis=0, return_inverse=True)
+        return groups, inverse.reshape(-1)
+
+    packed = np.zeros(len(keys[0]), dtype=np.int64)
+    for key, low, span in zip(keys, lows, spans):
+        packed = packed * span + (key - low)
+    distinct, inverse = np.unique(packed, return_inverse=True)
+
+    groups = np.empty((len(distinct), len(keys)), dtype=np.int64)
+    for position in range(len(keys) - 1, -1, -1):
+        distinct, groups[:, position] = np.divmod(distinct, spans[position])
+        groups[:, position] += lows[position]
+    return groups, inverse.reshape(-1)
+
+
+# Process-wide ledger shared by all sessions
+usage_ledger = UsageLedger()
@@ -1,11 +1,252 @@
 """LLM Provider Integrations - Modular and Fast"""
 import os
+import json
+import queue
+import time
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional, Dict, Any, Iterator, Tuple, Callable, List, Union
 import logging
 
+from .cancellation import CancelToken, CancelledError, abort_on_cancel
+from .clients import client_registry
+from .ratelimit import rate_limits, estimate_prompt_tokens
+from .telemetry import instrument_chat, instrument_stream
+from .ollama import (
+    ollama_health,
+    ollama_http,
+    ollama_models,
+    ollama_balancer,
+    parse_base_urls,
+    DEFAULT_OLLAMA_URL,
+    OLLAMA_BASE_URLS
+)
+
 logger = logging.getLogger(__name__)
 
+# Fan-out defaults: one worker per provider, generous deadline for local models
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_CALL_TIMEOUT = 90.0
+
+
+# Chat messages: {"role": "system" | "user" | "assistant", "content": str}
+Messages = List[Dict[str, str]]
+
+
+def build_messages(prompt: str, history: Optional[Messages] = None) -> Messages:
+    """History followed by the new user prompt"""
+    return list(history or []) + [{"role": "user", "content": prompt}]
+
+
+def split_system(messages: Messages) -> Tuple[str, Messages]:
+    """Separate system messages (joined) from the user/assistant turns"""
+    system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+    return system, [m for m in messages if m["role"] != "system"]
+
+
+def _budget_text(prompt: str, history: Optional[Messages]) -> str:
+    """Everything sent upstream, for rate-limit token estimates"""
+    if not history:
+        return prompt
+    return "".join(m["content"] for m in history) + prompt
+
+
+class ProviderError(Exception):
+    """A provider call failed; status and retry_after are set when the API reported them"""
+
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class ProviderResult:
+    """Outcome of one provider call with exact metrics
+
+    Token counts are the ones reported by the provider API (None when it did
+    not report them). input_tokens is the whole prompt; cached_input_tokens
+    and cache_write_tokens are the parts of it read from / written to the
+    provider's prompt cache. Times are in seconds.
+    """
+
+    __slots__ = (
+        "provider", "model", "text", "error", "error_type", "latency", "ttft",
+        "finish_reason", "input_tokens", "output_tokens", "cached",
+        "cached_input_tokens", "cache_write_tokens"
+    )
+
+    def __init__(
+        self,
+        provider: str,
+        model: Optional[str],
+        text: str,
+        error: Optional[str] = None,
+        error_type: Optional[str] = None,
+        latency: Optional[float] = None,
+        ttft: Optional[float] = None,
+        finish_reason: Optional[str] = None,
+        input_tokens: Optional[int] = None,
+        output_tokens: Optional[int] = None,
+        cached: bool = False,
+        cached_input_tokens: Optional[int] = None,
+        cache_write_tokens: Optional[int] = None
+    ):
+        self.provider = provider
+        self.model = model
+        self.text = text
+        self.error = error
+        self.error_type = error_type
+        self.latency = latency
+        self.ttft = ttft
+        self.finish_reason = finish_reason
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.cached = cached
+        self.cached_input_tokens = cached_input_tokens
+        self.cache_write_tokens = cache_write_tokens
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict for JSON logs"""
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __repr__(self) -> str:
+        status = "ok" if self.ok else self.error_type
+        return f"ProviderResult({self.provider}/{self.model}, {status}, latency={self.latency})"
+
+
+def new_usage() -> Dict[str, Any]:
+    """Empty usage record filled in by a provider's _stream()"""
+    return {
+        "input_tokens": None, "output_tokens": None, "finish_reason": None,
+        "cached_input_tokens": None, "cache_write_tokens": None
+    }
+
+
+class ChatStream:
+    """Iterator over text deltas from a streaming chat call
+
+    Exhausting the stream fills in `usage` with the token counts (and
+    finish_reason) reported by the provider, None where the API did not
+    report them. Failures are yielded as a final "❌ ... Error" delta,
+    matching chat(), and kept in `error`. `cached` is True when the text was
+    replayed from a response cache or shared from another caller's in-flight
+    request, i.e. it cost nothing. cancel() aborts the call (from any
+    thread); a cancelled stream ends with error_type "Cancelled" and an
+    estimated output token count for the text received so far. result()
+    summarizes the call once done.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        deltas: Callable[[Dict[str, Any]], Iterator[str]],
+        model: Optional[str] = None,
+        cancel: Optional[CancelToken] = None
+    ):
+        self.provider = provider
+        self.model = model
+        self.cancel_token = cancel or CancelToken()
+        self.usage: Dict[str, Any] = new_usage()
+        self.error: Optional[str] = None
+        self.error_type: Optional[str] = None
+        self.cached = False
+        self.done = False
+        self.started_at: Optional[float] = None
+        self.first_delta_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._parts: List[str] = []
+        self._deltas = deltas(self.usage)
+
+    def __iter__(self) -> "ChatStream":
+        return self
+
+    def __next__(self) -> str:
+        if self.done:
+            raise StopIteration
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+
+        try:
+            self.cancel_token.raise_if_cancelled()
+            delta = next(self._deltas)
+        except StopIteration:
+            self._finish()
+            raise
+        except Exception as e:
+            if self.done:
+                raise StopIteration  # Already failed from outside (fail())
+            self._finish()
+            if isinstance(e, CancelledError):
+                self._close_deltas()
+                self._estimate_partial_usage()
+                self.error_type = "Cancelled"
+            else:
+                self.error_type = type(e).__name__
+            delta = f"❌ {self.provider} Error: {str(e)}"
+
+        if delta.startswith("❌"):
+            self.error = delta
+            self.error_type = self.error_type or ("Cancelled" if self.cancel_token.cancelled else "ProviderError")
+        elif self.first_delta_at is None:
+            self.first_delta_at = time.monotonic()
+        self._parts.append(delta)
+        return delta
+
+    def cancel(self, reason: str = "cancelled"):
+        """Abort the call: closes its HTTP response and stops upstream generation"""
+        self.cancel_token.cancel(reason)
+
+    def fail(self, error: str, error_type: str):
+        """Mark the stream failed from outside, e.g. when a deadline passed"""
+        self._finish()
+        self._estimate_partial_usage()
+        self.error = error
+        self.error_type = error_type
+        self._parts.append(error)
+
+    def _finish(self):
+        self.done = True
+        self.finished_at = self.finished_at or time.monotonic()
+
+    def _close_deltas(self):
+        try:
+            getattr(self._deltas, "close", lambda: None)()
+        except ValueError:
+            pass  # Running on another thread; the token's callbacks abort it
+
+    def _estimate_partial_usage(self):
+        """Output tokens for text received before the call was cut short"""
+        if self.usage.get("output_tokens") is None and self._parts:
+            self.usage["output_tokens"] = estimate_prompt_tokens(self.text)
+
+    @property
+    def text(self) -> str:
+        """Text received so far"""
+        return "".join(self._parts)
+
+    def result(self) -> ProviderResult:
+        """Structured outcome; complete once the stream is exhausted"""
+        started = self.started_at
+        return ProviderResult(
+            provider=self.provider,
+            model=self.model,
+            text=self.text,
+            error=self.error,
+            error_type=self.error_type,
+            latency=self.finished_at - started if started and self.finished_at else None,
+            ttft=self.first_delta_at - started if started and self.first_delta_at else None,
+            finish_reason=self.usage.get("finish_reason"),
+            input_tokens=self.usage.get("input_tokens"),
+            output_tokens=self.usage.get("output_tokens"),
+            cached=self.cached,
+            cached_input_tokens=self.usage.get("cached_input_tokens"),
+            cache_write_tokens=self.usage.get("cache_write_tokens")
+        )
+
 
 class LLMProvider(ABC):
     """Base class for all LLM providers"""
@@ -13,11 +254,12 @@ class LLMProvider(ABC):
     def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None):
         self.api_key = api_key
         self.model = model
+        self.base_url: Optional[str] = None
         self.name = self.__class__.__name__.replace('Provider', '')
 
     @abstractmethod
-    def chat(self, prompt: str, stream: bool = False) -> str:
-        """Send prompt and get response"""
+    def chat(self, prompt: str, stream: bool = False, history: Optional[Messages] = None) -> str:
+        """Send prompt (after optional earlier history messages) and get response"""
         pass
 
     @abstractmethod
@@ -25,131 +267,559 @@ class LLMProvider(ABC):
         """Check if provider is properly configured"""
         pass
 
+    def stream_chat(
+        self,
+        prompt: str,
+        history: Optional[Messages] = None,
+        cancel: Optional[CancelToken] = None
+    ) -> ChatStream:
+        """Send prompt and stream the response as it is generated
+
+        Cancelling `cancel` (or calling stream.cancel()) aborts the call.
+        """
+        cancel = cancel or CancelToken()
+        return ChatStream(self.name, lambda usage: self._stream(prompt, usage, history, cancel), self.model, cancel)
+
+    def complete(
+        self,
+        prompt: str,
+        history: Optional[Messages] = None,
+        cancel: Optional[CancelToken] = None
+    ) -> ProviderResult:
+        """Send prompt and return text plus latency, finish reason and token usage"""
+        stream = self.stream_chat(prompt, history=history, cancel=cancel)
+        for _ in stream:
+            pass
+        return stream.result()
+
+    def _chat(self, prompt: str, history: Optional[Messages] = None) -> str:
+        """Raw call that raises on failure instead of returning an error string
+
+        Used by wrappers that need the exception (e.g. to decide on a retry).
+        Providers without their own implementation fall back to chat().
+        """
+        response = self.chat(prompt, history=history)
+        if response.startswith("❌"):
+            raise ProviderError(response)
+        return response
+
+    def _stream(
+        self,
+        prompt: str,
+        usage: Dict[str, Any],
+        history: Optional[Messages] = None,
+        cancel: Optional[CancelToken] = None
+    ) -> Iterator[str]:
+        """Yield text deltas, recording token counts and finish_reason in usage
+
+        Cancelling `cancel` must make the generator stop and raise
+        CancelledError, ideally by closing the in-flight HTTP response (see
+        abort_on_cancel). Providers without native streaming yield the full
+        chat() reply at once.
+        """
+        yield self.chat(prompt, history=history)
+
 
 class OpenAIProvider(LLMProvider):
     """OpenAI (GPT) Provider"""
 
-    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4o-mini"):
+    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4o-mini", base_url: Optional[str] = None):
         super().__init__(api_key, model)
+        self.base_url = base_url
         self.client = None
         if self.is_configured():
             try:
                 import openai
-                self.client = openai.OpenAI(api_key=self.api_key)
+                self.client = client_registry.get_or_create(
+                    f"openai@{base_url or ''}", self.api_key, "",
+                    lambda: openai.OpenAI(
+                        api_key=self.api_key,
+                        base_url=base_url,
+                        max_retries=0,  # ResilientProvider owns retries
+                        http_client=openai.DefaultHttpxClient(
+                            event_hooks={"response": [rate_limits.response_hook(self.name, self.api_key)]}
+                        )
+                    )
+                )
             except Exception as e:
                 logger.error(f"Failed to initialize OpenAI: {e}")
 
     def is_configured(self) -> bool:
         return bool(self.api_key)
 
-    def chat(self, prompt: str, stream: bool = False) -> str:
+    def chat(self, prompt: str, stream: bool = False, history: Optional[Messages] = None) -> str:
         if not self.client:
             return "❌ OpenAI not configured. Add API key in sidebar."
 
+        try:
+            return self._chat(prompt, history)
+        except Exception as e:
+            return f"❌ OpenAI Error: {str(e)}"
+
+    @instrument_chat
+    def _chat(self, prompt: str, history: Optional[Messages] = None) -> str:
+        if not self.client:
+            raise ProviderError("OpenAI not configured. Add API key in sidebar.")
+
+        reservation = rate_limits.acquire(self.name, self.api_key, _budget_text(prompt, history))
         try:
             response = self.client.chat.completions.create(
                 model=self.model,
-                messages=[{"role": "user", "content": prompt}],
+                messages=build_messages(prompt, history),
                 stream=False
             )
+            if response.usage:
+                reservation.settle(response.usage.prompt_tokens, response.usage.completion_tokens)
             return response.choices[0].message.content
-        except Exception as e:
-            return f"❌ OpenAI Error: {str(e)}"
+        except BaseException:
+            # Failed: nothing was reported, refund the estimate
+            reservation.release()
+            raise
+
+    @instrument_stream
+    def _stream(
+        self,
+        prompt: str,
+        usage: Dict[str, Any],
+        history: Optional[Messages] = None,
+        cancel: Optional[CancelToken] = None
+    ) -> Iterator[str]:
+        if not self.client:
+            yield "❌ OpenAI not configured. Add API key in sidebar."
+            return
+
+        reservation = rate_limits.acquire(self.name, self.api_key, _budget_text(prompt, history), cancel=cancel)
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=build_messages(prompt, history),
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            with abort_on_cancel(cancel, response.close):
+                for chunk in response:
+                    if chunk.choices:
+                        if chunk.choices[0].delta.content:
+                            yield chunk.choices[0].delta.content
+                        if chunk.choices[0].finish_reason:
+                            usage["finish_reason"] = chunk.choices[0].finish_reason
+                    if chunk.usage:
+                        usage["input_tokens"] = chunk.usage.prompt_tokens
+                        usage["output_tokens"] = chunk.usage.completion_tokens
+                        # Prompts over ~1K tokens are prefix-cached automatically
+                        details = getattr(chunk.usage, "prompt_tokens_details", None)
+                        usage["cached_input_tokens"] = getattr(details, "cached_tokens", None)
+            reservation.settle(usage["input_tokens"], usage["output_tokens"])
+        except BaseException:
+            # Failed or cancelled: keep only what the API reported
+            reservation.release(usage["input_tokens"], usage["output_tokens"])
+            raise
 
 
 class ClaudeProvider(LLMProvider):
     """Anthropic Claude Provider"""
 
-    def __init__(self, api_key: Optional[str] = None, model: str = "claude-3-5-sonnet-20241022"):
+    def __init__(self, api_key: Optional[str] = None, model: str = "claude-3-5-sonnet-20241022", base_url: Optional[str] = None):
         super().__init__(api_key, model)
+        self.base_url = base_url
         self.client = None
         if self.is_configured():
             try:
                 import anthropic
-                self.client = anthropic.Anthropic(api_key=self.api_key)
+                self.client = client_registry.get_or_create(
+                    f"claude@{base_url or ''}", self.api_key, "",
+                    lambda: anthropic.Anthropic(
+                        api_key=self.api_key,
+                        base_url=base_url,
+                        max_retries=0,  # ResilientProvider owns retries
+                        http_client=anthropic.DefaultHttpxClient(
+                            event_hooks={"response": [rate_limits.response_hook(self.name, self.api_key)]}
+                        )
+                    )
+                )
             except Exception as e:
                 logger.error(f"Failed to initialize Claude: {e}")
 
     def is_configured(self) -> bool:
         return bool(self.api_key)
 
-    def chat(self, prompt: str, stream: bool = False) -> str:
+    def _request(self, prompt: str, history: Optional[Messages]) -> Dict[str, Any]:
+        """messages.create() arguments; system messages go in the system field
+
+        The system text is marked as a prompt cache breakpoint so a long,
+        unchanging system prompt is billed at the cache-read rate on repeat
+        calls (prompts under the model's minimum cacheable length are simply
+        not cached).
+        """
+        system, messages = split_system(build_messages(prompt, history))
+        request: Dict[str, Any] = {"model": self.model, "max_tokens": 4096, "messages": messages}
+        if system:
+            request["system"] = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+        return request
+
+    def chat(self, prompt: str, stream: bool = False, history: Optional[Messages] = None) -> str:
         if not self.client:
             return "❌ Claude not configured. Add API key in sidebar."
 
         try:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            return response.content[0].text
+            return self._chat(prompt, history)
         except Exception as e:
             return f"❌ Claude Error: {str(e)}"
 
+    @instrument_chat
+    def _chat(self, prompt: str, history: Optional[Messages] = None) -> str:
+        if not self.client:
+            raise ProviderError("Claude not configured. Add API key in sidebar.")
+
+        reservation = rate_limits.acquire(self.name, self.api_key, _budget_text(prompt, history))
+        try:
+            response = self.client.messages.create(**self._request(prompt, history))
+            reservation.settle(response.usage.input_tokens, response.usage.output_tokens)
+            return response.content[0].text
+        except BaseException:
+            # Failed: nothing was reported, refund the estimate
+            reservation.release()
+            raise
+
+    @instrument_stream
+    def _stream(
+        self,
+        prompt: str,
+        usage: Dict[str, Any],
+        history: Optional[Messages] = None,
+        cancel: Optional[CancelToken] = None
+    ) -> Iterator[str]:
+        if not self.client:
+            yield "❌ Claude not configured. Add API key in sidebar."
+            return
+
+        reservation = rate_limits.acquire(self.name, self.api_key, _budget_text(prompt, history), cancel=cancel)
+        try:
+            with self.client.messages.stream(**self._request(prompt, history)) as response:
+                with abort_on_cancel(cancel, response.close):
+                    for text in response.text_stream:
+                        yield text
+                final = response.get_final_message()
+                # input_tokens excludes cache reads/writes; report the whole prompt
+                cache_read = getattr(final.usage, "cache_read_input_tokens", None) or 0
+                cache_write = getattr(final.usage, "cache_creation_input_tokens", None) or 0
+                usage["input_tokens"] = final.usage.input_tokens + cache_read + cache_write
+                usage["output_tokens"] = final.usage.output_tokens
+                usage["cached_input_tokens"] = cache_read
+                usage["cache_write_tokens"] = cache_write
+                usage["finish_reason"] = final.stop_reason
+            reservation.settle(usage["input_tokens"], usage["output_tokens"])
+        except BaseException:
+            # Failed or cancelled: keep only what the API reported
+            reservation.release(usage["input_tokens"], usage["output_tokens"])
+            raise
+
 
 class GeminiProvider(LLMProvider):
     """Google Gemini Provider"""
 
-    def __init__(self, api_key: Optional[str] = None, model: str = "gemini-2.0-flash-exp"):
+    def __init__(self, api_key: Optional[str] = None, model: str = "gemini-2.0-flash-exp", base_url: Optional[str] = None):
         super().__init__(api_key, model)
+        self.base_url = base_url
         self.client = None
         if self.is_configured():
             try:
                 import google.generativeai as genai
-                genai.configure(api_key=self.api_key)
-                self.client = genai.GenerativeModel(self.model)
+                from google.ai import generativelanguage as glm
+
+                def build():
+                    # genai.configure() sets one process-wide key that models bind
+                    # to lazily, so another session's configure() could decide which
+                    # key pays; give each model its own client for this key instead
+                    client_options = {"api_key": self.api_key}
+                    transport = None
+                    if base_url:
+                        # Custom endpoints (proxies, local mocks) are only reachable over REST
+                        client_options["api_endpoint"] = base_url
+                        transport = "rest"
+                    model = genai.GenerativeModel(self.model)
+                    # No public hook for a per-model client: GenerativeModel binds the
+                    # global one to _client on first call (google-generativeai 0.8.x,
+                    # pinned in requirements.txt). Fail loudly if that changes rather
+                    # than silently billing whichever key was configured last.
+                    if getattr(model, "_client", False) is not None:
+                        raise RuntimeError(
+                            f"google-generativeai {genai.__version__} is unsupported: "
+                            "GenerativeModel._client is not an unbound client slot"
+                        )
+                    model._client = glm.GenerativeServiceClient(client_options=client_options, transport=transport)
+                    return model
+
+                # Gemini clients are bound to a model, so the model is part of the key
+                self.client = client_registry.get_or_create(
+                    f"gemini@{base_url or ''}", self.api_key, self.model, build
+                )
             except Exception as e:
                 logger.error(f"Failed to initialize Gemini: {e}")
 
     def is_configured(self) -> bool:
         return bool(self.api_key)
 
-    def chat(self, prompt: str, stream: bool = False) -> str:
+    @staticmethod
+    def _contents(prompt: str, history: Optional[Messages]) -> Any:
+        """generate_content() input: the bare prompt, or role-tagged contents with history
+
+        The client is shared per model, so system text is folded into the
+        first user turn instead of the model's system_instruction.
+        """
+        if not history:
+            return prompt
+        system, messages = split_system(build_messages(prompt, history))
+        contents = [
+            {"role": "model" if m["role"] == "assistant" else "user", "parts": [m["content"]]}
+            for m in messages
+        ]
+        if system:
+            contents[0]["parts"].insert(0, system)
+        return contents
+
+    def chat(self, prompt: str, stream: bool = False, history: Optional[Messages] = None) -> str:
         if not self.client:
             return "❌ Gemini not configured. Add API key in sidebar."
 
         try:
-            response = self.client.generate_content(prompt)
-            return response.text
+            return self._chat(prompt, history)
         except Exception as e:
             return f"❌ Gemini Error: {str(e)}"
 
+    @instrument_chat
+    def _chat(self, prompt: str, history: Optional[Messages] = None) -> str:
+        if not self.client:
+            raise ProviderError("Gemini not configured. Add API key in sidebar.")
+
+        reservation = rate_limits.acquire(self.name, self.api_key, _budget_text(prompt, history))
+        try:
+            response = self.client.generate_content(self._contents(prompt, history))
+            metadata = getattr(response, "usage_metadata", None)
+            if metadata:
+                reservation.settle(metadata.prompt_token_count, metadata.candidates_token_count)
+            return response.text
+        except BaseException:
+            # Failed: nothing was reported, refund the estimate
+            reservation.release()
+            raise
+
+    @instrument_stream
+    def _stream(
+        self,
+        prompt: str,
+        usage: Dict[str, Any],
+        history: Optional[Messages] = None,
+        cancel: Optional[CancelToken] = None
+    ) -> Iterator[str]:
+        if not self.client:
+            yield "❌ Gemini not configured. Add API key in sidebar."
+            return
+
+        reservation = rate_limits.acquire(self.name, self.api_key, _budget_text(prompt, history), cancel=cancel)
+        try:
+            response = self.client.generate_content(self._contents(prompt, history), stream=True)
+            # The gRPC transport's stream can be cancelled from another thread; the
+            # REST one can only be abandoned between chunks
+            rpc_cancel = getattr(getattr(response, "_iterator", None), "cancel", lambda: None)
+            with abort_on_cancel(cancel, rpc_cancel):
+                for chunk in response:
+                    if cancel:
+                        cancel.raise_if_cancelled()
+                    if chunk.parts:
+                        yield chunk.text
+                    # Counts are cumulative; the last chunk carries the totals
+                    metadata = getattr(chunk, "usage_metadata", None)
+                    if metadata:
+                        usage["input_tokens"] = metadata.prompt_token_count
+                        usage["output_tokens"] = metadata.candidates_token_count
+                        usage["cached_input_tokens"] = getattr(metadata, "cached_content_token_count", None)
+                    if chunk.candidates and chunk.candidates[0].finish_reason:
+                        usage["finish_reason"] = chunk.candidates[0].finish_reason.name
+            reservation.settle(usage["input_tokens"], usage["output_tokens"])
+        except BaseException:
+            # Failed or cancelled: keep only what the API reported
+            reservation.release(usage["input_tokens"], usage["output_tokens"])
+            raise
+
 
 class OllamaProvider(LLMProvider):
-    """Ollama (Local LLM) Provider - FREE"""
+    """Ollama (Local LLM) Provider - FREE
 
-    def __init__(self, api_key: Optional[str] = None, model: str = "llama3.2", base_url: str = "http://localhost:11434"):
+    base_url may list several nodes (list or comma-separated string); each
+    request goes to the least busy healthy node that has the model pulled,
+    failing over to the next one if the node is down or lacks the model.
+    """
+
+    # Node answers that mean "try another node" rather than "the request failed"
+    FAILOVER_STATUSES = {404, 503}
+
+    def __init__(self, api_key: Optional[str] = None, model: str = "llama3.2", base_url: Union[str, List[str]] = DEFAULT_OLLAMA_URL):
         super().__init__(api_key, model)
-        self.base_url = base_url
+        self.base_urls = parse_base_urls(base_url)
+        self.base_url = ",".join(self.base_urls)
 
     def is_configured(self) -> bool:
-        """Check if Ollama is running"""
+        """Check if any Ollama node is running (cached, refreshed in the background)"""
+        return any([ollama_health.is_healthy(url) for url in self.base_urls])
+
+    def chat(self, prompt: str, stream: bool = False, history: Optional[Messages] = None) -> str:
+        if not self.is_configured():
+            return "❌ Ollama not running. Start with: ollama serve"
+
         try:
-            import requests
-            response = requests.get(f"{self.base_url}/api/tags", timeout=2)
-            return response.status_code == 200
-        except:
-            return False
+            return self._chat(prompt, history)
+        except ProviderError as e:
+            return f"❌ Ollama Error: {e.status or str(e)}"
+        except Exception as e:
+            return f"❌ Ollama Error: {str(e)}"
 
-    def chat(self, prompt: str, stream: bool = False) -> str:
+    def _nodes(self) -> List[str]:
+        """Nodes to try in order; raises if none can serve the model"""
+        if not self.is_configured():
+            raise ProviderError("Ollama not running. Start with: ollama serve")
+        nodes = ollama_balancer.candidates(self.base_urls, self.model)
+        if not nodes:
+            raise ProviderError(f"No Ollama node has {self.model}. Run: ollama pull {self.model}", status=404)
+        return nodes
+
+    def _request(self, prompt: str, history: Optional[Messages], stream: bool) -> Tuple[str, Dict[str, Any]]:
+        """(endpoint path, JSON body): /api/generate for one prompt, /api/chat with history"""
+        body: Dict[str, Any] = {"model": self.model, "stream": stream, **ollama_models.request_options(self.model)}
+        if history:
+            body["messages"] = build_messages(prompt, history)
+            return "/api/chat", body
+        body["prompt"] = prompt
+        return "/api/generate", body
+
+    @staticmethod
+    def _text(data: Dict[str, Any]) -> Optional[str]:
+        """Response text from a /api/generate or /api/chat object"""
+        return data.get('response') or (data.get('message') or {}).get('content')
+
+    @instrument_chat
+    def _chat(self, prompt: str, history: Optional[Messages] = None) -> str:
+        import requests
+
+        error: Optional[Exception] = None
+        path, body = self._request(prompt, history, stream=False)
+        for base_url in self._nodes():
+            try:
+                with ollama_balancer.track(base_url), ollama_http.slot(base_url):
+                    response = ollama_http.session(base_url).post(
+                        f"{base_url}{path}",
+                        json=body,
+                        timeout=ollama_models.timeout(base_url, self.model)
+                    )
+            except requests.exceptions.ConnectionError as e:
+                # Node went away since the last probe; fail fast until it is back
+                ollama_health.mark_unhealthy(base_url, str(e))
+                error = e
+                continue
+
+            if response.status_code != 200:
+                error = _ollama_status_error(response)
+                if response.status_code in self.FAILOVER_STATUSES:
+                    continue
+                raise error
+            ollama_models.mark_loaded(base_url, self.model)
+            return self._text(response.json()) or 'No response'
+        raise error
+
+    async def achat(self, prompt: str, history: Optional[Messages] = None) -> str:
+        """Async chat over the shared httpx client (least busy node, no failover)"""
         if not self.is_configured():
             return "❌ Ollama not running. Start with: ollama serve"
 
+        import httpx
         try:
-            import requests
-            response = requests.post(
-                f"{self.base_url}/api/generate",
-                json={"model": self.model, "prompt": prompt, "stream": False},
-                timeout=60
-            )
+            base_url = self._nodes()[0]
+            path, body = self._request(prompt, history, stream=False)
+            connect_timeout, read_timeout = ollama_models.timeout(base_url, self.model)
+            with ollama_balancer.track(base_url):
+                async with ollama_http.async_slot(base_url):
+                    response = await ollama_http.async_client().post(
+                        f"{base_url}{path}",
+                        json=body,
+                        timeout=httpx.Timeout(read_timeout, connect=connect_timeout)
+                    )
             if response.status_code == 200:
-                return response.json().get('response', 'No response')
+                ollama_models.mark_loaded(base_url, self.model)
+                return self._text(response.json()) or 'No response'
             else:
                 return f"❌ Ollama Error: {response.status_code}"
+        except httpx.ConnectError as e:
+            ollama_health.mark_unhealthy(base_url, str(e))
+            return f"❌ Ollama Error: {str(e)}"
         except Exception as e:
             return f"❌ Ollama Error: {str(e)}"
 
+    @instrument_stream
+    def _stream(
+        self,
+        prompt: str,
+        usage: Dict[str, Any],
+        history: Optional[Messages] = None,
+        cancel: Optional[CancelToken] = None
+    ) -> Iterator[str]:
+        if not self.is_configured():
+            yield "❌ Ollama not running. Start with: ollama serve"
+            return
+
+        import requests
+
+        error: Optional[Exception] = None
+        path, body = self._request(prompt, history, stream=True)
+        # Streams can only fail over before the first delta has been shown
+        for base_url in self._nodes():
+            # The slot is held until the stream is fully read or abandoned
+            with ollama_balancer.track(base_url), ollama_http.slot(base_url):
+                try:
+                    response = ollama_http.session(base_url).post(
+                        f"{base_url}{path}",
+                        json=body,
+                        stream=True,
+                        timeout=ollama_models.timeout(base_url, self.model)
+                    )
+                except requests.exceptions.ConnectionError as e:
+                    ollama_health.mark_unhealthy(base_url, str(e))
+                    error = e
+                    continue
+
+                with response, abort_on_cancel(cancel, response.close):
+                    if response.status_code != 200:
+                        error = _ollama_status_error(response)
+                        if response.status_code in self.FAILOVER_STATUSES:
+                            continue
+                        raise error
+
+                    # Newline-delimited JSON; the final object has done=true and the counts
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        data = json.loads(line)
+                        text = self._text(data)
+                        if text:
+                            yield text
+                        if data.get('done'):
+                            usage["input_tokens"] = data.get('prompt_eval_count')
+                            usage["output_tokens"] = data.get('eval_count')
+                            usage["finish_reason"] = data.get('done_reason')
+                            ollama_models.mark_loaded(base_url, self.model)
+                            break
+                    return
+        raise error
+
+
+def _ollama_status_error(response) -> ProviderError:
+    """ProviderError for a non-200 Ollama response, keeping Retry-After if sent"""
+    retry_after = response.headers.get("Retry-After")
+    try:
+        retry_after = float(retry_after) if retry_after else None
+    except ValueError:
+        retry_after = None
+    return ProviderError(str(response.status_code), status=response.status_code, retry_after=retry_after)
+
 
 def get_all_providers(config: Dict[str, Any]) -> Dict[str, LLMProvider]:
     """Initialize all configured providers"""
@@ -159,26 +829,192 @@ def get_all_providers(config: Dict[str, Any]) -> Dict[str, LLMProvider]:
     if config.get('openai_key'):
         providers['OpenAI'] = OpenAIProvider(
             api_key=config['openai_key'],
-            model=config.get('openai_model', 'gpt-4o-mini')
+            model=config.get('openai_model', 'gpt-4o-mini'),
+            base_url=config.get('openai_base_url')
         )
 
     # Claude
     if config.get('claude_key'):
         providers['Claude'] = ClaudeProvider(
             api_key=config['claude_key'],
-            model=config.get('claude_model', 'claude-3-5-sonnet-20241022')
+            model=config.get('claude_model', 'claude-3-5-sonnet-20241022'),
+            base_url=config.get('claude_base_url')
         )
 
     # Gemini
     if config.get('gemini_key'):
         providers['Gemini'] = GeminiProvider(
             api_key=config['gemini_key'],
-            model=config.get('gemini_model', 'gemini-2.0-flash-exp')
+            model=config.get('gemini_model', 'gemini-2.0-flash-exp'),
+            base_url=config.get('gemini_base_url')
         )
 
     # Ollama (always try, it's free)
-    ollama = OllamaProvider(model=config.get('ollama_model', 'llama3.2'))
+    ollama = OllamaProvider(
+        model=config.get('ollama_model', 'llama3.2'),
+        base_url=config.get('ollama_base_url') or OLLAMA_BASE_URLS
+    )
     if ollama.is_configured():
         providers['Ollama'] = ollama
 
     return providers
+
+
+def fan_out(
+    providers: Dict[str, LLMProvider],
+    prompt: str,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    timeout: float = DEFAULT_CALL_TIMEOUT,
+    histories: Optional[Dict[str, Messages]] = None,
+    cancel: Optional[CancelToken] = None
+) -> Iterator[Tuple[str, str]]:
+    """Send prompt to all providers in parallel
+
+    Args:
+        providers: Provider instances keyed by display name
+        prompt: Prompt sent to every provider
+        max_concurrency: Maximum number of provider calls running at once
+        timeout: Per-call deadline in seconds, measured from when the call starts
+        histories: Earlier messages per provider name for multi-turn context
+        cancel: Aborts every call still running when cancelled
+
+    Yields:
+        (name, response) tuples in completion order. Calls that raise or
+        exceed their deadline yield an "❌ ... Error" response like chat() does.
+        Calls past their deadline, and all calls still running when the
+        caller stops iterating, are cancelled rather than left running.
+    """
+    if not providers:
+        return
+
+    started: Dict[str, float] = {}
+    tokens = {name: cancel.child() if cancel else CancelToken() for name in providers}
+
+    def run(name: str, provider: LLMProvider) -> str:
+        started[name] = time.monotonic()
+        # Streamed under the hood so the call can be aborted mid-response
+        return provider.complete(prompt, history=(histories or {}).get(name), cancel=tokens[name]).text
+
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(max_concurrency, len(providers))),
+        thread_name_prefix="llm-fanout"
+    )
+    pending = {
+        executor.submit(run, name, provider): name
+        for name, provider in providers.items()
+    }
+
+    try:
+        while pending:
+            # Wake up at the earliest deadline among calls that are running
+            now = time.monotonic()
+            deadlines = [
+                started[name] + timeout - now
+                for name in pending.values() if name in started
+            ]
+            wait_for = max(0.0, min(deadlines)) if deadlines else timeout
+            done, _ = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    yield name, future.result()
+                except Exception as e:
+                    yield name, f"❌ {name} Error: {str(e)}"
+
+            now = time.monotonic()
+            for future, name in list(pending.items()):
+                if name in started and now - started[name] >= timeout:
+                    del pending[future]
+                    future.cancel()
+                    tokens[name].cancel("timed out")
+                    yield name, f"❌ {name} Error: timed out after {timeout:.0f}s"
+    finally:
+        # Don't block on abandoned calls: abort running ones, drop queued ones
+        for name in pending.values():
+            tokens[name].cancel("abandoned")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def fan_out_stream(
+    providers: Dict[str, LLMProvider],
+    prompt: str,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    timeout: float = DEFAULT_CALL_TIMEOUT,
+    histories: Optional[Dict[str, Messages]] = None,
+    cancel: Optional[CancelToken] = None,
+    on_abandoned: Optional[Callable[[str, ChatStream], None]] = None
+) -> Iterator[Tuple[str, Optional[str], ChatStream]]:
+    """Stream responses from all providers in parallel
+
+    Same scheduling and cancellation as fan_out(), but yields deltas as they
+    arrive. If the caller stops iterating early, calls already started are
+    cancelled and passed to on_abandoned (with their partial usage) so they
+    can still be billed.
+
+    Yields:
+        (name, delta, stream) tuples, interleaved across providers. A delta of
+        None marks the end of that provider's stream; `stream.usage` is final
+        by then. A call that exceeds its deadline yields an error delta first.
+    """
+    if not providers:
+        return
+
+    histories = histories or {}
+    streams = {
+        name: provider.stream_chat(
+            prompt, history=histories.get(name), cancel=cancel.child() if cancel else None
+        )
+        for name, provider in providers.items()
+    }
+    events: "queue.Queue[Tuple[str, Optional[str]]]" = queue.Queue()
+    started: Dict[str, float] = {}
+
+    def run(name: str):
+        started[name] = time.monotonic()
+        try:
+            for delta in streams[name]:
+                events.put((name, delta))
+        finally:
+            events.put((name, None))
+
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(max_concurrency, len(providers))),
+        thread_name_prefix="llm-stream"
+    )
+    for name in providers:
+        executor.submit(run, name)
+    active = set(providers)
+
+    try:
+        while active:
+            now = time.monotonic()
+            deadlines = [started[name] + timeout - now for name in active if name in started]
+            wait_for = max(0.0, min(deadlines)) if deadlines else timeout
+            try:
+                name, delta = events.get(timeout=wait_for)
+                if name in active:
+                    if delta is None:
+                        active.discard(name)
+                    yield name, delta, streams[name]
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            for name in list(active):
+                if name in started and now - started[name] >= timeout:
+                    active.discard(name)
+                    error = f"❌ {name} Error: timed out after {timeout:.0f}s"
+                    streams[name].fail(error, "TimeoutError")
+                    streams[name].cancel("timed out")
+                    yield name, error, streams[name]
+                    yield name, None, streams[name]
+    finally:
+        # Abandoned by the caller (e.g. Streamlit rerun): stop paying for the rest
+        for name in active:
+            streams[name].cancel("abandoned")
+            if on_abandoned and name in started:
+                if not streams[name].done:
+                    streams[name].fail(f"❌ {name} Error: abandoned", "Cancelled")
+                on_abandoned(name, streams[name])
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,522 @@
+"""Ollama Runtime Support - Pooled HTTP, Health Checks and Model Residency
+
+Every Ollama call used to open a fresh TCP connection and probe `/api/tags`
+first. Requests now go through keep-alive sessions per host, and the health
+monitor keeps the last probe result per host, refreshed in a background
+thread, so callers read health from memory. The model manager warms models
+up ahead of the first request and controls how long Ollama keeps them loaded,
+and the load balancer spreads requests over several Ollama nodes.
+"""
+import os
+import re
+import threading
+import time
+import logging
+from contextlib import contextmanager, asynccontextmanager
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Set, Tuple, Iterator, AsyncIterator, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import asyncio
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OLLAMA_URL = "http://localhost:11434"
+
+# HTTP pool settings (override via environment)
+OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "10"))
+OLLAMA_MAX_PER_HOST = int(os.getenv("OLLAMA_MAX_PER_HOST", "8"))
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "3.05"))
+OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "60"))
+
+# Model residency: how long Ollama keeps models loaded after a request (e.g.
+# "30m", "-1" = forever; unset = server default of 5m), the read timeout used
+# while a model may still be loading, and models to warm up on startup
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE") or None
+OLLAMA_LOAD_TIMEOUT = float(os.getenv("OLLAMA_LOAD_TIMEOUT", "300"))
+OLLAMA_WARM_MODELS = [m.strip() for m in os.getenv("OLLAMA_WARM_MODELS", "").split(",") if m.strip()]
+
+# Comma-separated Ollama nodes; requests are balanced across the ones that have the model
+OLLAMA_BASE_URLS = os.getenv("OLLAMA_BASE_URLS", DEFAULT_OLLAMA_URL)
+
+
+class OllamaHTTPPool:
+    """Keep-alive HTTP sessions and per-host concurrency limits for Ollama
+
+    Sync callers share one requests.Session per host; async callers share one
+    httpx.AsyncClient per event loop. Both cap in-flight requests per host.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = OLLAMA_POOL_SIZE,
+        max_per_host: int = OLLAMA_MAX_PER_HOST,
+        connect_timeout: float = OLLAMA_CONNECT_TIMEOUT,
+        read_timeout: float = OLLAMA_READ_TIMEOUT
+    ):
+        self._lock = threading.Lock()
+        self.configure(pool_size, max_per_host, connect_timeout, read_timeout)
+
+    def configure(self, pool_size: int, max_per_host: int, connect_timeout: float, read_timeout: float):
+        """Apply new pool settings; existing sessions are replaced on next use"""
+        with self._lock:
+            self.pool_size = pool_size
+            self.max_per_host = max_per_host
+            self.connect_timeout = connect_timeout
+            self.read_timeout = read_timeout
+            self._sessions: Dict[str, Any] = {}
+            self._slots: Dict[str, threading.BoundedSemaphore] = {}
+            self._async_clients: Dict[int, Any] = {}
+            self._async_slots: Dict[Tuple[int, str], "asyncio.Semaphore"] = {}
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        """(connect, read) timeout tuple for requests"""
+        return (self.connect_timeout, self.read_timeout)
+
+    def session(self, base_url: str):
+        """Shared keep-alive requests.Session for a host"""
+        with self._lock:
+            session = self._sessions.get(base_url)
+            if session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[base_url] = session
+            return session
+
+    @contextmanager
+    def slot(self, base_url: str) -> Iterator[None]:
+        """Hold one of the host's concurrent request slots"""
+        with self._lock:
+            semaphore = self._slots.get(base_url)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.max_per_host)
+                self._slots[base_url] = semaphore
+        with semaphore:
+            yield
+
+    def async_client(self):
+        """Shared httpx.AsyncClient for the running event loop"""
+        import asyncio
+        import httpx
+
+        loop_id = id(asyncio.get_running_loop())
+        with self._lock:
+            client = self._async_clients.get(loop_id)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=None,
+                        max_keepalive_connections=self.pool_size
+                    ),
+                    timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+                )
+                self._async_clients[loop_id] = client
+            return client
+
+    @asynccontextmanager
+    async def async_slot(self, base_url: str) -> AsyncIterator[None]:
+        """Async counterpart of slot(), scoped to the running event loop"""
+        import asyncio
+
+        key = (id(asyncio.get_running_loop()), base_url)
+        with self._lock:
+            semaphore = self._async_slots.get(key)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.max_per_host)
+                self._async_slots[key] = semaphore
+        async with semaphore:
+            yield
+
+
+# Process-wide pool shared by all sessions
+ollama_http = OllamaHTTPPool()
+
+
+class OllamaHealthMonitor:
+    """Cached, background-refreshed health state per Ollama host"""
+
+    def __init__(self, ttl: float = 15.0, refresh_interval: float = 10.0, probe_timeout: float = 2.0):
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self.probe_timeout = probe_timeout
+        self._states: Dict[str, Dict[str, Any]] = {}
+        self._hosts: Set[str] = set()
+        self._lock = threading.Lock()
+        self._refresher: Optional[threading.Thread] = None
+
+    def status(self, base_url: str = DEFAULT_OLLAMA_URL) -> Dict[str, Any]:
+        """Last known health without any network I/O
+
+        Returns:
+            Dict with healthy (True/False, None if never probed), checked_at
+            (epoch seconds), error and models (names from /api/tags)
+        """
+        self._watch(base_url)
+        with self._lock:
+            state = self._states.get(base_url)
+            if not state:
+                return {"healthy": None, "checked_at": None, "error": None, "models": []}
+            return dict(state)
+
+    def is_healthy(self, base_url: str = DEFAULT_OLLAMA_URL) -> bool:
+        """Cached health; probes synchronously only the first time a host is seen
+
+        A stale result is still returned immediately while the background
+        refresher updates it, so a down host fails fast instead of timing out.
+        """
+        self._watch(base_url)
+        with self._lock:
+            state = self._states.get(base_url)
+
+        if state is None:
+            return self.probe(base_url)
+
+        return bool(state["healthy"])
+
+    def probe(self, base_url: str = DEFAULT_OLLAMA_URL) -> bool:
+        """Hit /api/tags now and record the result"""
+        healthy = False
+        error = None
+        models: List[str] = []
+        try:
+            response = ollama_http.session(base_url).get(f"{base_url}/api/tags", timeout=self.probe_timeout)
+            healthy = response.status_code == 200
+            if healthy:
+                models = [m.get("name", "") for m in response.json().get("models", [])]
+            else:
+                error = f"HTTP {response.status_code}"
+        except Exception as e:
+            error = str(e)
+
+        with self._lock:
+            self._states[base_url] = {
+                "healthy": healthy,
+                "checked_at": time.time(),
+                "error": error,
+                "models": models
+            }
+        return healthy
+
+    def mark_unhealthy(self, base_url: str, error: str):
+        """Record a failure seen by a real request so later calls fail fast"""
+        with self._lock:
+            state = self._states.setdefault(base_url, {"models": []})
+            state.update({"healthy": False, "checked_at": time.time(), "error": error})
+
+    def _watch(self, base_url: str):
+        """Register host for background refresh and start the refresher once"""
+        with self._lock:
+            self._hosts.add(base_url)
+            if self._refresher is None:
+                self._refresher = threading.Thread(
+                    target=self._refresh_loop, name="ollama-health", daemon=True
+                )
+                self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            now = time.time()
+            with self._lock:
+                stale = [
+                    host for host in self._hosts
+                    if host not in self._states or now - self._states[host]["checked_at"] >= self.ttl
+                ]
+            for host in stale:
+                self.probe(host)
+
+
+# Process-wide monitor shared by all sessions
+ollama_health = OllamaHealthMonitor()
+
+
+KeepAlive = Union[str, int, float]
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+# Ollama's own default keep_alive
+DEFAULT_KEEP_ALIVE_SECONDS = 300.0
+
+
+def parse_keep_alive(value: Optional[KeepAlive]) -> float:
+    """Seconds a keep_alive value keeps a model loaded (inf for negative values)
+
+    Accepts what Ollama accepts: numbers of seconds or Go durations like "1h30m".
+    """
+    if value is None:
+        return DEFAULT_KEEP_ALIVE_SECONDS
+    text = str(value).strip()
+    try:
+        seconds = float(text)
+    except ValueError:
+        parts = _DURATION_PART.findall(text.lstrip("-"))
+        if not parts:
+            return DEFAULT_KEEP_ALIVE_SECONDS
+        seconds = sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+        if text.startswith("-"):
+            seconds = -seconds
+    return float("inf") if seconds < 0 else seconds
+
+
+def model_tag(model: str) -> str:
+    """Ollama reports "llama3.2" as "llama3.2:latest" """
+    return model if ":" in model else f"{model}:latest"
+
+
+class OllamaModelManager:
+    """Warm-up, keep_alive and residency tracking for Ollama models
+
+    The manager remembers when each (host, model) was last loaded and for how
+    long Ollama will keep it, so requests to a model that may be cold get the
+    longer load timeout instead of failing on the normal read timeout.
+    """
+
+    def __init__(
+        self,
+        default_keep_alive: Optional[KeepAlive] = OLLAMA_KEEP_ALIVE,
+        load_timeout: float = OLLAMA_LOAD_TIMEOUT,
+        retry_failed_after: float = 60.0
+    ):
+        self.default_keep_alive = default_keep_alive
+        self.load_timeout = load_timeout
+        self.retry_failed_after = retry_failed_after
+        self._keep_alive: Dict[str, KeepAlive] = {}
+        self._loaded_until: Dict[Tuple[str, str], float] = {}
+        self._warmups: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def keep_alive(self, model: str) -> Optional[KeepAlive]:
+        """keep_alive to send with requests for model (None = server default)"""
+        with self._lock:
+            return self._keep_alive.get(model_tag(model), self.default_keep_alive)
+
+    def set_keep_alive(self, model: str, keep_alive: Optional[KeepAlive]):
+        """Override keep_alive for one model; None restores the default"""
+        with self._lock:
+            if keep_alive is None:
+                self._keep_alive.pop(model_tag(model), None)
+            else:
+                self._keep_alive[model_tag(model)] = keep_alive
+
+    def pin(self, model: str):
+        """Keep model loaded indefinitely (applied on its next request or warm-up)"""
+        self.set_keep_alive(model, -1)
+
+    def unpin(self, model: str):
+        self.set_keep_alive(model, None)
+
+    def is_pinned(self, model: str) -> bool:
+        return parse_keep_alive(self.keep_alive(model)) == float("inf")
+
+    def request_options(self, model: str) -> Dict[str, Any]:
+        """Extra /api/generate fields for model"""
+        keep_alive = self.keep_alive(model)
+        return {"keep_alive": keep_alive} if keep_alive is not None else {}
+
+    def is_loaded(self, base_url: str, model: str) -> bool:
+        """Whether model should still be in memory, from what this process saw"""
+        with self._lock:
+            return self._loaded_until.get((base_url, model_tag(model)), 0.0) > time.monotonic()
+
+    def timeout(self, base_url: str, model: str) -> Tuple[float, float]:
+        """(connect, read) timeout; the read timeout covers a cold load when needed"""
+        connect, read = ollama_http.timeout
+        if not self.is_loaded(base_url, model):
+            read = max(read, self.load_timeout)
+        return (connect, read)
+
+    def mark_loaded(self, base_url: str, model: str):
+        """Record that model just served a request (and so is resident)"""
+        seconds = parse_keep_alive(self.keep_alive(model))
+        with self._lock:
+            self._loaded_until[(base_url, model_tag(model))] = time.monotonic() + seconds
+
+    def warm_up(self, base_url: str, model: str) -> bool:
+        """Load model now by sending it an empty request; blocks until loaded"""
+        key = (base_url, model_tag(model))
+        with self._lock:
+            self._warmups[key] = {"state": "warming", "started_at": time.time(), "load_seconds": None, "error": None}
+
+        started = time.monotonic()
+        error = None
+        try:
+            with ollama_http.slot(base_url):
+                response = ollama_http.session(base_url).post(
+                    f"{base_url}/api/generate",
+                    json={"model": model, **self.request_options(model)},
+                    timeout=(ollama_http.connect_timeout, self.load_timeout)
+                )
+            if response.status_code != 200:
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+        except Exception as e:
+            error = str(e)
+
+        with self._lock:
+            self._warmups[key].update({
+                "state": "failed" if error else "ready",
+                "load_seconds": round(time.monotonic() - started, 2),
+                "error": error
+            })
+        if error:
+            logger.warning(f"Ollama warm-up of {model} failed: {error}")
+            return False
+        self.mark_loaded(base_url, model)
+        logger.info(f"Ollama model {model} warmed up in {time.monotonic() - started:.1f}s")
+        return True
+
+    def warm_up_in_background(self, base_url: str, models: List[str], force: bool = False):
+        """Warm models on a daemon thread, skipping ones already warming or loaded
+
+        force=True also re-sends loaded models, e.g. to apply a new keep_alive.
+        """
+        now = time.time()
+        pending = []
+        with self._lock:
+            for model in dict.fromkeys(models):
+                key = (base_url, model_tag(model))
+                warmup = self._warmups.get(key)
+                if not force and self._loaded_until.get(key, 0.0) > time.monotonic():
+                    continue
+                if warmup and (warmup["state"] == "warming" or
+                               (warmup["state"] == "failed" and now - warmup["started_at"] < self.retry_failed_after)):
+                    continue
+                self._warmups[key] = {"state": "warming", "started_at": now, "load_seconds": None, "error": None}
+                pending.append(model)
+
+        if pending:
+            threading.Thread(
+                target=lambda: [self.warm_up(base_url, model) for model in pending],
+                name="ollama-warmup",
+                daemon=True
+            ).start()
+
+    def warmup_status(self, base_url: str = DEFAULT_OLLAMA_URL) -> Dict[str, Dict[str, Any]]:
+        """Warm-up state per model for a host, without network I/O"""
+        with self._lock:
+            return {model: dict(state) for (host, model), state in self._warmups.items() if host == base_url}
+
+    def resident(self, base_url: str = DEFAULT_OLLAMA_URL, timeout: float = 2.0) -> List[Dict[str, Any]]:
+        """Models Ollama currently has in memory (GET /api/ps)
+
+        Returns:
+            List of {name, size_vram, expires_at, pinned}; empty if unreachable
+        """
+        try:
+            response = ollama_http.session(base_url).get(f"{base_url}/api/ps", timeout=timeout)
+            response.raise_for_status()
+            models = response.json().get("models", [])
+        except Exception as e:
+            logger.warning(f"Failed to list loaded Ollama models: {e}")
+            return []
+
+        resident = []
+        now = time.monotonic()
+        with self._lock:
+            for key in [key for key in self._loaded_until if key[0] == base_url]:
+                del self._loaded_until[key]
+            for entry in models:
+                name = model_tag(entry.get("name") or entry.get("model", ""))
+                expires_at = entry.get("expires_at")
+                self._loaded_until[(base_url, name)] = now + _seconds_until(expires_at)
+                resident.append({
+                    "name": name,
+                    "size_vram": entry.get("size_vram"),
+                    "expires_at": expires_at,
+                    "pinned": parse_keep_alive(self._keep_alive.get(name, self.default_keep_alive)) == float("inf")
+                })
+        return resident
+
+
+def _seconds_until(expires_at: Optional[str]) -> float:
+    """Seconds until an /api/ps expires_at timestamp (default keep_alive if unparseable)"""
+    if not expires_at:
+        return DEFAULT_KEEP_ALIVE_SECONDS
+    # Trim nanoseconds to microseconds for fromisoformat
+    text = re.sub(r"(\.\d{6})\d+", r"\1", expires_at.replace("Z", "+00:00"))
+    try:
+        expires = datetime.fromisoformat(text)
+        return max(0.0, expires.timestamp() - time.time())
+    except ValueError:
+        return DEFAULT_KEEP_ALIVE_SECONDS
+
+
+# Process-wide model manager shared by all sessions
+ollama_models = OllamaModelManager()
+
+
+def parse_base_urls(value: Union[str, List[str], None]) -> List[str]:
+    """Node list from a list or comma-separated string, without trailing slashes"""
+    if not value:
+        return [DEFAULT_OLLAMA_URL]
+    urls = value.split(",") if isinstance(value, str) else value
+    urls = [url.strip().rstrip("/") for url in urls if url and url.strip()]
+    return list(dict.fromkeys(urls)) or [DEFAULT_OLLAMA_URL]
+
+
+class OllamaLoadBalancer:
+    """Least-outstanding-requests routing across Ollama nodes
+
+    Only nodes that are healthy (or not probed yet) and list the model in
+    /api/tags are candidates. Ties go to nodes that already have the model
+    loaded, then rotate so idle nodes share the work.
+    """
+
+    def __init__(self):
+        self._outstanding: Dict[str, int] = {}
+        self._turn = 0
+        self._lock = threading.Lock()
+
+    def candidates(self, base_urls: List[str], model: str) -> List[str]:
+        """Nodes to try for model, best first (no network I/O)"""
+        wanted = model_tag(model)
+        eligible = []
+        for url in base_urls:
+            status = ollama_health.status(url)
+            if status["healthy"] is False:
+                continue
+            # Nodes whose model list is known must have pulled the model
+            if status["models"] and wanted not in {model_tag(name) for name in status["models"]}:
+                continue
+            eligible.append(url)
+
+        with self._lock:
+            self._turn += 1
+            turn = self._turn
+            outstanding = dict(self._outstanding)
+
+        def rank(item: Tuple[int, str]) -> Tuple[int, bool, int]:
+            index, url = item
+            return (
+                outstanding.get(url, 0),
+                not ollama_models.is_loaded(url, model),
+                (index - turn) % len(eligible)
+            )
+
+        return [url for _, url in sorted(enumerate(eligible), key=rank)]
+
+    @contextmanager
+    def track(self, base_url: str) -> Iterator[None]:
+        """Count a request against a node while it runs"""
+        with self._lock:
+            self._outstanding[base_url] = self._outstanding.get(base_url, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._outstanding[base_url] -= 1
+
+    def outstanding(self) -> Dict[str, int]:
+        """In-flight requests per node"""
+        with self._lock:
+            return dict(self._outstanding)
+
+
+# Process-wide balancer shared by all sessions
+ollama_balancer = OllamaLoadBalancer()
@@ -0,0 +1,200 @@
+"""Price Sheets - Versioned Provider Pricing with Bulk Cost Restatement
+
+Prices live in a data file (core/price_sheets.json, or PRICE_SHEETS) as a
+list of sheets, each with a version and an effective date. A new sheet is
+added when a vendor changes prices, so every call can still be priced by
+the sheet that applied when it was made. Each sheet compiles its nested
+dict into a flat (provider, model) -> rates index once, with cached-input,
+cache-write and batch rates resolved up front. PriceBook.recompute()
+re-prices a whole UsageLedger against any sheet in one vectorized pass,
+so restating months of costs takes milliseconds, not a replay of every
+request.
+"""
+import json
+import os
+import time
+import logging
+from bisect import bisect_right
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+    from .ledger import UsageLedger
+
+logger = logging.getLogger(__name__)
+
+PRICE_SHEETS = os.getenv("PRICE_SHEETS") or str(Path(__file__).with_name("price_sheets.json"))
+
+# Rates per 1M tokens, in the order every compiled rate tuple uses
+RATE_FIELDS = ("input", "output", "cached_input", "cache_write", "batch_input", "batch_output")
+
+# Rate each optional field falls back to
+RATE_DEFAULTS = {"cached_input": "input", "cache_write": "input", "batch_input": "input", "batch_output": "output"}
+
+Rates = Tuple[float, float, float, float, float, float]
+
+
+def _compile_rates(entry: Dict[str, float]) -> Rates:
+    return tuple(float(entry.get(field, entry.get(RATE_DEFAULTS.get(field, field), 0.0))) for field in RATE_FIELDS)
+
+
+class PriceSheet:
+    """One version of every provider's prices, compiled for fast lookup"""
+
+    __slots__ = ("version", "effective", "source", "prices", "_index", "_defaults")
+
+    def __init__(self, version: str, effective: float, prices: Dict[str, Dict[str, Dict[str, float]]], source: str = ""):
+        self.version = version
+        self.effective = effective
+        self.source = source
+        self.prices = prices
+        self._index: Dict[Tuple[str, str], Rates] = {}
+        self._defaults: Dict[str, Rates] = {}
+        for provider, models in prices.items():
+            for model, entry in models.items():
+                if model == "_default":
+                    self._defaults[provider.lower()] = _compile_rates(entry)
+                else:
+                    self._index[(provider.lower(), model)] = _compile_rates(entry)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PriceSheet":
+        effective = datetime.strptime(data["effective"], "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
+        return cls(data["version"], effective, data["prices"], data.get("source", ""))
+
+    def rates(self, provider: str, model: str) -> Optional[Rates]:
+        """Compiled rates for a model (provider's _default if unlisted), None for unknown providers"""
+        rates = self._index.get((provider, model))
+        if rates is None:
+            provider = provider.lower()
+            rates = self._index.get((provider, model)) or self._defaults.get(provider)
+        return rates
+
+    def cost(
+        self,
+        input_tokens: int,
+        output_tokens: int,
+        model: str,
+        provider: str,
+        cached_input_tokens: int = 0,
+        cache_write_tokens: int = 0,
+        batch: bool = False
+    ) -> float:
+        """Cost in USD; see pricing.calculate_cost"""
+        rates = self.rates(provider, model)
+        if rates is None:
+            return 0.0
+        input_rate, output_rate = (rates[4], rates[5]) if batch else (rates[0], rates[1])
+        uncached_tokens = max(0, input_tokens - cached_input_tokens - cache_write_tokens)
+        return (
+            uncached_tokens * input_rate
+            + cached_input_tokens * rates[2]
+            + cache_write_tokens * rates[3]
+            + output_tokens * output_rate
+        ) / 1_000_000
+
+    def pricing_info(self, model: str, provider: str) -> Dict[str, float]:
+        rates = self.rates(provider, model)
+        if rates is None:
+            return {"input": 0.0, "output": 0.0}
+        return dict(zip(RATE_FIELDS, rates))
+
+    def __repr__(self) -> str:
+        return f"PriceSheet({self.version!r}, effective {datetime.fromtimestamp(self.effective, timezone.utc):%Y-%m-%d})"
+
+
+class PriceBook:
+    """All price sheets, ordered by effective date"""
+
+    def __init__(self, sheets: List[PriceSheet]):
+        if not sheets:
+            raise ValueError("A price book needs at least one sheet")
+        self.sheets = sorted(sheets, key=lambda sheet: sheet.effective)
+        self._effective = [sheet.effective for sheet in self.sheets]
+        self._versions = {sheet.version: sheet for sheet in self.sheets}
+
+    @classmethod
+    def load(cls, path: str = PRICE_SHEETS) -> "PriceBook":
+        with open(path, 'r') as f:
+            data = json.load(f)
+        return cls([PriceSheet.from_dict(sheet) for sheet in data["sheets"]])
+
+    @property
+    def current(self) -> PriceSheet:
+        return self.sheet_at(time.time())
+
+    def sheet_at(self, timestamp: float) -> PriceSheet:
+        """Sheet in effect at a Unix time (the earliest sheet for older times)"""
+        return self.sheets[max(0, bisect_right(self._effective, timestamp) - 1)]
+
+    def get(self, version: str) -> PriceSheet:
+        if version not in self._versions:
+            raise KeyError(f"Unknown price sheet {version!r}, expected one of {list(self._versions)}")
+        return self._versions[version]
+
+    def versions(self) -> List[str]:
+        return [sheet.version for sheet in self.sheets]
+
+    def recompute(self, ledger: "UsageLedger", version: Optional[str] = None, batch: Optional[bool] = None) -> "np.ndarray":
+        """Cost of every ledger row, in one vectorized pass
+
+        Args:
+            ledger: Usage to re-price
+            version: Price every row with this sheet; None prices each row
+                with the sheet in effect when the call was made
+            batch: None prices each row at the rates it was billed at
+                (batch API rates for rows recorded with batch=True);
+                True/False prices every row as if it were / were not a
+                batch call, for what-if comparisons
+
+        Returns:
+            float64 array aligned with the ledger's rows at call time (pass
+            to UsageLedger.aggregate(costs=...) or UsageLedger.restate())
+        """
+        import numpy as np
+        from .ledger import FLAG_BATCH, FLAG_CACHED
+
+        columns, names = ledger.snapshot()
+        sheets = [self.get(version)] if version is not None else self.sheets
+
+        # Rate table per (sheet, provider id, model id), in RATE_FIELDS order
+        table = np.zeros((len(sheets), max(1, len(names["provider"])), max(1, len(names["model"])), len(RATE_FIELDS)))
+        for sheet_index, sheet in enumerate(sheets):
+            for provider_id, provider in enumerate(names["provider"]):
+                for model_id, model in enumerate(names["model"]):
+                    rates = sheet.rates(provider, model)
+                    if rates is not None:
+                        table[sheet_index, provider_id, model_id] = rates
+
+        if version is not None:
+            sheet_ids = np.zeros(len(columns["timestamp"]), dtype=np.int64)
+        else:
+            effective = np.array([sheet.effective for sheet in sheets])
+            sheet_ids = np.maximum(0, np.searchsorted(effective, columns["timestamp"], side="right") - 1)
+
+        rates = table[sheet_ids, columns["provider"], columns["model"]]
+        if batch is None:
+            batch_rows = (columns["flags"] & FLAG_BATCH).astype(bool)
+        else:
+            batch_rows = np.full(len(columns["flags"]), batch)
+        input_rates = np.where(batch_rows, rates[:, 4], rates[:, 0])
+        output_rates = np.where(batch_rows, rates[:, 5], rates[:, 1])
+        input_tokens = columns["input_tokens"].astype(np.float64)
+        cached_input_tokens = columns["cached_input_tokens"].astype(np.float64)
+        cache_write_tokens = columns["cache_write_tokens"].astype(np.float64)
+        uncached_tokens = np.maximum(0.0, input_tokens - cached_input_tokens - cache_write_tokens)
+
+        costs = (
+            uncached_tokens * input_rates
+            + columns["output_tokens"] * output_rates
+            + cached_input_tokens * rates[:, 2]
+            + cache_write_tokens * rates[:, 3]
+        ) / 1_000_000
+        costs[(columns["flags"] & FLAG_CACHED).astype(bool)] = 0.0  # Served from our response cache: nothing billed
+        return costs
+
+
+# Process-wide price book loaded from PRICE_SHEETS
+price_book = PriceBook.load()
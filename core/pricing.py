@@ -1,164 +1,175 @@
 """LLM Pricing and Token Tracking - Revenue Focused"""
-from typing import Dict, Tuple
-import tiktoken
-
-
-# Current pricing as of Nov 2024 (per 1M tokens)
-# Source: Official provider pricing pages
-PRICING = {
-    "openai": {
-        "gpt-4o": {"input": 2.50, "output": 10.00},
-        "gpt-4o-mini": {"input": 0.150, "output": 0.600},
-        "gpt-4-turbo": {"input": 10.00, "output": 30.00},
-        "gpt-3.5-turbo": {"input": 0.50, "output": 1.50},
-    },
-    "claude": {
-        "claude-3-5-sonnet-20241022": {"input": 3.00, "output": 15.00},
-        "claude-3-5-haiku-20241022": {"input": 0.80, "output": 4.00},
-        "claude-3-opus-20240229": {"input": 15.00, "output": 75.00},
-    },
-    "gemini": {
-        "gemini-2.0-flash-exp": {"input": 0.00, "output": 0.00},  # Free during preview
-        "gemini-1.5-pro": {"input": 1.25, "output": 5.00},
-        "gemini-1.5-flash": {"input": 0.075, "output": 0.30},
-    },
-    "ollama": {
-        "_default": {"input": 0.00, "output": 0.00}  # Free/Local
-    }
-}
+from typing import Dict, Tuple, Optional, TYPE_CHECKING
 
+from .price_sheets import price_book
+from .tokenizer import tokenizer
 
-def estimate_tokens(text: str, model: str = "gpt-4o") -> int:
-    """Estimate token count for text"""
-    try:
-        # Use tiktoken for OpenAI models (most accurate)
-        if model.startswith("gpt"):
-            encoding = tiktoken.encoding_for_model(model)
-            return len(encoding.encode(text))
-        else:
-            # Rough estimate for other models: ~4 chars per token
-            return len(text) // 4
-    except Exception:
-        # Fallback: rough estimate
-        return len(text) // 4
-
-
-def calculate_cost(input_tokens: int, output_tokens: int, model: str, provider: str) -> float:
-    """Calculate cost in USD for given token usage"""
-    provider = provider.lower()
-
-    # Get pricing for provider
-    if provider not in PRICING:
-        return 0.0
+if TYPE_CHECKING:
+    from .ledger import UsageLedger
+    from .llm_providers import ProviderResult
 
-    provider_pricing = PRICING[provider]
 
-    # Get model pricing (use default if model not found)
-    if model in provider_pricing:
-        model_pricing = provider_pricing[model]
-    elif "_default" in provider_pricing:
-        model_pricing = provider_pricing["_default"]
-    else:
-        return 0.0
+# Prices of the sheet in effect at startup (per 1M tokens); versioned sheets
+# live in price_sheets.json, see core.price_sheets
+PRICING = price_book.current.prices
 
-    # Calculate cost (pricing is per 1M tokens)
-    input_cost = (input_tokens / 1_000_000) * model_pricing["input"]
-    output_cost = (output_tokens / 1_000_000) * model_pricing["output"]
 
-    return input_cost + output_cost
+def estimate_tokens(text: str, model: str = "gpt-4o") -> int:
+    """Estimate token count for text (exact for OpenAI models, see core.tokenizer)"""
+    return tokenizer.count(text or "", model)
+
+
+def calculate_cost(
+    input_tokens: int,
+    output_tokens: int,
+    model: str,
+    provider: str,
+    cached_input_tokens: int = 0,
+    cache_write_tokens: int = 0,
+    batch: bool = False
+) -> float:
+    """Calculate cost in USD for given token usage at the current price sheet
+
+    input_tokens is the whole prompt; cached_input_tokens and
+    cache_write_tokens are the parts of it read from / written to the
+    provider's prompt cache, billed at their own rates. batch prices the
+    call at the provider's batch API rates.
+    """
+    return price_book.current.cost(
+        input_tokens, output_tokens, model, provider,
+        cached_input_tokens=cached_input_tokens,
+        cache_write_tokens=cache_write_tokens,
+        batch=batch
+    )
 
 
 def get_pricing_info(model: str, provider: str) -> Dict[str, float]:
     """Get pricing info for a model"""
-    provider = provider.lower()
-
-    if provider not in PRICING:
-        return {"input": 0.0, "output": 0.0}
-
-    provider_pricing = PRICING[provider]
-
-    if model in provider_pricing:
-        return provider_pricing[model]
-    elif "_default" in provider_pricing:
-        return provider_pricing["_default"]
-    else:
-        return {"input": 0.0, "output": 0.0}
+    return price_book.current.pricing_info(model, provider)
 
 
 class TokenTracker:
-    """Track token usage and costs across session"""
-
-    def __init__(self):
-        self.usage = {}  # {provider: {model: {input_tokens, output_tokens, cost}}}
-        self.total_cost = 0.0
-
-    def track(self, provider: str, model: str, prompt: str, response: str):
-        """Track a single interaction"""
-        input_tokens = estimate_tokens(prompt, model)
-        output_tokens = estimate_tokens(response, model)
-        cost = calculate_cost(input_tokens, output_tokens, model, provider)
-
-        # Initialize provider if needed
-        if provider not in self.usage:
-            self.usage[provider] = {}
-
-        # Initialize model if needed
-        if model not in self.usage[provider]:
-            self.usage[provider][model] = {
-                "input_tokens": 0,
-                "output_tokens": 0,
-                "cost": 0.0,
-                "requests": 0
-            }
-
-        # Update stats
-        self.usage[provider][model]["input_tokens"] += input_tokens
-        self.usage[provider][model]["output_tokens"] += output_tokens
-        self.usage[provider][model]["cost"] += cost
-        self.usage[provider][model]["requests"] += 1
-        self.total_cost += cost
+    """Track token usage and costs across session
+
+    Rows go to this session's own UsageLedger and, when a shared ledger is
+    given, to that one too (process-wide, persisted) for cross-session and
+    admin reporting.
+    """
+
+    def __init__(self, ledger: Optional["UsageLedger"] = None, user: Optional[str] = None):
+        from .ledger import UsageLedger  # numpy is only needed once usage is tracked
+
+        self.session = UsageLedger(capacity=64)
+        self.ledger = ledger
+        self.user = user
+
+    def track(
+        self,
+        provider: str,
+        model: str,
+        prompt: str,
+        response: str,
+        cached: bool = False,
+        input_tokens: Optional[int] = None,
+        output_tokens: Optional[int] = None,
+        cached_input_tokens: Optional[int] = None,
+        cache_write_tokens: Optional[int] = None,
+        batch: bool = False
+    ):
+        """Track a single interaction
+
+        Token counts reported by the provider API are used when given; the
+        text is only tokenized for counts the provider did not report.
+        Cached responses cost nothing upstream, so they count as a request
+        with zero tokens and zero cost. Prompt tokens served from the
+        provider's prompt cache are billed at the cached rate. batch marks
+        a call sent through the provider's batch API (batch rates).
+        """
+        cached_input_tokens = cached_input_tokens or 0
+        cache_write_tokens = cache_write_tokens or 0
+        if cached:
+            input_tokens = output_tokens = cached_input_tokens = cache_write_tokens = 0
+            cost = 0.0
+        else:
+            if input_tokens is None:
+                input_tokens = estimate_tokens(prompt, model)
+            if output_tokens is None:
+                output_tokens = estimate_tokens(response, model)
+            else:
+                tokenizer.observe(model, response, output_tokens)
+            cost = calculate_cost(
+                input_tokens, output_tokens, model, provider,
+                cached_input_tokens=cached_input_tokens,
+                cache_write_tokens=cache_write_tokens,
+                batch=batch
+            )
+
+        row = {
+            "provider": provider,
+            "model": model,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cost": cost,
+            "user": self.user,
+            "cached_input_tokens": cached_input_tokens,
+            "cache_write_tokens": cache_write_tokens,
+            "cached": cached,
+            "batch": batch
+        }
+        self.session.append(**row)
+        if self.ledger is not None:
+            self.ledger.append(**row)
+
+    def track_result(self, result: "ProviderResult", prompt: str):
+        """Track a ProviderResult using its provider-reported token counts
+
+        A call that failed part-way (e.g. cancelled) is billed for its prompt
+        and the text received before the error, tokenized here since its
+        output count is only a rough estimate.
+        """
+        response, output_tokens = result.text, result.output_tokens
+        if not result.ok:
+            if response.endswith(result.error):
+                response = response[:-len(result.error)]
+            output_tokens = None
+        self.track(
+            result.provider.lower(),
+            result.model,
+            prompt,
+            response,
+            cached=result.cached,
+            input_tokens=result.input_tokens,
+            output_tokens=output_tokens,
+            cached_input_tokens=result.cached_input_tokens,
+            cache_write_tokens=result.cache_write_tokens
+        )
 
     def get_summary(self) -> Dict:
         """Get usage summary"""
+        by_provider: Dict[str, Dict[str, Dict]] = {}
+        for row in self.session.aggregate(by=("provider", "model")):
+            by_provider.setdefault(row.pop("provider"), {})[row.pop("model")] = row
         return {
-            "total_cost": self.total_cost,
-            "by_provider": self.usage
+            "total_cost": self.get_total_cost(),
+            "by_provider": by_provider
         }
 
     def get_total_cost(self) -> float:
         """Get total cost in USD"""
-        return self.total_cost
+        return self.session.total_cost()
 
     def get_savings_vs_most_expensive(self) -> Tuple[float, str]:
-        """Calculate savings by using cheaper models"""
-        if not self.usage:
+        """Calculate savings vs sending every request to the model with the highest total spend"""
+        groups = self.session.aggregate(by=("provider", "model"))
+        if not groups:
             return 0.0, ""
 
-        # Find most expensive provider
-        most_expensive_cost = 0.0
-        most_expensive_name = ""
-
-        for provider, models in self.usage.items():
-            for model, stats in models.items():
-                if stats["cost"] > most_expensive_cost:
-                    most_expensive_cost = stats["cost"]
-                    most_expensive_name = f"{provider}/{model}"
-
-        if most_expensive_cost == 0:
-            return 0.0, ""
-
-        # Calculate what total would be if all requests used most expensive
-        total_requests = sum(
-            stats["requests"]
-            for models in self.usage.values()
-            for stats in models.values()
-        )
-
-        if total_requests == 0:
+        most_expensive = max(groups, key=lambda row: row["cost"])
+        if most_expensive["cost"] == 0:
             return 0.0, ""
 
-        avg_cost_most_expensive = most_expensive_cost / self.usage[most_expensive_name.split("/")[0]][most_expensive_name.split("/")[1]]["requests"]
-        hypothetical_cost = avg_cost_most_expensive * total_requests
-        savings = hypothetical_cost - self.total_cost
+        total_requests = sum(row["requests"] for row in groups)
+        hypothetical_cost = most_expensive["cost"] / most_expensive["requests"] * total_requests
+        savings = hypothetical_cost - self.get_total_cost()
 
-        return max(0, savings), most_expensive_name
+        return max(0, savings), f"{most_expensive['provider']}/{most_expensive['model']}"
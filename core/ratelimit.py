@@ -0,0 +1,325 @@
+"""Shared Rate Limiting - Stay Under Provider RPM/TPM Limits
+
+Every session in the process shares one limiter per (provider, API key) with
+a requests-per-minute and a tokens-per-minute token bucket. Calls wait
+briefly when a bucket is empty and are rejected with a wait estimate when
+the queue is too long. Limits come from the environment (e.g. OPENAI_RPM,
+OPENAI_TPM) and are corrected from the rate-limit headers each API returns.
+"""
+import os
+import threading
+import time
+import logging
+from typing import Optional, Dict, Any, Callable, Tuple
+
+from .cancellation import CancelToken
+from .clients import hash_api_key
+
+logger = logging.getLogger(__name__)
+
+# Output tokens reserved per call until the real usage is known
+DEFAULT_OUTPUT_RESERVE = 512
+
+# Header names: OpenAI first, then Anthropic
+_LIMIT_HEADERS = {
+    "requests": (
+        ("x-ratelimit-limit-requests", "x-ratelimit-remaining-requests"),
+        ("anthropic-ratelimit-requests-limit", "anthropic-ratelimit-requests-remaining"),
+    ),
+    "tokens": (
+        ("x-ratelimit-limit-tokens", "x-ratelimit-remaining-tokens"),
+        ("anthropic-ratelimit-tokens-limit", "anthropic-ratelimit-tokens-remaining"),
+    ),
+}
+
+
+class RateLimitExceeded(Exception):
+    """Raised instead of queueing a call that would wait longer than allowed"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def estimate_prompt_tokens(prompt: str) -> int:
+    """Cheap token estimate (~4 chars per token) for budgeting before a call"""
+    return len(prompt) // 4 + 1
+
+
+class TokenBucket:
+    """Bucket refilled continuously to `capacity` per `period` seconds
+
+    The level may go negative: that is capacity already promised to callers
+    who are waiting for it, so later callers queue behind them.
+    """
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.period = period
+        self.capacity = float(capacity)
+        self.level = float(capacity)
+        self.updated = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available (call refill() first)"""
+        deficit = min(amount, self.capacity) - self.level
+        return max(0.0, deficit / self.rate)
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+    def give(self, amount: float):
+        self.level = min(self.capacity, self.level + amount)
+
+    def resize(self, capacity: float):
+        if capacity > 0 and capacity != self.capacity:
+            self.level = min(self.level + capacity - self.capacity, capacity)
+            self.capacity = float(capacity)
+
+
+class Reservation:
+    """Capacity taken for one call; settle() corrects it to the real usage"""
+
+    def __init__(self, limiter: Optional["RateLimiter"] = None, tokens: int = 0):
+        self.limiter = limiter
+        self.tokens = tokens
+
+    def settle(self, input_tokens: Optional[int] = None, output_tokens: Optional[int] = None):
+        """Refund (or charge) the difference between reserved and reported tokens"""
+        if self.limiter is None or (input_tokens is None and output_tokens is None):
+            return
+        actual = (input_tokens or 0) + (output_tokens or 0)
+        self.limiter.adjust(self.tokens - actual)
+        self.limiter = None  # Settle once
+
+    def release(self, input_tokens: Optional[int] = None, output_tokens: Optional[int] = None):
+        """Settle a call that failed or was cancelled
+
+        Charges only what the API reported before the failure and refunds
+        the rest of the estimate. A no-op once settled.
+        """
+        if input_tokens is None and output_tokens is None:
+            input_tokens = output_tokens = 0
+        self.settle(input_tokens, output_tokens)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute budget for one provider key
+
+    Args:
+        name: Provider display name, used in error messages
+        rpm: Requests per minute, None for no request limit
+        tpm: Tokens per minute, None for no token limit
+    """
+
+    def __init__(self, name: str, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        self.name = name
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.paused_until = 0.0
+        self.waited = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int, max_wait: float, cancel: Optional[CancelToken] = None) -> Reservation:
+        """Reserve one request and `tokens` tokens, sleeping until they are available
+
+        Raises:
+            RateLimitExceeded: If the wait would exceed max_wait
+            CancelledError: If cancel fires while waiting; the request and
+                tokens go back to the buckets since the call was never sent
+        """
+        with self._lock:
+            now = time.monotonic()
+            delay, reason = self.paused_until - now, "rate limited by the API"
+            for bucket, amount, label in ((self.requests, 1, "requests"), (self.tokens, tokens, "tokens")):
+                if bucket is None:
+                    continue
+                bucket.refill(now)
+                wait = bucket.wait_time(amount)
+                if wait > delay:
+                    delay, reason = wait, f"{label} per minute limit"
+
+            if delay > max_wait:
+                self.rejected += 1
+                raise RateLimitExceeded(
+                    f"{self.name} {reason} reached, retry in {delay:.0f}s", retry_after=delay
+                )
+
+            if self.requests:
+                self.requests.take(1)
+            if self.tokens:
+                self.tokens.take(tokens)
+            if delay > 0:
+                self.waited += 1
+
+        if delay > 0:
+            logger.info(f"Waiting {delay:.2f}s for {self.name} rate limit")
+            if cancel is None:
+                time.sleep(delay)
+            else:
+                try:
+                    cancel.sleep(delay)
+                except BaseException:
+                    self.adjust(tokens, requests=1)
+                    raise
+        return Reservation(self, tokens)
+
+    def adjust(self, tokens: int, requests: int = 0):
+        """Give back over-reserved tokens (negative: charge extra) and unsent requests"""
+        with self._lock:
+            now = time.monotonic()
+            if self.requests is not None and requests:
+                self.requests.refill(now)
+                self.requests.give(requests)
+            if self.tokens is None:
+                return
+            self.tokens.refill(now)
+            if tokens >= 0:
+                self.tokens.give(tokens)
+            else:
+                self.tokens.take(-tokens)
+
+    def observe(self, headers: Any, status: Optional[int] = None):
+        """Adopt limits/remaining from response headers and honor 429 Retry-After"""
+        with self._lock:
+            now = time.monotonic()
+            for kind, names in _LIMIT_HEADERS.items():
+                for limit_name, remaining_name in names:
+                    limit = _header_number(headers, limit_name)
+                    if limit is None:
+                        continue
+                    bucket = getattr(self, kind)
+                    if bucket is None:
+                        bucket = TokenBucket(limit)
+                        setattr(self, kind, bucket)
+                    else:
+                        bucket.refill(now)
+                        bucket.resize(limit)
+                    remaining = _header_number(headers, remaining_name)
+                    if remaining is not None:
+                        bucket.level = min(bucket.level, remaining)
+                    break
+
+            if status == 429:
+                retry_after = _header_number(headers, "retry-after")
+                if retry_after is None:
+                    retry_ms = _header_number(headers, "retry-after-ms")
+                    retry_after = retry_ms / 1000 if retry_ms is not None else 1.0
+                self.paused_until = max(self.paused_until, now + retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            stats: Dict[str, Any] = {"waited": self.waited, "rejected": self.rejected}
+            for kind in ("requests", "tokens"):
+                bucket = getattr(self, kind)
+                if bucket is not None:
+                    bucket.refill(now)
+                    stats[f"{kind}_per_minute"] = bucket.capacity
+                    stats[f"{kind}_available"] = round(bucket.level, 1)
+            stats["paused_for"] = round(max(0.0, self.paused_until - now), 1)
+            return stats
+
+
+def _header_number(headers: Any, name: str) -> Optional[float]:
+    value = headers.get(name) if headers is not None else None
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimitRegistry:
+    """Process-wide limiters keyed by (provider, API key hash)
+
+    Args:
+        max_wait: Longest a call may queue before it is rejected, in seconds
+        limits: Default (rpm, tpm) per provider name; missing providers read
+            {NAME}_RPM / {NAME}_TPM from the environment
+    """
+
+    def __init__(self, max_wait: float = 10.0, limits: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None):
+        self.max_wait = max_wait
+        self.limits = dict(limits or {})
+        self._limiters: Dict[Tuple[str, str], RateLimiter] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, provider: str, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        """Set default limits for limiters of this provider created from now on"""
+        with self._lock:
+            self.limits[provider] = (rpm, tpm)
+
+    def _default_limits(self, provider: str) -> Tuple[Optional[float], Optional[float]]:
+        if provider in self.limits:
+            return self.limits[provider]
+        prefix = provider.upper()
+        rpm, tpm = os.getenv(f"{prefix}_RPM"), os.getenv(f"{prefix}_TPM")
+        return (float(rpm) if rpm else None, float(tpm) if tpm else None)
+
+    def get(self, provider: str, api_key: Optional[str], create: bool = False) -> Optional[RateLimiter]:
+        """Limiter for this key; created when limits are configured or create=True"""
+        key = (provider, hash_api_key(api_key))
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                rpm, tpm = self._default_limits(provider)
+                if rpm or tpm or create:
+                    limiter = RateLimiter(provider, rpm, tpm)
+                    self._limiters[key] = limiter
+            return limiter
+
+    def acquire(
+        self,
+        provider: str,
+        api_key: Optional[str],
+        prompt: str,
+        output_reserve: int = DEFAULT_OUTPUT_RESERVE,
+        cancel: Optional[CancelToken] = None
+    ) -> Reservation:
+        """Wait for capacity for one call; no-op when no limits are known
+
+        Raises:
+            RateLimitExceeded: If the call would queue longer than max_wait
+            CancelledError: If cancel fires while queued
+        """
+        limiter = self.get(provider, api_key)
+        if limiter is None:
+            return Reservation()
+        return limiter.acquire(estimate_prompt_tokens(prompt) + output_reserve, self.max_wait, cancel)
+
+    def observe(self, provider: str, api_key: Optional[str], headers: Any, status: Optional[int] = None):
+        """Learn limits from a response; starts limiting on the first limit header or 429"""
+        learned = status == 429 or any(
+            headers.get(limit_name) is not None
+            for names in _LIMIT_HEADERS.values() for limit_name, _ in names
+        )
+        limiter = self.get(provider, api_key, create=learned)
+        if limiter is not None:
+            limiter.observe(headers, status)
+
+    def response_hook(self, provider: str, api_key: Optional[str]) -> Callable[[Any], None]:
+        """httpx response event hook feeding every SDK response into observe()"""
+        def hook(response: Any):
+            try:
+                self.observe(provider, api_key, response.headers, response.status_code)
+            except Exception as e:
+                logger.debug(f"Ignoring rate limit headers from {provider}: {e}")
+        return hook
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Budget and queue counters per limiter, keyed by provider and key hash"""
+        with self._lock:
+            limiters = list(self._limiters.items())
+        return {f"{provider}:{key_hash[:6]}": limiter.stats() for (provider, key_hash), limiter in limiters}
+
+
+# Process-wide limiters shared by all sessions
+rate_limits = RateLimitRegistry(max_wait=float(os.getenv("RATE_LIMIT_MAX_WAIT", "10")))
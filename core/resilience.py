@@ -0,0 +1,364 @@
+"""Provider Resilience - Retries, Hedging and Circuit Breakers
+
+Transient 429/5xx/connection failures are retried with jittered backoff
+(honoring Retry-After), slow calls can be hedged with a second attempt, and a
+per-provider circuit breaker fails fast while a provider keeps failing.
+"""
+import queue
+import random
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional, Dict, Any, Iterator, Callable, List, Tuple
+
+from .cancellation import CancelToken, CancelledError
+from .llm_providers import LLMProvider, ProviderError, Messages, new_usage
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+
+# Shared pool for hedged chat() attempts
+_hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-hedge")
+
+
+class CircuitOpenError(ProviderError):
+    """Raised instead of calling a provider whose circuit is open"""
+
+
+def error_status(error: Exception) -> Optional[int]:
+    """HTTP status carried by an SDK/requests exception, if any"""
+    for attr in ("status_code", "status", "code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    value = getattr(getattr(error, "response", None), "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Retry-After hint from the exception or its HTTP response"""
+    value = getattr(error, "retry_after", None)
+    if value is None:
+        headers = getattr(getattr(error, "response", None), "headers", None)
+        value = headers.get("retry-after") if headers is not None else None
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, server errors, timeouts and dropped connections"""
+    if isinstance(error, CircuitOpenError):
+        return False
+    status = error_status(error)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    names = [cls.__name__ for cls in type(error).__mro__]
+    return any("Timeout" in name or "Connection" in name for name in names)
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open trial after a cooldown"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go through now"""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            # Let one trial call through per cooldown; a trial that never
+            # reports back (abandoned stream) doesn't block the next one
+            now = time.monotonic()
+            if now - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self.opened_at = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def retry_in(self) -> float:
+        """Seconds until the next trial call is allowed (0 when closed)"""
+        with self._lock:
+            if self.state == "closed":
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(provider: LLMProvider) -> CircuitBreaker:
+    """Process-wide breaker per provider (per host for Ollama)"""
+    key = f"{provider.name}@{getattr(provider, 'base_url', '')}"
+    with _breakers_lock:
+        if key not in _breakers:
+            _breakers[key] = CircuitBreaker()
+        return _breakers[key]
+
+
+def circuit_states() -> Dict[str, str]:
+    """Current breaker state per provider, for status displays
+
+    Keyed like the breakers themselves ("Ollama@http://gpu-2:11434"), so two
+    hosts of one provider are reported separately rather than overwriting
+    each other.
+    """
+    with _breakers_lock:
+        return {key: breaker.state for key, breaker in _breakers.items()}
+
+
+class ResilientProvider(LLMProvider):
+    """Wrap a provider with retries, optional hedging and a circuit breaker
+
+    Args:
+        provider: Provider to wrap; its _chat/_stream must raise on failure
+        max_retries: Extra attempts after the first for retryable errors
+        base_delay: Backoff base in seconds (full jitter, doubled per attempt)
+        max_delay: Cap on a single backoff sleep
+        max_retry_after: Give up instead of honoring a longer Retry-After
+        hedge_after: Start a second attempt if no result (or first delta)
+            arrived after this many seconds; None disables hedging
+    """
+
+    def __init__(
+        self,
+        provider: LLMProvider,
+        max_retries: int = 2,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        max_retry_after: float = 20.0,
+        hedge_after: Optional[float] = None,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        super().__init__(provider.api_key, provider.model)
+        self.provider = provider
+        self.name = provider.name
+        self.base_url = provider.base_url
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.hedge_after = hedge_after
+        self.breaker = breaker or get_circuit_breaker(provider)
+
+    def is_configured(self) -> bool:
+        return self.provider.is_configured()
+
+    def chat(self, prompt: str, stream: bool = False, history: Optional[Messages] = None) -> str:
+        try:
+            return self._chat(prompt, history)
+        except Exception as e:
+            return f"❌ {self.name} Error: {str(e)}"
+
+    def _chat(self, prompt: str, history: Optional[Messages] = None) -> str:
+        for attempt in range(self.max_retries + 1):
+            self._check_circuit()
+            try:
+                if self.hedge_after:
+                    response = self._hedged(lambda token: self._collect(prompt, history, token))
+                else:
+                    response = self.provider._chat(prompt, history)
+            except Exception as e:
+                time.sleep(self._retry_delay(e, attempt))
+                continue
+            self.breaker.record_success()
+            return response
+
+    def _stream(
+        self,
+        prompt: str,
+        usage: Dict[str, Any],
+        history: Optional[Messages] = None,
+        cancel: Optional[CancelToken] = None
+    ) -> Iterator[str]:
+        for attempt in range(self.max_retries + 1):
+            self._check_circuit()
+            yielded = False
+            try:
+                if self.hedge_after:
+                    deltas = self._hedged_stream(prompt, usage, history, cancel)
+                else:
+                    deltas = self.provider._stream(prompt, usage, history, cancel)
+                for delta in deltas:
+                    yielded = True
+                    yield delta
+            except CancelledError:
+                raise  # Nobody wants the answer: not a provider failure, not worth a retry
+            except Exception as e:
+                # Text already shown can't be taken back, so only retry before the first delta
+                if yielded:
+                    if is_retryable(e):
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.record_success()
+                    raise
+                delay = self._retry_delay(e, attempt)
+                if cancel:
+                    cancel.sleep(delay)
+                else:
+                    time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return
+
+    def _check_circuit(self):
+        if not self.breaker.allow():
+            raise CircuitOpenError(
+                f"{self.name} is failing, skipped for {self.breaker.retry_in():.0f}s"
+            )
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        """Seconds to wait before the next attempt; re-raises when giving up"""
+        if not is_retryable(error):
+            # The provider answered (e.g. 400/401), so it is up; don't trip the breaker
+            if not isinstance(error, CircuitOpenError):
+                self.breaker.record_success()
+            raise error
+        self.breaker.record_failure()
+        if attempt >= self.max_retries:
+            raise error
+
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            if retry_after > self.max_retry_after:
+                raise error
+            return retry_after + random.uniform(0, self.base_delay)
+
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        logger.info(f"Retrying {self.name} in {delay:.2f}s after: {error}")
+        return delay
+
+    def _collect(self, prompt: str, history: Optional[Messages], cancel: CancelToken) -> str:
+        """Whole response of a cancellable streamed call, raising on failure"""
+        response = "".join(self.provider._stream(prompt, new_usage(), history, cancel))
+        if response.startswith("❌"):
+            raise ProviderError(response)
+        return response
+
+    def _hedged(self, fn: Callable[[CancelToken], str]) -> str:
+        """Run fn, racing a second copy if the first is slower than hedge_after
+
+        Each attempt gets its own token; the losing attempt is cancelled.
+        """
+        tokens: List[CancelToken] = []
+
+        def launch():
+            tokens.append(CancelToken())
+            return _hedge_executor.submit(fn, tokens[-1])
+
+        try:
+            attempts = [launch()]
+            done, _ = wait(attempts, timeout=self.hedge_after)
+            if not done:
+                attempts.append(launch())
+
+            pending = set(attempts)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        return future.result()
+                    error = error or future.exception()
+            raise error
+        finally:
+            # Finished either way: nothing still running is needed
+            for token in tokens:
+                token.cancel("hedge finished")
+
+    def _hedged_stream(
+        self,
+        prompt: str,
+        usage: Dict[str, Any],
+        history: Optional[Messages] = None,
+        cancel: Optional[CancelToken] = None
+    ) -> Iterator[str]:
+        """Stream from whichever attempt produces its first delta first
+
+        A second attempt starts if the first has not produced a delta after
+        hedge_after seconds. The losing attempt is cancelled.
+        """
+        events: "queue.Queue[Tuple[int, str, Any]]" = queue.Queue()
+        usages: List[Dict[str, Any]] = []
+        tokens: List[CancelToken] = []
+
+        def pump(index: int):
+            try:
+                for delta in self.provider._stream(prompt, usages[index], history, tokens[index]):
+                    events.put((index, "delta", delta))
+                events.put((index, "done", None))
+            except Exception as e:
+                events.put((index, "error", e))
+
+        def launch():
+            usages.append(new_usage())
+            tokens.append(cancel.child() if cancel else CancelToken())
+            threading.Thread(target=pump, args=(len(usages) - 1,), name="llm-hedge", daemon=True).start()
+
+        launch()
+        hedge_at = time.monotonic() + self.hedge_after
+        winner: Optional[int] = None
+        failed = set()
+
+        try:
+            while True:
+                timeout = None
+                if winner is None and len(usages) == 1:
+                    timeout = max(0.0, hedge_at - time.monotonic())
+                try:
+                    index, kind, payload = events.get(timeout=timeout)
+                except queue.Empty:
+                    launch()
+                    continue
+
+                if winner is None:
+                    if kind == "error":
+                        failed.add(index)
+                        if len(failed) == len(usages):
+                            raise payload
+                        continue
+                    winner = index
+                    for other, token in enumerate(tokens):
+                        if other != winner:
+                            token.cancel("lost hedge race")
+
+                if index != winner:
+                    continue
+                if kind == "delta":
+                    yield payload
+                elif kind == "done":
+                    usage.update(usages[index])
+                    return
+                else:
+                    raise payload
+        finally:
+            # Finished or abandoned: nothing still running is needed
+            for token in tokens:
+                token.cancel("hedge finished")
+
+
+def resilient(providers: Dict[str, LLMProvider], **options: Any) -> Dict[str, LLMProvider]:
+    """Wrap every provider in a ResilientProvider with the same options"""
+    return {name: ResilientProvider(provider, **options) for name, provider in providers.items()}
@@ -0,0 +1,201 @@
+"""Provider Routing - Pick One Provider for Single-Answer Workloads
+
+Where fan-out asks every provider, single-answer features (the receptionist)
+need one good provider per call. ProviderRouter ranks the configured
+providers from rolling telemetry (recent p95 time to first token or latency,
+error rate), circuit breaker state and PRICING under a policy:
+
+    fastest    lowest recent p95
+    cheapest   cheapest provider whose p95 meets a latency SLO
+    fallback   fixed preference order
+
+Providers without enough recent calls are tried first, so each one gets
+measured. Unhealthy providers (open circuit, high recent error rate) are
+moved to the end of every ranking. stream() walks the ranking, moving on to the next
+provider when one fails before producing any text.
+"""
+import os
+import logging
+from typing import Optional, Dict, Any, List, Iterator, Sequence, Tuple
+
+from .cancellation import CancelToken
+from .llm_providers import LLMProvider, ChatStream, Messages
+from .pricing import calculate_cost
+from .resilience import get_circuit_breaker
+from .telemetry import telemetry, RECENT_WINDOW
+
+logger = logging.getLogger(__name__)
+
+ROUTING_POLICIES = ("fastest", "cheapest", "fallback")
+
+# p95 a provider must meet to count as fast enough under "cheapest"
+DEFAULT_LATENCY_SLO = float(os.getenv("ROUTING_LATENCY_SLO", "2.0"))
+
+# Calls needed in the window before a provider's percentiles are trusted
+MIN_SAMPLES = 3
+
+# Recent error rate above which a provider is treated as unhealthy
+MAX_ERROR_RATE = 0.5
+
+# Reply length assumed when comparing prices (receptionist answers are short)
+TYPICAL_OUTPUT_TOKENS = 150
+
+
+class RouteCandidate:
+    """One provider's standing in a ranking"""
+
+    __slots__ = ("name", "provider", "p95", "error_rate", "calls", "cost", "healthy")
+
+    def __init__(
+        self,
+        name: str,
+        provider: LLMProvider,
+        p95: Optional[float],
+        error_rate: float,
+        calls: int,
+        cost: float,
+        healthy: bool
+    ):
+        self.name = name
+        self.provider = provider
+        self.p95 = p95
+        self.error_rate = error_rate
+        self.calls = calls
+        self.cost = cost
+        self.healthy = healthy
+
+    @property
+    def measured(self) -> bool:
+        return self.calls >= MIN_SAMPLES and self.p95 is not None
+
+    def describe(self) -> str:
+        """Short status line for UIs"""
+        speed = f"p95 {self.p95:.2f}s" if self.measured else "no recent data"
+        errors = f", {self.error_rate:.0%} errors" if self.error_rate else ""
+        health = "" if self.healthy else ", unhealthy"
+        return f"{self.name} ({speed}{errors}, ${self.cost:.5f}/call{health})"
+
+    def __repr__(self) -> str:
+        return f"RouteCandidate({self.describe()})"
+
+
+class ProviderRouter:
+    """Rank providers and stream from the best one, failing over down the ranking
+
+    Args:
+        policy: "fastest", "cheapest" or "fallback"
+        slo: Latency SLO in seconds for "cheapest"
+        metric: "ttft" (time to first token, for streamed replies) or "latency"
+        order: Preference order for "fallback"; unlisted providers follow
+        window: Seconds of telemetry to consider
+    """
+
+    def __init__(
+        self,
+        policy: str = "fastest",
+        slo: float = DEFAULT_LATENCY_SLO,
+        metric: str = "ttft",
+        order: Optional[Sequence[str]] = None,
+        window: float = RECENT_WINDOW
+    ):
+        if policy not in ROUTING_POLICIES:
+            raise ValueError(f"Unknown routing policy {policy!r}, expected one of {ROUTING_POLICIES}")
+        self.policy = policy
+        self.slo = slo
+        self.metric = metric
+        self.order = list(order or [])
+        self.window = window
+
+    def candidate(self, name: str, provider: LLMProvider, input_tokens: int = 1000) -> RouteCandidate:
+        """Current telemetry, health and price for one provider"""
+        recent = telemetry.recent(provider.name, provider.model, self.window)
+        p95 = recent["latency_p95"]
+        if self.metric == "ttft" and recent["ttft_p95"] is not None:
+            p95 = recent["ttft_p95"]
+
+        breaker = getattr(provider, "breaker", None) or get_circuit_breaker(provider)
+        circuit_open = breaker.state == "open" and breaker.retry_in() > 0
+        unreliable = recent["calls"] >= MIN_SAMPLES and recent["error_rate"] > MAX_ERROR_RATE
+
+        return RouteCandidate(
+            name=name,
+            provider=provider,
+            p95=p95,
+            error_rate=recent["error_rate"],
+            calls=recent["calls"],
+            cost=calculate_cost(input_tokens, TYPICAL_OUTPUT_TOKENS, provider.model or "", name),
+            healthy=not (circuit_open or unreliable)
+        )
+
+    def rank(self, providers: Dict[str, LLMProvider], input_tokens: int = 1000) -> List[RouteCandidate]:
+        """All providers, best first, unhealthy ones last
+
+        Providers without enough recent calls are explored first (in their
+        configured order) until they have MIN_SAMPLES, under "fastest" and,
+        if they are cheaper than the best measured provider meeting the SLO,
+        under "cheapest". Otherwise the first provider measured would take
+        every call and a faster or cheaper one would never be discovered.
+        """
+        candidates = [self.candidate(name, provider, input_tokens) for name, provider in providers.items()]
+        within_slo = [
+            candidate.cost for candidate in candidates
+            if candidate.healthy and candidate.measured and candidate.p95 <= self.slo
+        ]
+        best_cost = min(within_slo) if within_slo else float("inf")
+        position = {candidate.name: index for index, candidate in enumerate(candidates)}
+
+        if self.policy == "fallback":
+            preferred = {name: index for index, name in enumerate(self.order)}
+
+            def key(candidate: RouteCandidate) -> Tuple[Any, ...]:
+                return (preferred.get(candidate.name, len(preferred)), position[candidate.name])
+        elif self.policy == "cheapest":
+            def key(candidate: RouteCandidate) -> Tuple[Any, ...]:
+                if not candidate.measured:
+                    # Only worth exploring if it could undercut the current pick
+                    return (0 if candidate.cost < best_cost else 2, candidate.cost, position[candidate.name])
+                if candidate.p95 <= self.slo:
+                    return (1, candidate.cost, candidate.p95)
+                return (3, candidate.p95, candidate.cost)
+        else:
+            def key(candidate: RouteCandidate) -> Tuple[Any, ...]:
+                if not candidate.measured:
+                    return (0, position[candidate.name], 0)
+                return (1, candidate.p95, candidate.cost)
+
+        return sorted(candidates, key=lambda candidate: (not candidate.healthy, key(candidate)))
+
+    def stream(
+        self,
+        providers: Dict[str, LLMProvider],
+        prompt: str,
+        history: Optional[Messages] = None,
+        input_tokens: int = 1000,
+        cancel: Optional[CancelToken] = None
+    ) -> Iterator[Tuple[str, str, ChatStream]]:
+        """Stream from the top-ranked provider, failing over before the first delta
+
+        Yields (provider name, delta, stream) like fan_out_stream. Once a
+        provider has produced text it is committed to; if every provider
+        fails, the last one's error delta is yielded. A caller that stops
+        iterating cancels the call in progress.
+        """
+        candidates = self.rank(providers, input_tokens)
+        stream: Optional[ChatStream] = None
+        try:
+            for index, candidate in enumerate(candidates):
+                stream = candidate.provider.stream_chat(
+                    prompt, history=history, cancel=cancel.child() if cancel else None
+                )
+                first = next(stream, None)
+                if stream.error and index < len(candidates) - 1:
+                    logger.warning(f"Routing away from {candidate.name}: {stream.error}")
+                    continue
+                if first is not None:
+                    yield candidate.name, first, stream
+                for delta in stream:
+                    yield candidate.name, delta, stream
+                return
+        finally:
+            if stream is not None and not stream.done:
+                stream.cancel("abandoned")
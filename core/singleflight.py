@@ -0,0 +1,259 @@
+"""Single-Flight Request Coalescing - One Upstream Call per Identical Request
+
+When several sessions ask the same provider/model the same prompt at the
+same time, only the first request goes upstream. Everyone else waits on that
+call and receives the same result, including streamed deltas. A shared
+stream is cancelled upstream only once every subscriber has cancelled or
+stopped reading.
+"""
+import threading
+import logging
+from concurrent.futures import Future
+from typing import Optional, Dict, Any, Iterator, List, Callable, Tuple
+
+from .cancellation import CancelToken
+from .llm_providers import LLMProvider, ChatStream, Messages
+from .cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """One in-flight stream, replayed to every subscriber"""
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.usage: Dict[str, Any] = {}
+        self.error_type: Optional[str] = None
+        self.done = False
+        self.cond = threading.Condition()
+        self.cancel = CancelToken()  # Upstream call
+        self.subscribers: List[CancelToken] = []
+        self.payer: Optional[CancelToken] = None  # Subscriber billed for the upstream call
+
+    def publish(self, stream: ChatStream):
+        """Pump the upstream stream to completion (runs on its own thread)"""
+        try:
+            for delta in stream:
+                with self.cond:
+                    if stream.error:
+                        self.error_type = stream.error_type  # Before subscribers can see the delta
+                    self.parts.append(delta)
+                    self.cond.notify_all()
+        finally:
+            with self.cond:
+                self.usage = dict(stream.usage)
+                self.done = True
+                self.cond.notify_all()
+
+    def join(self, cancel: CancelToken) -> Callable[..., None]:
+        """Count a subscriber until it finishes or cancels; the first one pays
+
+        Returns:
+            Its leave function (idempotent). A paying subscriber that leaves
+            before reading to the end hands the bill to one still reading,
+            since the upstream call runs on for them. The last subscriber to
+            leave before the flight is done cancels the upstream call.
+        """
+        with self.cond:
+            self.subscribers.append(cancel)
+            if self.payer is None:
+                self.payer = cancel
+        left: List[bool] = []
+
+        def leave(completed: bool = False):
+            with self.cond:
+                if left:
+                    return
+                left.append(True)
+                self.subscribers.remove(cancel)
+                if not completed and self.payer is cancel and self.subscribers:
+                    self.payer = self.subscribers[0]
+                abandoned = not self.subscribers and not self.done
+                self.cond.notify_all()  # Wake a cancelled subscriber waiting for deltas
+            if abandoned:
+                self.cancel.cancel("every subscriber left")
+
+        cancel.on_cancel(leave)  # Also covers streams cancelled before they were read
+        return leave
+
+    def pays(self, cancel: CancelToken) -> bool:
+        with self.cond:
+            return self.payer is cancel
+
+    def subscribe(self, cancel: CancelToken, leave: Callable[..., None]) -> Iterator[str]:
+        """Yield every delta from the start, then new ones as they arrive"""
+        completed = False
+        try:
+            index = 0
+            while True:
+                with self.cond:
+                    while index >= len(self.parts) and not self.done and not cancel.cancelled:
+                        self.cond.wait()
+                    new_parts = self.parts[index:]
+                    index = len(self.parts)
+                    finished = self.done
+                cancel.raise_if_cancelled()
+                yield from new_parts
+                if finished:
+                    completed = True
+                    return
+        finally:
+            leave(completed)
+
+
+class SingleFlight:
+    """Share in-flight calls between concurrent identical requests"""
+
+    def __init__(self):
+        self._calls: Dict[str, Future] = {}
+        self._streams: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key: str, fn: Callable[[], str]) -> Tuple[str, bool]:
+        """Run fn once per key at a time
+
+        Returns:
+            (result, shared) where shared is True if another caller's
+            in-flight call produced the result
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+            else:
+                self.shared += 1
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            future.set_result(fn())
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+        return future.result(), False
+
+    def stream(
+        self,
+        key: str,
+        name: str,
+        model: Optional[str],
+        start: Callable[[CancelToken], ChatStream],
+        cancel: Optional[CancelToken] = None
+    ) -> ChatStream:
+        """Join the in-flight stream for key, starting it if there is none
+
+        The upstream stream is pumped on a background thread so an abandoned
+        subscriber never stalls the others. start() receives the flight's own
+        token, cancelled when the last subscriber leaves early. One
+        subscriber's ChatStream receives usage: the first, or whoever it
+        handed the bill to by leaving early. The rest are marked cached since
+        they cost nothing upstream.
+        """
+        cancel = cancel or CancelToken()
+        with self._lock:
+            flight = self._streams.get(key)
+            leader = flight is None or flight.cancel.cancelled
+            if leader:
+                flight = _Flight()
+                self._streams[key] = flight
+            else:
+                self.shared += 1
+            leave = flight.join(cancel)
+
+        if leader:
+            def upstream(usage: Dict[str, Any]) -> Iterator[str]:
+                # Started inside the stream so a failing start() still ends the flight
+                inner = start(flight.cancel)
+                for delta in inner:
+                    if inner.error:
+                        published.error_type = inner.error_type
+                    yield delta
+                usage.update(inner.usage)
+
+            published = ChatStream(name, upstream, model, flight.cancel)
+
+            def pump():
+                try:
+                    flight.publish(published)
+                finally:
+                    with self._lock:
+                        if self._streams.get(key) is flight:
+                            del self._streams[key]
+
+            threading.Thread(target=pump, name="llm-singleflight", daemon=True).start()
+
+        def deltas(usage: Dict[str, Any]) -> Iterator[str]:
+            replay = flight.subscribe(cancel, leave)
+            try:
+                for delta in replay:
+                    if delta.startswith("❌"):
+                        # Keep the upstream failure's type rather than a generic ProviderError
+                        stream.error_type = flight.error_type
+                    yield delta
+            finally:
+                replay.close()  # Leave now, so an early exit hands the bill on first
+                stream.cached = not flight.pays(cancel)
+                if not stream.cached and flight.done:
+                    usage.update(flight.usage)  # Else a partial estimate if the call was cut short
+
+        stream = ChatStream(name, deltas, model, cancel)
+        stream.cached = not leader
+        return stream
+
+
+class CoalescedProvider(LLMProvider):
+    """Wrap a provider so concurrent identical requests share one upstream call"""
+
+    def __init__(self, provider: LLMProvider, flights: SingleFlight, params: Optional[Dict[str, Any]] = None):
+        super().__init__(provider.api_key, provider.model)
+        self.provider = provider
+        self.flights = flights
+        self.params = params
+        self.name = provider.name
+        self.base_url = provider.base_url
+
+    def is_configured(self) -> bool:
+        return self.provider.is_configured()
+
+    def flight_key(self, prompt: str, history: Optional[Messages] = None) -> str:
+        return ResponseCache.make_key(
+            self.name, self.model, prompt, self.params, history, self.api_key, self.base_url
+        )
+
+    def chat(self, prompt: str, stream: bool = False, history: Optional[Messages] = None) -> str:
+        response, _ = self.flights.do(
+            self.flight_key(prompt, history), lambda: self.provider.chat(prompt, history=history)
+        )
+        return response
+
+    def stream_chat(
+        self,
+        prompt: str,
+        history: Optional[Messages] = None,
+        cancel: Optional[CancelToken] = None
+    ) -> ChatStream:
+        return self.flights.stream(
+            self.flight_key(prompt, history), self.name, self.model,
+            lambda upstream_cancel: self.provider.stream_chat(prompt, history=history, cancel=upstream_cancel),
+            cancel
+        )
+
+
+def coalesce(
+    providers: Dict[str, LLMProvider],
+    flights: Optional[SingleFlight] = None
+) -> Dict[str, LLMProvider]:
+    """Wrap every provider in a CoalescedProvider sharing one SingleFlight"""
+    flights = flights or single_flight
+    return {name: CoalescedProvider(provider, flights) for name, provider in providers.items()}
+
+
+# Process-wide coalescer shared by all sessions
+single_flight = SingleFlight()
@@ -22,6 +22,7 @@ SUBSCRIPTION_TIERS = {
         "billing": "forever",
         "features": {
             "conversations_per_day": 10,
+            "daily_budget_usd": 0.25,  # provider spend cap
             "models_per_query": 4,
             "cost_analytics": False,
             "referral_rewards": False,
@@ -42,6 +43,7 @@ SUBSCRIPTION_TIERS = {
         "billing": "per month",
         "features": {
             "conversations_per_day": -1,  # unlimited
+            "daily_budget_usd": 5.00,  # provider spend cap
             "models_per_query": 4,
             "cost_analytics": True,
             "referral_rewards": True,
@@ -62,6 +64,7 @@ SUBSCRIPTION_TIERS = {
         "billing": "per month",
         "features": {
             "conversations_per_day": -1,  # unlimited
+            "daily_budget_usd": 20.00,  # provider spend cap
             "models_per_query": 4,
             "cost_analytics": True,
             "referral_rewards": True,
@@ -82,6 +85,7 @@ SUBSCRIPTION_TIERS = {
         "billing": "per month",
         "features": {
             "conversations_per_day": -1,  # unlimited
+            "daily_budget_usd": -1,  # unlimited provider spend
             "models_per_query": 4,
             "cost_analytics": True,
             "referral_rewards": True,
@@ -137,6 +141,7 @@ class SubscriptionManager:
                 "tier_started_at": datetime.now().isoformat(),
                 "usage_stats": {
                     "conversations_today": 0,
+                    "spend_today": 0.0,
                     "last_reset": datetime.now().date().isoformat(),
                     "total_conversations": 0,
                     "total_queries": 0
@@ -284,11 +289,8 @@ class SubscriptionManager:
             self.create_subscription(email)
             subscription = self.get_subscription(email)
 
-        # Reset daily counter if new day
-        today = datetime.now().date().isoformat()
-        if subscription["usage_stats"]["last_reset"] != today:
-            subscription["usage_stats"]["conversations_today"] = 0
-            subscription["usage_stats"]["last_reset"] = today
+        # Reset daily counters if new day
+        self._reset_daily_usage(subscription)
 
         # Increment counters
         if usage_type == "conversation":
@@ -325,10 +327,7 @@ class SubscriptionManager:
             }
 
         # Reset if new day
-        today = datetime.now().date().isoformat()
-        if subscription["usage_stats"]["last_reset"] != today:
-            subscription["usage_stats"]["conversations_today"] = 0
-            subscription["usage_stats"]["last_reset"] = today
+        if self._reset_daily_usage(subscription):
             self._save_subscriptions()
 
         used = subscription["usage_stats"]["conversations_today"]
@@ -341,6 +340,70 @@ class SubscriptionManager:
             "remaining": remaining
         }
 
+    def get_daily_budget(self, email: str) -> float:
+        """Daily provider spend cap in USD (-1 = unlimited): the user's own cap if set, else the tier's"""
+        subscription = self.get_subscription(email)
+        if subscription and subscription.get("daily_budget_usd") is not None:
+            return subscription["daily_budget_usd"]
+
+        tier = subscription["tier"] if subscription else "free"
+        return SUBSCRIPTION_TIERS[tier]["features"].get("daily_budget_usd", -1)
+
+    def set_daily_budget(self, email: str, budget: Optional[float]) -> bool:
+        """Set a per-user daily spend cap (None restores the tier default)"""
+        if email not in self.subscriptions["users"]:
+            return False
+
+        self.subscriptions["users"][email]["daily_budget_usd"] = budget
+        self._track_event(email, "budget_updated", {"daily_budget_usd": budget})
+        self._save_subscriptions()
+        return True
+
+    def track_spend(self, email: str, cost: float):
+        """Add the actual cost of a conversation to today's spend"""
+        subscription = self.get_subscription(email)
+        if not subscription or cost <= 0:
+            return
+
+        self._reset_daily_usage(subscription)
+        subscription["usage_stats"]["spend_today"] = subscription["usage_stats"].get("spend_today", 0.0) + cost
+        self._save_subscriptions()
+
+    def check_budget(self, email: str, estimated_cost: float = 0.0) -> Dict:
+        """Check whether a conversation estimated to cost estimated_cost fits today's budget"""
+        budget = self.get_daily_budget(email)
+        subscription = self.get_subscription(email)
+
+        spent = 0.0
+        if subscription:
+            if self._reset_daily_usage(subscription):
+                self._save_subscriptions()
+            spent = subscription["usage_stats"].get("spend_today", 0.0)
+
+        # -1 means unlimited
+        if budget == -1:
+            return {"allowed": True, "budget": -1, "spent": spent, "remaining": -1, "estimated": estimated_cost}
+
+        remaining = max(0.0, budget - spent)
+        return {
+            "allowed": estimated_cost <= remaining,
+            "budget": budget,
+            "spent": spent,
+            "remaining": remaining,
+            "estimated": estimated_cost
+        }
+
+    def _reset_daily_usage(self, subscription: Dict) -> bool:
+        """Zero the daily counters on the first use of a new day; True if they were reset"""
+        today = datetime.now().date().isoformat()
+        if subscription["usage_stats"]["last_reset"] == today:
+            return False
+
+        subscription["usage_stats"]["conversations_today"] = 0
+        subscription["usage_stats"]["spend_today"] = 0.0
+        subscription["usage_stats"]["last_reset"] = today
+        return True
+
     def get_tier_info(self, tier: str) -> Dict:
         """Get tier information"""
         return SUBSCRIPTION_TIERS.get(tier, SUBSCRIPTION_TIERS["free"])
@@ -0,0 +1,367 @@
+"""Provider Telemetry - Latency, TTFT and Throughput per Provider
+
+Every upstream provider call is timed into fixed-bucket histograms (constant
+memory no matter how many calls): total latency, time to first token and
+output tokens/second, plus call and error counters and an in-flight gauge
+per (provider, model). The last few hundred calls are also kept as raw
+samples so recent() can report rolling percentiles for routing decisions.
+The admin panel reads them in-process; the webhook service renders the
+snapshot the app writes as Prometheus-style text.
+"""
+import functools
+import json
+import math
+import os
+import threading
+import time
+import logging
+from bisect import bisect_left
+from collections import Counter, deque
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Iterator, Callable, Sequence, Tuple, Deque
+
+from .cancellation import CancelledError
+from .ratelimit import estimate_prompt_tokens
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+TTFT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30)
+TOKENS_PER_SECOND_BUCKETS = (5, 10, 20, 40, 60, 80, 120, 160, 240, 400)
+
+# Raw samples kept per (provider, model) for rolling percentiles
+RECENT_CALLS = 200
+RECENT_WINDOW = 300.0  # seconds
+
+# Where the app publishes snapshots for the webhook service's /metrics
+TELEMETRY_SNAPSHOT = os.getenv("TELEMETRY_SNAPSHOT", "analytics/telemetry.json")
+
+
+class Histogram:
+    """Cumulative-style histogram over fixed upper bounds (last bucket is +Inf)"""
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate by linear interpolation inside the bucket holding the q-th value"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                if index >= len(self.bounds):
+                    return lower  # Open-ended bucket: report its lower bound
+                upper = self.bounds[index]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.bounds[-1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"bounds": list(self.bounds), "counts": list(self.counts), "sum": self.sum, "count": self.count}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Histogram":
+        histogram = cls(data["bounds"])
+        histogram.counts = list(data["counts"])
+        histogram.sum = data["sum"]
+        histogram.count = data["count"]
+        return histogram
+
+
+class ProviderStats:
+    """All series for one (provider, model)"""
+
+    def __init__(self):
+        self.calls = 0
+        self.in_flight = 0
+        self.output_tokens = 0
+        self.errors: Counter = Counter()
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.ttft = Histogram(TTFT_BUCKETS)
+        self.tokens_per_second = Histogram(TOKENS_PER_SECOND_BUCKETS)
+        # (finished_at, latency, ttft, failed, output_tokens) per call, newest last
+        self.recent: Deque[Tuple[float, float, Optional[float], bool, Optional[int]]] = deque(maxlen=RECENT_CALLS)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "in_flight": self.in_flight,
+            "output_tokens": self.output_tokens,
+            "errors": dict(self.errors),
+            "latency": self.latency.to_dict(),
+            "ttft": self.ttft.to_dict(),
+            "tokens_per_second": self.tokens_per_second.to_dict()
+        }
+
+
+class CallTimer:
+    """Measures one provider call; created by Telemetry.start()"""
+
+    __slots__ = ("telemetry", "key", "started_at", "first_token_at")
+
+    def __init__(self, telemetry: "Telemetry", key: Tuple[str, str]):
+        self.telemetry = telemetry
+        self.key = key
+        self.started_at = time.monotonic()
+        self.first_token_at: Optional[float] = None
+
+    def first_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.monotonic()
+
+    def finish(self, error: Optional[BaseException] = None, output_tokens: Optional[int] = None):
+        self.telemetry.record(self, time.monotonic(), error, output_tokens)
+
+
+class Telemetry:
+    """Process-wide registry of ProviderStats"""
+
+    def __init__(self):
+        self._stats: Dict[Tuple[str, str], ProviderStats] = {}
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self.snapshot_path: Optional[Path] = None
+        self.snapshot_interval = 15.0
+        self._last_snapshot = 0.0
+
+    def start(self, provider: str, model: Optional[str]) -> CallTimer:
+        key = (provider, model or "")
+        with self._lock:
+            self._stats.setdefault(key, ProviderStats()).in_flight += 1
+        return CallTimer(self, key)
+
+    def record(self, call: CallTimer, finished_at: float, error: Optional[BaseException], output_tokens: Optional[int]):
+        with self._lock:
+            stats = self._stats[call.key]
+            stats.in_flight -= 1
+            stats.calls += 1
+            if error is not None:
+                # An abandoned stream (client timeout, user navigated away) is not a provider error
+                name = "Cancelled" if isinstance(error, (GeneratorExit, CancelledError)) else type(error).__name__
+                stats.errors[name] += 1
+                if name == "Cancelled":
+                    stats.output_tokens += output_tokens or 0  # Paid for, never read
+                else:
+                    stats.recent.append((finished_at, finished_at - call.started_at, None, True, None))
+            else:
+                ttft = call.first_token_at - call.started_at if call.first_token_at is not None else None
+                stats.recent.append((finished_at, finished_at - call.started_at, ttft, False, output_tokens))
+                stats.latency.observe(finished_at - call.started_at)
+                if call.first_token_at is not None:
+                    stats.ttft.observe(call.first_token_at - call.started_at)
+                if output_tokens:
+                    stats.output_tokens += output_tokens
+                    generating = finished_at - (call.first_token_at or call.started_at)
+                    if generating > 0:
+                        stats.tokens_per_second.observe(output_tokens / generating)
+        self._maybe_save_snapshot(finished_at)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-serializable copy of every series"""
+        with self._lock:
+            providers = [
+                dict(stats.to_dict(), provider=provider, model=model)
+                for (provider, model), stats in self._stats.items()
+            ]
+        return {"generated_at": time.time(), "providers": providers}
+
+    def recent(self, provider: str, model: Optional[str], window: float = RECENT_WINDOW) -> Dict[str, Any]:
+        """Rolling stats over calls that finished in the last `window` seconds
+
+        Returns calls, error_rate, exact p50/p95 of latency and time to
+        first token, and the mean reported output tokens over successful
+        calls (None when there are none).
+        """
+        cutoff = time.monotonic() - window
+        with self._lock:
+            stats = self._stats.get((provider, model or ""))
+            samples = [sample for sample in stats.recent if sample[0] >= cutoff] if stats else []
+
+        ok = [sample for sample in samples if not sample[3]]
+        latencies = sorted(sample[1] for sample in ok)
+        ttfts = sorted(sample[2] for sample in ok if sample[2] is not None)
+        output_tokens = [sample[4] for sample in ok if sample[4]]
+        return {
+            "calls": len(samples),
+            "error_rate": (len(samples) - len(ok)) / len(samples) if samples else 0.0,
+            "latency_p50": _percentile(latencies, 0.5),
+            "latency_p95": _percentile(latencies, 0.95),
+            "ttft_p50": _percentile(ttfts, 0.5),
+            "ttft_p95": _percentile(ttfts, 0.95),
+            "output_tokens_avg": sum(output_tokens) / len(output_tokens) if output_tokens else None
+        }
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """One row per provider/model with headline percentiles, for tables"""
+        return summarize_snapshot(self.snapshot())
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def enable_snapshots(self, path: str = TELEMETRY_SNAPSHOT, interval: float = 15.0):
+        """Periodically write snapshot() to path so other processes can serve it"""
+        self.snapshot_path = Path(path)
+        self.snapshot_interval = interval
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def _maybe_save_snapshot(self, now: float):
+        with self._lock:
+            if self.snapshot_path is None or now - self._last_snapshot < self.snapshot_interval:
+                return
+            self._last_snapshot = now
+        # One writer at a time; a call finishing mid-write just skips its turn
+        if not self._snapshot_lock.acquire(blocking=False):
+            return
+        try:
+            tmp_path = self.snapshot_path.with_suffix(".tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            logger.warning(f"Failed to write telemetry snapshot: {e}")
+        finally:
+            self._snapshot_lock.release()
+
+
+def _percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+def summarize_snapshot(snapshot: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Headline numbers per provider/model from a snapshot"""
+    def rounded(value: Optional[float], digits: int = 2) -> Optional[float]:
+        return round(value, digits) if value is not None else None
+
+    rows = []
+    for entry in snapshot.get("providers", []):
+        latency = Histogram.from_dict(entry["latency"])
+        ttft = Histogram.from_dict(entry["ttft"])
+        tokens_per_second = Histogram.from_dict(entry["tokens_per_second"])
+        rows.append({
+            "provider": entry["provider"],
+            "model": entry["model"],
+            "calls": entry["calls"],
+            "errors": sum(entry["errors"].values()),
+            "in_flight": entry["in_flight"],
+            "p50_s": rounded(latency.quantile(0.5)),
+            "p95_s": rounded(latency.quantile(0.95)),
+            "ttft_p50_s": rounded(ttft.quantile(0.5)),
+            "tok_per_s_p50": rounded(tokens_per_second.quantile(0.5), 1)
+        })
+    return rows
+
+
+def _escape_label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_text(snapshot: Dict[str, Any]) -> str:
+    """Prometheus text exposition of a snapshot"""
+    lines: List[str] = []
+
+    def labels(entry: Dict[str, Any], **extra: Any) -> str:
+        pairs = {"provider": entry["provider"], "model": entry["model"], **extra}
+        return ",".join(f'{key}="{_escape_label(value)}"' for key, value in pairs.items())
+
+    entries = snapshot.get("providers", [])
+
+    for name, help_text, field in (
+        ("llm_requests_total", "Completed provider calls", "calls"),
+        ("llm_output_tokens_total", "Output tokens reported by providers", "output_tokens"),
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        lines += [f"{name}{{{labels(entry)}}} {entry[field]}" for entry in entries]
+
+    lines += ["# HELP llm_requests_in_flight Provider calls currently running", "# TYPE llm_requests_in_flight gauge"]
+    lines += [f"llm_requests_in_flight{{{labels(entry)}}} {entry['in_flight']}" for entry in entries]
+
+    lines += ["# HELP llm_request_errors_total Failed provider calls by error class", "# TYPE llm_request_errors_total counter"]
+    for entry in entries:
+        for error_type, count in sorted(entry["errors"].items()):
+            lines.append(f"llm_request_errors_total{{{labels(entry, error_type=error_type)}}} {count}")
+
+    for name, help_text, field in (
+        ("llm_request_latency_seconds", "Provider call latency", "latency"),
+        ("llm_time_to_first_token_seconds", "Time to first streamed token", "ttft"),
+        ("llm_output_tokens_per_second", "Output token generation rate", "tokens_per_second"),
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for entry in entries:
+            histogram = entry[field]
+            cumulative = 0
+            for bound, count in zip(list(histogram["bounds"]) + ["+Inf"], histogram["counts"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{{{labels(entry, le=bound)}}} {cumulative}")
+            lines.append(f"{name}_sum{{{labels(entry)}}} {histogram['sum']}")
+            lines.append(f"{name}_count{{{labels(entry)}}} {histogram['count']}")
+
+    return "\n".join(lines) + "\n"
+
+
+def load_snapshot(path: str) -> Optional[Dict[str, Any]]:
+    """Snapshot written by enable_snapshots(), or None if missing/unreadable"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def instrument_chat(method: Callable[..., str]) -> Callable[..., str]:
+    """Time a provider's raw _chat(prompt) call"""
+    @functools.wraps(method)
+    def wrapper(self, prompt: str, *args: Any, **kwargs: Any) -> str:
+        call = telemetry.start(self.name, self.model)
+        try:
+            response = method(self, prompt, *args, **kwargs)
+        except BaseException as e:
+            call.finish(error=e)
+            raise
+        call.finish()
+        return response
+    return wrapper
+
+
+def instrument_stream(method: Callable[..., Iterator[str]]) -> Callable[..., Iterator[str]]:
+    """Time a provider's raw _stream(prompt, usage) generator, including TTFT
+
+    A cancelled call gets an estimated output token count for the text it
+    produced, since the provider never reports usage for it.
+    """
+    @functools.wraps(method)
+    def wrapper(self, prompt: str, usage: Dict[str, Any], *args: Any, **kwargs: Any) -> Iterator[str]:
+        call = telemetry.start(self.name, self.model)
+        error: Optional[BaseException] = None
+        parts: List[str] = []
+        try:
+            for delta in method(self, prompt, usage, *args, **kwargs):
+                call.first_token()
+                parts.append(delta)
+                yield delta
+        except BaseException as e:
+            error = e
+            if isinstance(e, (GeneratorExit, CancelledError)) and usage.get("output_tokens") is None and parts:
+                usage["output_tokens"] = estimate_prompt_tokens("".join(parts))
+            raise
+        finally:
+            call.finish(error=error, output_tokens=usage.get("output_tokens"))
+    return wrapper
+
+
+# Process-wide telemetry shared by all sessions
+telemetry = Telemetry()
@@ -0,0 +1,164 @@
+"""Tokenizer Service - Cached Encoders and Fast Token Counts
+
+Token counts feed cost tracking, history budgets and batch reports, often
+for the same text several times (one prompt goes to every provider). OpenAI
+models are counted exactly with tiktoken: each encoding is loaded once, and
+a failed load (e.g. offline without a BPE cache) is remembered instead of
+retried on every call. Exact counts are memoized. Claude, Gemini and local
+models use characters-per-token estimators, calibrated from the output
+token counts providers report.
+"""
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Sequence, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import tiktoken
+
+logger = logging.getLogger(__name__)
+
+# Encoding for OpenAI models tiktoken doesn't know yet
+DEFAULT_OPENAI_ENCODING = "o200k_base"
+
+# Starting characters-per-token per model family (English text)
+CHARS_PER_TOKEN = {
+    "openai": 4.0,
+    "claude": 3.5,
+    "gemini": 4.0,
+    "local": 3.8
+}
+
+# Calibration: weight of each observation, bounds, and shortest useful sample
+CALIBRATION_WEIGHT = 0.1
+CALIBRATION_BOUNDS = (1.5, 8.0)
+CALIBRATION_MIN_CHARS = 200
+
+_OPENAI_PREFIXES = ("gpt", "chatgpt", "o1", "o3", "o4", "text-embedding")
+
+
+def model_family(model: Optional[str]) -> str:
+    """"openai", "claude", "gemini" or "local" (Ollama and anything else)"""
+    name = (model or "").lower()
+    if name.startswith(_OPENAI_PREFIXES):
+        return "openai"
+    if name.startswith("claude"):
+        return "claude"
+    if name.startswith("gemini"):
+        return "gemini"
+    return "local"
+
+
+class TokenizerService:
+    """Token counting with lazily loaded encoders and a count memo
+
+    Args:
+        max_memo: Exact counts remembered (LRU)
+        num_threads: Threads tiktoken uses for batch encoding
+    """
+
+    def __init__(self, max_memo: int = 8192, num_threads: int = 8):
+        self.max_memo = max_memo
+        self.num_threads = num_threads
+        self.chars_per_token = dict(CHARS_PER_TOKEN)
+        self._encoders: Dict[str, Optional["tiktoken.Encoding"]] = {}
+        self._model_encodings: Dict[str, str] = {}
+        self._memo: "OrderedDict[Tuple[str, bytes], int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def encoder(self, model: Optional[str]) -> Optional["tiktoken.Encoding"]:
+        """tiktoken encoding for an OpenAI model, None for other models or if unavailable"""
+        if model_family(model) != "openai":
+            return None
+        name = self._model_encodings.get(model)
+        if name is None:
+            from tiktoken.model import encoding_name_for_model
+            try:
+                name = encoding_name_for_model(model)
+            except KeyError:
+                name = DEFAULT_OPENAI_ENCODING
+            self._model_encodings[model] = name
+        if name in self._encoders:
+            return self._encoders[name]
+
+        # One loader at a time: the first load may download the BPE file
+        with self._load_lock:
+            if name not in self._encoders:
+                import tiktoken
+                try:
+                    self._encoders[name] = tiktoken.get_encoding(name)
+                except Exception as e:
+                    logger.warning(f"Tokenizer {name} unavailable, estimating token counts instead: {e}")
+                    self._encoders[name] = None
+            return self._encoders[name]
+
+    def estimate(self, text: str, model: Optional[str]) -> int:
+        """Calibrated characters-per-token estimate (no tokenizer needed)"""
+        if not text:
+            return 0
+        return max(1, round(len(text) / self.chars_per_token[model_family(model)]))
+
+    def count(self, text: str, model: Optional[str] = "gpt-4o") -> int:
+        """Tokens in text for model: exact for OpenAI models, estimated otherwise"""
+        return self.count_batch([text], model)[0]
+
+    def count_batch(self, texts: Sequence[str], model: Optional[str] = "gpt-4o") -> List[int]:
+        """Token counts for many texts, encoding the uncached ones in one multi-threaded call"""
+        encoding = self.encoder(model)
+        if encoding is None:
+            return [self.estimate(text, model) for text in texts]
+
+        # A digest rather than hash(): a collision would silently return another text's count
+        keys = [(encoding.name, hashlib.blake2b(text.encode(), digest_size=16).digest()) for text in texts]
+        counts: Dict[Tuple[str, bytes], int] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memo:
+                    self._memo.move_to_end(key)
+                    counts[key] = self._memo[key]
+            self.hits += len(counts)
+
+        # Each distinct uncached text is encoded once, even if repeated in this batch
+        missing = {key: text for key, text in zip(keys, texts) if key not in counts}
+        if missing:
+            if len(missing) == 1:
+                encoded = [encoding.encode_ordinary(next(iter(missing.values())))]
+            else:
+                encoded = encoding.encode_ordinary_batch(list(missing.values()), num_threads=self.num_threads)
+            with self._lock:
+                self.misses += len(missing)
+                for key, tokens in zip(missing, encoded):
+                    counts[key] = self._memo[key] = len(tokens)
+                while len(self._memo) > self.max_memo:
+                    self._memo.popitem(last=False)
+
+        return [counts[key] for key in keys]
+
+    def observe(self, model: Optional[str], text: str, tokens: Optional[int]):
+        """Refine the estimator for model's family from a provider-reported count"""
+        family = model_family(model)
+        if not tokens or len(text) < CALIBRATION_MIN_CHARS or self.encoder(model) is not None:
+            return
+        low, high = CALIBRATION_BOUNDS
+        ratio = min(high, max(low, len(text) / tokens))
+        with self._lock:
+            current = self.chars_per_token[family]
+            self.chars_per_token[family] = current + CALIBRATION_WEIGHT * (ratio - current)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "memo_size": len(self._memo),
+                "hits": self.hits,
+                "misses": self.misses,
+                "encoders": {name: encoding is not None for name, encoding in self._encoders.items()},
+                "chars_per_token": {family: round(ratio, 2) for family, ratio in self.chars_per_token.items()}
+            }
+
+
+# Process-wide tokenizer shared by all sessions
+tokenizer = TokenizerService()
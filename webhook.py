@@ -17,20 +17,17 @@ Usage:
 """
 
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 import os
 import sys
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from core.billing import (
-    parse_webhook_event,
-    handle_checkout_completed,
-    handle_subscription_updated,
-    handle_subscription_deleted
-)
+# core.billing (and the stripe SDK) is imported by the webhook route on first
+# use, so restarts answer /health without loading the billing stack
 from core.subscriptions import SubscriptionManager
+from core.telemetry import telemetry, load_snapshot, render_text, TELEMETRY_SNAPSHOT
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -59,6 +56,17 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Provider latency/throughput metrics in Prometheus text format
+
+    Serves the snapshot the Streamlit app writes to TELEMETRY_SNAPSHOT
+    (shared volume), falling back to this process's own counters.
+    """
+    snapshot = load_snapshot(TELEMETRY_SNAPSHOT) or telemetry.snapshot()
+    return PlainTextResponse(render_text(snapshot), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/stripe/webhook")
 async def stripe_webhook(request: Request):
     """Handle Stripe webhook events
@@ -76,6 +84,13 @@ async def stripe_webhook(request: Request):
         400 Bad Request if payload is invalid
         500 Internal Server Error if processing fails
     """
+    from core.billing import (
+        parse_webhook_event,
+        handle_checkout_completed,
+        handle_subscription_updated,
+        handle_subscription_deleted
+    )
+
     try:
         # Get raw body and signature
         payload = await request.body()